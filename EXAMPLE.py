@@ -1,3 +1,7 @@
+from tracks_library import load_library_from_json, search_by_song, search_by_singer
+
+load_library_from_json("song.json")
+
 # Example usage
 search_results = search_by_song("Shape of You")
 for result in search_results:
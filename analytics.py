@@ -0,0 +1,205 @@
+"""Catalog-wide statistics over ratings, play counts and singers, computed with NumPy.
+
+The library's numeric columns are copied into arrays once (export_arrays);
+every aggregate is then a vectorized group-by over singer codes, so no
+Python code runs per track.
+
+    python analytics.py [song.json] [--output report.json] [--top 20]
+"""
+import argparse
+import json
+import math
+import sys
+import time
+
+import numpy as np
+
+import tracks_library as lib
+from catalog_snapshot import SnapshotStore
+
+PERCENTILES = (50, 90, 99, 99.9)
+TOP_ARTISTS = 20
+MIN_TRACKS = 10  # Artists with fewer tracks get no correlation of their own
+RATINGS = 6  # Ratings run from 0 to 5
+
+# Layout of catalog_snapshot.RECORD, so snapshot records are read without unpacking them one by one
+SNAPSHOT_RECORD = np.dtype([("play_count", "<u8"), ("rating", "u1"), ("flags", "u1"), ("reserved", "<u2"),
+                            ("singer", "<u4"), ("spans", "<u4", (6,))])
+
+
+class CatalogArrays:
+    """Singer code, rating and play count of every library row, and the singer names the codes stand for."""
+
+    def __init__(self, singer_codes, ratings, play_counts, singers):
+        self.singer_codes = singer_codes
+        self.ratings = ratings
+        self.play_counts = play_counts
+        self.singers = singers
+
+    def __len__(self):
+        return len(self.ratings)
+
+
+def export_arrays(store=None):
+    """Copy the numeric columns of a library store (default: the loaded library) into NumPy arrays."""
+    store = lib.library if store is None else store
+    if isinstance(store, SnapshotStore):
+        records, positions = store.record_buffers()
+        try:
+            rows = np.frombuffer(records, dtype=SNAPSHOT_RECORD)[np.frombuffer(positions, dtype="<u4").astype(np.intp) - 1]
+        finally:
+            records.release()
+            positions.release()
+        codes, ratings, play_counts = (np.ascontiguousarray(rows[field]) for field in ("singer", "rating", "play_count"))
+        unsaved_ratings, unsaved_counts = store.unsaved()  # Set in memory, not in the mapped records yet
+        ratings[list(unsaved_ratings)] = list(unsaved_ratings.values())
+        play_counts[list(unsaved_counts)] = list(unsaved_counts.values())
+    else:
+        codes, ratings, play_counts = store.numeric_columns()
+        codes = np.frombuffer(codes, dtype=np.uint32)
+        ratings = np.frombuffer(ratings, dtype=np.uint8)
+        play_counts = np.frombuffer(play_counts, dtype=np.uint64)
+    return CatalogArrays(codes.astype(np.intp), ratings, play_counts, store.singers())
+
+
+def artist_totals(arrays):
+    """Return the number of tracks and the total plays of every singer code."""
+    n = len(arrays.singers)
+    tracks = np.bincount(arrays.singer_codes, minlength=n)
+    plays = np.bincount(arrays.singer_codes, weights=arrays.play_counts, minlength=n)  # Exact below 2**53 plays
+    return tracks, np.rint(plays).astype(np.int64)
+
+
+def rating_distribution(arrays):
+    """Return the number of tracks per rating, overall and as a (singer code, rating) table."""
+    overall = np.bincount(arrays.ratings, minlength=RATINGS)
+    cells = arrays.singer_codes * RATINGS + arrays.ratings
+    per_artist = np.bincount(cells, minlength=len(arrays.singers) * RATINGS).reshape(-1, RATINGS)
+    return overall, per_artist
+
+
+def play_count_percentiles(arrays, percentiles=PERCENTILES):
+    """Return {percentile: play count}; empty for an empty catalog."""
+    if not len(arrays):
+        return {}
+    return dict(zip(percentiles, np.percentile(arrays.play_counts, percentiles).tolist()))
+
+
+def mean_plays_by_rating(arrays):
+    """Return the mean play count of the tracks with each rating (NaN where no track has it)."""
+    tracks = np.bincount(arrays.ratings, minlength=RATINGS)
+    plays = np.bincount(arrays.ratings, weights=arrays.play_counts, minlength=RATINGS)
+    with np.errstate(invalid="ignore"):
+        return plays / tracks
+
+
+def grouped_correlation(groups, x, y, group_count):
+    """Pearson correlation of x and y within each group (NaN where either is constant).
+
+    Values are centred on their group means first, which keeps large play
+    counts from cancelling out in the sums.
+    """
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    counts = np.bincount(groups, minlength=group_count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dx = x - (np.bincount(groups, weights=x, minlength=group_count) / counts)[groups]
+        dy = y - (np.bincount(groups, weights=y, minlength=group_count) / counts)[groups]
+        sxy = np.bincount(groups, weights=dx * dy, minlength=group_count)
+        sxx = np.bincount(groups, weights=dx * dx, minlength=group_count)
+        syy = np.bincount(groups, weights=dy * dy, minlength=group_count)
+        return sxy / np.sqrt(sxx * syy)
+
+
+def rating_play_correlation(arrays):
+    """Return the rating-versus-plays correlation over the catalog and per singer code."""
+    overall = grouped_correlation(np.zeros(len(arrays), dtype=np.intp), arrays.ratings, arrays.play_counts, 1)[0]
+    per_artist = grouped_correlation(arrays.singer_codes, arrays.ratings, arrays.play_counts, len(arrays.singers))
+    return overall, per_artist
+
+
+def _number(value):
+    """Return value as a JSON-friendly float, None for NaN."""
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def build_report(arrays, top=TOP_ARTISTS):
+    """Return every aggregate as a JSON-serializable dict, with the top artists by plays in detail."""
+    tracks, plays = artist_totals(arrays)
+    overall_ratings, artist_ratings = rating_distribution(arrays)
+    overall_r, artist_r = rating_play_correlation(arrays)
+    with np.errstate(invalid="ignore"):
+        mean_rating = np.bincount(arrays.singer_codes, weights=arrays.ratings, minlength=len(tracks)) / tracks
+    order = np.argsort(-plays, kind="stable")[:top]
+    return {
+        "tracks": len(arrays),
+        "artists": int(np.count_nonzero(tracks)),
+        "total_plays": int(arrays.play_counts.sum()),
+        "play_count_percentiles": {str(q): value for q, value in play_count_percentiles(arrays).items()},
+        "rating_distribution": overall_ratings.tolist(),
+        "mean_plays_by_rating": [_number(value) for value in mean_plays_by_rating(arrays)],
+        "rating_play_correlation": _number(overall_r),
+        "top_artists": [
+            {
+                "singer": arrays.singers[code],
+                "tracks": int(tracks[code]),
+                "plays": int(plays[code]),
+                "mean_rating": _number(mean_rating[code]),
+                "rating_distribution": artist_ratings[code].tolist(),
+                "rating_play_correlation": _number(artist_r[code]) if tracks[code] >= MIN_TRACKS else None,
+            }
+            for code in order.tolist() if tracks[code]
+        ],
+    }
+
+
+def format_report(report):
+    """Return a report as text for the statistics window and the command line."""
+    def fixed(value, digits=2):
+        return "n/a" if value is None else f"{value:.{digits}f}"
+
+    lines = [
+        f"Tracks: {report['tracks']}    Artists: {report['artists']}    Plays: {report['total_plays']}",
+        "Play count percentiles: " + ", ".join(f"p{q}={value:g}" for q, value in report["play_count_percentiles"].items()),
+        "Tracks per rating: " + ", ".join(f"{rating}: {count}" for rating, count in enumerate(report["rating_distribution"])),
+        "Mean plays per rating: " + ", ".join(f"{rating}: {fixed(mean, 1)}"
+                                              for rating, mean in enumerate(report["mean_plays_by_rating"])),
+        f"Rating vs plays correlation: {fixed(report['rating_play_correlation'], 3)}",
+        "",
+        f"{'Artist':<30} {'Tracks':>8} {'Plays':>12} {'Rating':>7} {'r':>7}",
+    ]
+    for artist in report["top_artists"]:
+        lines.append(f"{artist['singer'][:30]:<30} {artist['tracks']:>8} {artist['plays']:>12} "
+                     f"{fixed(artist['mean_rating']):>7} {fixed(artist['rating_play_correlation'], 3):>7}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write catalog statistics for a jukebox library.")
+    parser.add_argument("library_file", nargs="?", default=lib.LIBRARY_FILE)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    parser.add_argument("--top", type=int, default=TOP_ARTISTS, help="artists listed in detail")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    lib.load_library_from_json(args.library_file)
+    loaded = time.perf_counter()
+    arrays = export_arrays()
+    exported = time.perf_counter()
+    report = build_report(arrays, args.top)
+    done = time.perf_counter()
+    report["timings_s"] = {"load": loaded - started, "export": exported - loaded, "aggregate": done - exported}
+
+    print(format_report(report))
+    print(f"\nLoaded in {loaded - started:.2f}s, exported in {(exported - loaded) * 1000:.1f} ms, "
+          f"aggregated in {(done - exported) * 1000:.1f} ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
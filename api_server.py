@@ -0,0 +1,388 @@
+"""Headless HTTP/JSON API over the track library, for front-ends and batch jobs that do not run Tk.
+
+    python api_server.py [song.json] [--host 127.0.0.1] [--port 8080]
+
+Endpoints, all answering JSON:
+
+    GET  /tracks?offset=0&limit=50          tracks in catalog order
+    GET  /tracks/<key>                      one track
+    GET  /search?title=...  or  ?singer=... tracks whose words start with the query's words
+    GET  /top?by=plays|rating[&singer=...][&n=10]
+    POST /plays    {"plays": {"01": 2}}     -> {"counts": {"01": 9}}
+    POST /ratings  {"ratings": {"01": 5}}   -> {"ratings": {"01": 5}}
+    GET  /stats                             request, cache and write-batch counters
+
+One asyncio loop owns the library. Read responses are cached until a library
+change event touches a track they show, or, for a chart, a track that may
+now rank in it. Writes use the windows' tracks_library
+calls, batched: every play that arrives within one loop turn is recorded by
+a single record_plays() call, and ratings are written with one
+persist_ratings() per batch on a worker thread while the next batch
+collects, then set in the library. A write is answered once it has been
+persisted.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+import tracks_library as lib
+from charts import get_charts
+from track_store import check_rating
+
+HOST = "127.0.0.1"
+PORT = 8080
+CACHE_SIZE = 4096  # Cached read responses
+MAX_LIMIT = 500  # Most tracks one list or search response holds
+MAX_TOP = 100
+MAX_BODY = 1024 * 1024  # Largest request body accepted
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    """A request the server answers with an HTTP error status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def track_json(track):
+    return {"key": track.key, "title": track.title, "singer": track.singer, "rating": track.rating,
+            "play_count": track.play_count, "link": track.link, "image_url": track.image_path}
+
+
+def _int_param(params, name, default, low, high):
+    value = params.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"{name} must be an integer.") from None
+    if not low <= value <= high:
+        raise ApiError(400, f"{name} must be between {low} and {high}.")
+    return value
+
+
+class LibraryServer:
+    """Serves the loaded library over HTTP; every method runs on the event loop."""
+
+    def __init__(self, library_file, cache_size=CACHE_SIZE):
+        self.library_file = library_file
+        self.cache_size = cache_size
+        self.track_cache = OrderedDict()  # Track key -> response body; dropped when that track changes
+        self.query_cache = OrderedDict()  # Request target -> response body; dropped when a track it shows changes
+        self.query_keys = {}  # Cached target -> keys of the tracks it shows
+        self.shown_in = {}  # Track key -> cached targets showing it
+        self.rankings = {}  # Cached /top target -> (change kind it ranks by, singer or None, lowest value shown)
+        self.search_rows = OrderedDict()  # (field, query, limit) -> rows; titles and singers never change
+        self.pending_plays = {}  # key -> plays waiting for the next record_plays()
+        self.play_waiters = []
+        self.pending_ratings = {}  # key -> rating set but not yet persisted
+        self.rating_waiters = []
+        self._plays_scheduled = False
+        self._rating_writer = None  # Task persisting rating batches
+        self.stats = {"requests": 0, "cache_hits": 0, "errors": 0, "play_batches": 0, "rating_batches": 0}
+        self.charts = None
+        self.address = None
+
+    def load(self):
+        """Load the library and its search index, and follow its changes."""
+        skipped = lib.load_library_from_json(self.library_file)
+        lib.index.catch_up()  # Searches must not see a half-built index
+        self.charts = get_charts()
+        lib.add_listener(self.library_changed)
+        return skipped
+
+    def close(self):
+        lib.remove_listener(self.library_changed)
+        lib.close_storage(self.library_file)  # Folds journaled plays into song.json
+
+    def library_changed(self, kind, keys):
+        """Listener: forget the cached responses a change makes stale.
+
+        A rating or play count drops the responses showing the changed tracks,
+        and the charts ranked by that value which a changed track may now enter.
+        """
+        if kind not in (lib.RATING_CHANGED, lib.COUNT_CHANGED):
+            for cache in (self.track_cache, self.search_rows, self.query_cache, self.query_keys, self.shown_in,
+                          self.rankings):
+                cache.clear()
+            return
+        stale = set()
+        for key in keys:
+            self.track_cache.pop(key, None)
+            stale.update(self.shown_in.get(key, ()))
+        for target, (ranked_by, singer, lowest) in self.rankings.items():
+            if ranked_by == kind and any(self._may_enter(key, kind, singer, lowest) for key in keys):
+                stale.add(target)
+        for target in stale:
+            del self.query_cache[target]
+            self._forget(target)
+
+    @staticmethod
+    def _may_enter(key, kind, singer, lowest):
+        """Return True if a changed track may now belong in a chart whose lowest value shown is lowest."""
+        if key not in lib.library:
+            return False
+        track = lib.library[key]
+        if singer is not None and track.singer != singer:
+            return False
+        return lowest is None or (track.play_count if kind == lib.COUNT_CHANGED else track.rating) >= lowest
+
+    def _watch(self, target, path, params, payload):
+        """Remember which tracks, and for a chart which ranking, a cached query response depends on."""
+        keys = [track["key"] for track in payload["tracks"]]
+        self.query_keys[target] = keys
+        for key in keys:
+            self.shown_in.setdefault(key, set()).add(target)
+        if path == "/top":
+            by_plays = params.get("by", "plays") == "plays"
+            values = [track["play_count" if by_plays else "rating"] for track in payload["tracks"]]
+            full = len(values) == _int_param(params, "n", 10, 1, MAX_TOP)
+            self.rankings[target] = (lib.COUNT_CHANGED if by_plays else lib.RATING_CHANGED, params.get("singer"),
+                                     min(values) if full else None)  # None: any track may enter a short chart
+
+    def _forget(self, target):
+        for key in self.query_keys.pop(target, ()):
+            targets = self.shown_in[key]
+            targets.discard(target)
+            if not targets:
+                del self.shown_in[key]
+        self.rankings.pop(target, None)
+
+    # Reads
+    def _cached(self, cache, name, build, watch=None):
+        body = cache.get(name)
+        if body is not None:
+            cache.move_to_end(name)
+            self.stats["cache_hits"] += 1
+            return body
+        payload = build()
+        body = json.dumps(payload).encode("utf-8")
+        cache[name] = body
+        if watch is not None:
+            watch(name, payload)
+        if len(cache) > self.cache_size:
+            evicted, _ = cache.popitem(last=False)
+            if watch is not None:
+                self._forget(evicted)
+        return body
+
+    def get(self, path, query, target):
+        if path.startswith("/tracks/"):
+            key = path[len("/tracks/"):]
+            if key not in lib.library:
+                raise ApiError(404, f"Track {key} not found.")
+            return self._cached(self.track_cache, key, lambda: track_json(lib.library[key]))
+        if path == "/stats":
+            return json.dumps(dict(self.stats, tracks=len(lib.library), cached=len(self.track_cache)
+                                   + len(self.query_cache))).encode("utf-8")
+        build = {"/tracks": self.list_tracks, "/search": self.search, "/top": self.top}.get(path)
+        if build is None:
+            raise ApiError(404, f"No endpoint {path}.")
+        params = {name: values[0] for name, values in parse_qs(query).items()}
+        return self._cached(self.query_cache, target, lambda: build(params),
+                            lambda target, payload: self._watch(target, path, params, payload))
+
+    def list_tracks(self, params):
+        store = lib.library
+        offset = _int_param(params, "offset", 0, 0, len(store))
+        limit = _int_param(params, "limit", 50, 1, MAX_LIMIT)
+        rows = range(offset, min(len(store), offset + limit))
+        return {"total": len(store), "offset": offset, "tracks": [track_json(store.view_at(row)) for row in rows]}
+
+    def search(self, params):
+        limit = _int_param(params, "limit", 50, 1, MAX_LIMIT)
+        field = "title" if "title" in params else "singer" if "singer" in params else None
+        if field is None:
+            raise ApiError(400, "Give a title or singer to search for.")
+        name = (field, params[field], limit)
+        rows = self.search_rows.get(name)
+        if rows is None:
+            search = lib.index.search_titles if field == "title" else lib.index.search_singers
+            rows = self.search_rows[name] = search(params[field], limit)
+            if len(self.search_rows) > self.cache_size:
+                self.search_rows.popitem(last=False)
+        store = lib.library
+        return {"tracks": [track_json(store.view_at(row)) for row in rows]}
+
+    def top(self, params):
+        n = _int_param(params, "n", 10, 1, MAX_TOP)
+        by = params.get("by", "plays")
+        if "singer" in params:
+            if by != "plays":
+                raise ApiError(400, "Charts per singer rank by plays.")
+            tracks = self.charts.top_by_artist(params["singer"], n)
+        elif by == "plays":
+            tracks = self.charts.top_played(n)
+        elif by == "rating":
+            tracks = self.charts.top_rated(n)
+        else:
+            raise ApiError(400, "by must be plays or rating.")
+        return {"tracks": [track_json(track) for track in tracks]}
+
+    # Writes
+    @staticmethod
+    def _edits(body, field):
+        try:
+            edits = json.loads(body)[field]
+        except (ValueError, TypeError, KeyError):
+            raise ApiError(400, f'Expected a JSON object with "{field}".') from None
+        if not isinstance(edits, dict) or not edits:
+            raise ApiError(400, f'"{field}" must map track keys to values.')
+        for key in edits:
+            if key not in lib.library:
+                raise ApiError(404, f"Track {key} not found.")
+        return edits
+
+    async def post_plays(self, body):
+        plays = self._edits(body, "plays")
+        if not all(type(count) is int and count >= 1 for count in plays.values()):
+            raise ApiError(400, "Plays must be positive integers.")
+        for key, count in plays.items():
+            self.pending_plays[key] = self.pending_plays.get(key, 0) + count
+        future = asyncio.get_running_loop().create_future()
+        self.play_waiters.append(future)
+        if not self._plays_scheduled:
+            self._plays_scheduled = True
+            asyncio.get_running_loop().call_soon(self.record_plays)  # After the other requests of this turn
+        counts = await future
+        return {"counts": {key: counts[key] for key in plays}}
+
+    def record_plays(self):
+        """Record every play collected this loop turn with one journal write."""
+        self._plays_scheduled = False
+        plays, waiters = self.pending_plays, self.play_waiters
+        self.pending_plays, self.play_waiters = {}, []
+        try:
+            counts = lib.record_plays(plays)
+        except Exception as e:
+            for future in waiters:
+                future.set_exception(e)
+            return
+        self.stats["play_batches"] += 1
+        for future in waiters:
+            future.set_result(counts)
+
+    async def post_ratings(self, body):
+        ratings = self._edits(body, "ratings")
+        try:
+            for rating in ratings.values():
+                check_rating(rating)
+        except ValueError as e:
+            raise ApiError(400, str(e)) from None
+        self.pending_ratings.update(ratings)
+        future = asyncio.get_running_loop().create_future()
+        self.rating_waiters.append(future)
+        if self._rating_writer is None:
+            self._rating_writer = asyncio.create_task(self.write_ratings())
+        await future
+        return {"ratings": ratings}
+
+    async def write_ratings(self):
+        """Persist rating batches one after another until none are left."""
+        try:
+            while self.pending_ratings:
+                ratings, waiters = self.pending_ratings, self.rating_waiters
+                self.pending_ratings, self.rating_waiters = {}, []
+                try:
+                    await asyncio.to_thread(lib.persist_ratings, ratings)  # A JSON rewrite; the loop keeps serving
+                except Exception as e:
+                    for future in waiters:
+                        future.set_exception(e)
+                    continue
+                for key, rating in ratings.items():
+                    lib.set_rating(key, rating)  # Readers see a rating once it is in the file
+                self.stats["rating_batches"] += 1
+                for future in waiters:
+                    future.set_result(None)
+        finally:
+            self._rating_writer = None
+
+    # HTTP
+    async def respond(self, method, target, body):
+        """Return (status, body bytes) for one request."""
+        self.stats["requests"] += 1
+        path, _, query = target.partition("?")
+        try:
+            if method == "GET":
+                return 200, self.get(path, query, target)
+            if method == "POST" and path in ("/plays", "/ratings"):
+                result = await (self.post_plays(body) if path == "/plays" else self.post_ratings(body))
+                return 200, json.dumps(result).encode("utf-8")
+            raise ApiError(405, f"{method} {path} is not supported.")
+        except ApiError as e:
+            self.stats["errors"] += 1
+            return e.status, json.dumps({"error": str(e)}).encode("utf-8")
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Error serving {method} {target}: {e}")
+            return 500, json.dumps({"error": str(e)}).encode("utf-8")
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection, keeping it open between them."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    status, body = 413, b'{"error": "Request body too large."}'
+                    keep_alive = False
+                else:
+                    status, body = await self.respond(method, target, await reader.readexactly(length))
+                    keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                head = f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                if not keep_alive:
+                    head += "Connection: close\r\n"
+                writer.write(head.encode("latin-1") + b"\r\n" + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # The client went away or did not speak HTTP
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT):
+        """Serve until cancelled; port 0 picks a free port, printed on start."""
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        self.address = server.sockets[0].getsockname()[:2]
+        print(f"Serving {len(lib.library)} tracks from {self.library_file} on http://{self.address[0]}:{self.address[1]}",
+              flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the track library over a local HTTP/JSON API.")
+    parser.add_argument("library_file", nargs="?", default=lib.LIBRARY_FILE)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT, help="0 picks a free port")
+    args = parser.parse_args(argv)
+    server = LibraryServer(args.library_file)
+    for position, reason in server.load():
+        print(f"Skipped record {position}: {reason}")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
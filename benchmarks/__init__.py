@@ -0,0 +1 @@
+"""Headless benchmarks for the jukebox library. Run modules with ``python -m benchmarks.<name>``."""
@@ -0,0 +1,72 @@
+"""Time the NumPy catalog statistics against the same aggregates computed track by track in Python.
+
+    python -m benchmarks.bench_analytics [sizes...]
+
+"export" copies the library's columns into arrays, "aggregate" builds the
+whole report from them; both are timed for a library parsed from song.json
+(TrackStore) and one opened from its snapshot.
+"""
+import math
+import os
+import sys
+import tempfile
+import time
+
+import analytics
+import catalog_snapshot
+import tracks_library as lib
+from benchmarks.synthetic import make_records
+from catalog_loader import write_records
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+
+def python_report():
+    """The report's aggregates the way they would be written without NumPy, over TrackView objects."""
+    tracks, plays, ratings, by_rating = {}, {}, [0] * analytics.RATINGS, [0] * analytics.RATINGS
+    counts, xs = [], []
+    for track in lib.library.values():
+        tracks[track.singer] = tracks.get(track.singer, 0) + 1
+        plays[track.singer] = plays.get(track.singer, 0) + track.play_count
+        ratings[track.rating] += 1
+        by_rating[track.rating] += track.play_count
+        counts.append(track.play_count)
+        xs.append(track.rating)
+    ordered = sorted(counts)
+    percentiles = [ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] for q in analytics.PERCENTILES]
+    mx, my = sum(xs) / len(xs), sum(counts) / len(counts)
+    sxy = sum((x - mx) * (y - my) for x, y in zip(xs, counts))
+    sxx = sum((x - mx) ** 2 for x in xs)
+    syy = sum((y - my) ** 2 for y in counts)
+    top = sorted(plays, key=plays.get, reverse=True)[:analytics.TOP_ARTISTS]
+    return top, percentiles, sxy / math.sqrt(sxx * syy) if sxx and syy else None
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+def main(sizes=SIZES):
+    print(f"{'tracks':>10} {'store':<9} {'export':>9} {'aggregate':>10} {'python':>9}")
+    for count in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            json_file = os.path.join(directory, "song.json")
+            write_records(json_file, make_records(count))
+            for store, use_snapshot in (("parsed", False), ("snapshot", True)):
+                if use_snapshot:
+                    catalog_snapshot.import_json(json_file)
+                for _ in lib.iter_load_library(json_file, use_snapshot=use_snapshot):
+                    pass
+                arrays, export_s = timed(analytics.export_arrays)
+                report, aggregate_s = timed(lambda: analytics.build_report(arrays))
+                _, python_s = timed(python_report)
+                print(f"{count:>10} {store:<9} {export_s * 1000:>7.1f}ms {aggregate_s * 1000:>8.1f}ms {python_s:>8.2f}s")
+            lib.library.close()
+            lib.get_journal(json_file).close()
+            lib.library = lib.index = None
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,223 @@
+"""Load test for api_server: requests per second and latency percentiles against a large catalog.
+
+    python -m benchmarks.bench_api [--tracks 1000000] [--connections 64] [--processes 4] [--duration 10]
+    python -m benchmarks.bench_api --url http://127.0.0.1:8080 --mix track=80,search=20
+
+Without --url a synthetic catalog is written to a temporary directory and
+api_server is started on it in its own process. Client processes keep every
+connection busy with a mix of reads and writes. Track keys follow a
+Zipf-like popularity, so a few tracks are far hotter than the rest, as in
+real use. Every rating rewrites song.json, so on a 1M-track catalog a rating
+takes as long as that rewrite; --mix without "rate" measures the rest alone.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from urllib.parse import quote, urlsplit
+
+from benchmarks.synthetic import make_records, make_words
+from catalog_loader import write_records
+from simulator import Popularity, percentiles
+from tracks_library import make_key
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIX = {"track": 45, "search": 15, "top": 15, "list": 10, "play": 14, "rate": 1}  # Share of requests per kind
+QUERIES = 200  # Distinct search queries; a real audience repeats itself
+
+
+def search_queries(rng):
+    """Return title and singer prefixes drawn from the synthetic catalog's vocabulary."""
+    words = make_words(5000, random.Random(1234))  # The words make_records() builds titles and names from
+    return [("title" if rng.random() < 0.7 else "singer", word[:rng.randint(2, 5)]) for word in rng.sample(words, QUERIES)]
+
+
+def parse_mix(text):
+    """Parse "track=45,search=15,..." into a request mix."""
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in MIX or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f"Expected kind=weight with kinds from {', '.join(MIX)}.")
+        mix[kind] = int(weight)
+    return mix
+
+
+def make_request(kind, rng, popularity, queries, total):
+    """Return (method, target, body) for one request of a kind."""
+    if kind == "track":
+        return "GET", f"/tracks/{popularity.pick(rng)}", b""
+    if kind == "search":
+        field, query = rng.choice(queries)
+        return "GET", f"/search?{field}={quote(query)}&limit=20", b""
+    if kind == "top":
+        return "GET", f"/top?by={rng.choice(('plays', 'rating'))}&n={rng.choice((10, 20))}", b""
+    if kind == "list":
+        return "GET", f"/tracks?offset={rng.randrange(max(1, total - 50))}&limit=50", b""
+    if kind == "play":
+        return "POST", "/plays", json.dumps({"plays": {popularity.pick(rng): 1}}).encode()
+    return "POST", "/ratings", json.dumps({"ratings": {popularity.pick(rng): rng.randint(0, 5)}}).encode()
+
+
+async def read_response(reader):
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        if name.lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def connection(host, port, mix, rng, popularity, queries, total, deadline, latencies, errors):
+    kinds, weights = list(mix), list(mix.values())
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            method, target, body = make_request(kind, rng, popularity, queries, total)
+            started = time.perf_counter()
+            writer.write(f"{method} {target} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+                         + body)
+            status = await read_response(reader)
+            latencies[kind].append(time.perf_counter() - started)
+            if status != 200:
+                errors[kind] += 1
+    finally:
+        writer.close()
+
+
+def run_client(host, port, mix, connections, duration, total, seed):
+    """One client process: returns (latencies per kind, errors per kind)."""
+    rng = random.Random(seed)
+    popularity = Popularity([make_key(track_id) for track_id in range(1, total + 1)], seed=0)
+    queries = search_queries(random.Random(0))
+    latencies, errors = {kind: [] for kind in mix}, Counter()
+
+    async def run():
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(connection(host, port, mix, random.Random(f"{seed}:{number}"), popularity, queries, total,
+                                          deadline, latencies, errors) for number in range(connections)))
+    asyncio.run(run())
+    return latencies, dict(errors)
+
+
+def get_json(host, port, target):
+    async def fetch():
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+        data = await reader.read()
+        writer.close()
+        return json.loads(data.partition(b"\r\n\r\n")[2])
+    return asyncio.run(fetch())
+
+
+def load_test(host, port, mix, connections, processes, duration):
+    """Run the clients against a server and return the report."""
+    before = get_json(host, port, "/stats")
+    total = before["tracks"]
+    per_process = [connections // processes + (number < connections % processes) for number in range(processes)]
+    with multiprocessing.Pool(processes) as pool:
+        started = time.perf_counter()
+        results = pool.starmap(run_client, [(host, port, mix, count, duration, total, seed)
+                                            for seed, count in enumerate(per_process) if count])
+        wall = time.perf_counter() - started
+    latencies, errors = {kind: [] for kind in mix}, Counter()
+    for process_latencies, process_errors in results:
+        for kind, values in process_latencies.items():
+            latencies[kind] += values
+        errors.update(process_errors)
+    after = get_json(host, port, "/stats")
+    every = [value for values in latencies.values() for value in values]
+    return {
+        "tracks": total,
+        "connections": connections,
+        "processes": processes,
+        "mix": mix,
+        "duration_s": wall,
+        "requests": len(every),
+        "requests_per_s": len(every) / wall,
+        "errors": dict(errors),
+        "latency_ms": {str(point): value * 1000 for point, value in percentiles(every).items()},
+        "latency_ms_by_kind": {kind: {str(point): value * 1000 for point, value in percentiles(values).items()}
+                               for kind, values in latencies.items()},
+        "server": {name: after[name] - before.get(name, 0) for name in ("requests", "cache_hits", "play_batches",
+                                                                         "rating_batches")},
+    }
+
+
+def format_report(report):
+    lines = [
+        f"{report['tracks']} tracks, {report['connections']} connections from {report['processes']} processes, "
+        f"{report['duration_s']:.1f}s",
+        f"{report['requests']} requests = {report['requests_per_s']:,.0f} requests/s, errors: {report['errors'] or 0}",
+        "Latency (ms): " + ", ".join(f"p{point}={value:.2f}" for point, value in report["latency_ms"].items()),
+    ]
+    for kind, values in report["latency_ms_by_kind"].items():
+        lines.append(f"  {kind:<7} " + ", ".join(f"p{point}={value:.2f}" for point, value in values.items()))
+    server = report["server"]
+    lines.append(f"Server: {server['cache_hits']} cache hits of {server['requests']} requests, "
+                 f"{server['play_batches']} play batches, {server['rating_batches']} rating writes")
+    return "\n".join(lines)
+
+
+def start_server(json_file):
+    """Start api_server on a free port; returns (process, host, port) once it serves."""
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "api_server.py"), json_file, "--port", "0"],
+                               cwd=os.path.dirname(json_file), stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if line.startswith("Serving"):
+            address = urlsplit(line.split()[-1])
+            return process, address.hostname, address.port
+    raise RuntimeError(f"api_server exited with code {process.wait()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the jukebox HTTP API.")
+    parser.add_argument("--url", help="server to test (default: start one on a synthetic catalog)")
+    parser.add_argument("--tracks", type=int, default=1_000_000, help="size of the synthetic catalog")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--processes", type=int, default=min(4, os.cpu_count() or 1), help="client processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--mix", type=parse_mix, default=MIX, help="request kinds and weights, e.g. track=80,play=20")
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        address = urlsplit(args.url)
+        report = load_test(address.hostname, address.port, args.mix, args.connections, args.processes, args.duration)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            json_file = os.path.join(directory, "song.json")
+            started = time.perf_counter()
+            write_records(json_file, make_records(args.tracks))
+            written = time.perf_counter()
+            process, host, port = start_server(json_file)
+            print(f"Catalog written in {written - started:.1f}s, server ready in {time.perf_counter() - written:.1f}s")
+            try:
+                report = load_test(host, port, args.mix, args.connections, args.processes, args.duration)
+            finally:
+                process.send_signal(signal.SIGINT)  # Lets the server fold its journal in before the directory goes
+                process.wait()
+
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
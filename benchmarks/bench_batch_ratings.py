@@ -0,0 +1,43 @@
+"""Re-rating many tracks: one save_rating per track (a rewrite each) versus one save_edits batch."""
+import os
+import sys
+import tempfile
+import time
+
+import tracks_library as lib
+from catalog_loader import write_records
+from benchmarks.synthetic import make_records
+
+
+def rate_each(keys, rating):
+    for key in keys:
+        lib.save_rating(key, rating)
+
+
+def rate_batch(keys, rating):
+    lib.save_edits(ratings=dict.fromkeys(keys, rating))
+
+
+def main(count=10_000, edits=200):
+    with tempfile.TemporaryDirectory() as directory:
+        json_file = os.path.join(directory, "song.json")
+        write_records(json_file, make_records(count))
+        lib.load_library_from_json(json_file)
+        keys = list(lib.library)[::max(1, count // edits)][:edits]
+        results = []
+        for rating, rate in ((5, rate_each), (1, rate_batch)):
+            started = time.perf_counter()
+            rate(keys, rating)
+            results.append(time.perf_counter() - started)
+        lib.load_library_from_json(json_file)
+        assert all(lib.get_rating(key) == 1 for key in keys)
+        lib.close_storage(json_file)
+        lib.library = lib.index = None  # Unmap the snapshot before the directory goes away
+    before, after = results
+    print(f"catalog size: {count} tracks, {len(keys)} ratings changed")
+    print(f"save_rating per track: {before:>9.3f} s ({len(keys)} rewrites)")
+    print(f"save_edits batch:      {after:>9.3f} s (1 rewrite, {before / after:.0f}x)")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
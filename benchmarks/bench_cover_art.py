@@ -0,0 +1,55 @@
+"""Cover fetch latency and cache hit rate against a local server with artificial latency."""
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from cover_art import CoverArtFetcher
+from benchmarks.http_stub import CoverServer
+
+LATENCY = 0.05  # Seconds the stub server waits before answering
+COVERS = 200
+SELECTIONS = 1000
+
+
+def run(fetcher, urls, rng):
+    """Fetch a Zipf-skewed sequence of covers, as a user clicking through popular tracks would."""
+    weights = [1.0 / (rank + 1) for rank in range(len(urls))]
+    picks = rng.choices(urls, weights=weights, k=SELECTIONS)
+    start = time.perf_counter()
+    for url in picks:
+        fetcher.fetch(url).result()
+    return time.perf_counter() - start
+
+
+def report(label, fetcher, elapsed):
+    latencies = sorted(fetcher.latencies)
+    p50 = statistics.median(latencies) * 1000
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000
+    print(f"{label:<12} {elapsed:>8.2f}s  p50 {p50:>7.2f} ms  p95 {p95:>7.2f} ms  "
+          f"hit rate {fetcher.hit_rate():>5.1%}  {fetcher.stats}")
+
+
+def main(latency=LATENCY):
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as cache_dir, CoverServer(latency=latency) as server:
+        urls = [server.url(f"{i}.png") for i in range(COVERS)]
+
+        cold = CoverArtFetcher(cache_dir)
+        report("cold", cold, run(cold, urls, rng))
+        cold.close()
+
+        # A fresh process: memory is empty, the disk cache is revalidated with conditional requests
+        revalidate = CoverArtFetcher(cache_dir, max_age=0)
+        report("revalidate", revalidate, run(revalidate, urls, rng))
+        revalidate.close()
+
+        warm = CoverArtFetcher(cache_dir)
+        report("warm disk", warm, run(warm, urls, rng))
+        warm.close()
+        print(f"server requests: {server.requests} ({server.not_modified} answered 304)")
+
+
+if __name__ == "__main__":
+    main(*[float(arg) for arg in sys.argv[1:]])
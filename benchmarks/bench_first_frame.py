@@ -0,0 +1,71 @@
+"""Startup cost of the main window: import time per module and wall-clock time to the first frame.
+
+    python -m benchmarks.bench_first_frame [runs]
+
+Imports are measured with -X importtime in a fresh interpreter. The first
+frame is timed from launching the interpreter until the main window has been
+drawn once; that part needs a display and is skipped without one.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("PIL", "requests", "numpy", "sqlite3")  # Must not load before the user asks for them
+FIRST_FRAME = (
+    "import track_player\n"
+    "window = track_player.build_window()\n"
+    "window.update()\n"
+    "print('ready', flush=True)\n"
+    "window.destroy()\n"
+)
+
+
+def import_times(module="track_player"):
+    """Return ({module: (self_us, cumulative_us)}, heavy modules loaded) for importing module."""
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    heavy = [name for name in result.stdout.strip().split(",") if name]
+    return times, heavy
+
+
+def first_frame_seconds():
+    """Return seconds from launch to the first drawn frame, or None without a display."""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", FIRST_FRAME], cwd=ROOT,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    elapsed = time.perf_counter() - started
+    process.communicate()
+    return elapsed if line.startswith("ready") else None
+
+
+def main(runs=5):
+    totals = []
+    for _ in range(runs):
+        times, heavy = import_times()
+        totals.append(times["track_player"][1])
+    print(f"import track_player: {statistics.median(totals) / 1000:.1f} ms (median of {runs})")
+    print(f"heavy modules loaded at import: {', '.join(heavy) or 'none'}")
+    print("slowest modules (self time):")
+    for name, (self_us, _) in sorted(times.items(), key=lambda item: -item[1][0])[:10]:
+        print(f"  {name:<30} {self_us / 1000:>7.1f} ms")
+
+    frames = [first_frame_seconds() for _ in range(runs)]
+    if None in frames:
+        print("time to first frame: skipped (no display)")
+    else:
+        print(f"time to first frame: {statistics.median(frames) * 1000:.0f} ms (median of {runs})")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,84 @@
+"""Bulk catalog ingestion: tracks per second with 1 to N worker processes, and how the time splits.
+
+    python -m benchmarks.bench_ingest [library tracks] [shards] [tracks per shard] [max workers]
+
+Shards alternate between CSV and JSON. A third of each shard's tracks are
+already in the library, spelled differently (case, "(Remastered)", "feat.")
+one time in two, and a tenth repeat a track of an earlier shard. The library
+file is copied afresh for every run, since each one commits to it.
+"""
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import catalog_ingest
+from benchmarks.synthetic import make_records
+from catalog_loader import write_records
+from track_csv import COLUMNS
+
+VARIANTS = (str.upper, lambda title: title + " (Remastered 2011)", lambda title: title + " - Radio Edit")
+
+
+def make_shards(directory, library, shards, size, rng):
+    """Write the shard files; returns their paths."""
+    fresh = make_records(shards * size, seed=99)
+    earlier = []
+    paths = []
+    for number in range(shards):
+        records = []
+        for _ in range(size):
+            roll = rng.random()
+            if roll < 1 / 3:
+                record = dict(rng.choice(library), play_count=rng.randrange(50))
+                if rng.random() < 0.5:
+                    record["title"] = rng.choice(VARIANTS)(record["title"])
+            elif roll < 0.43 and earlier:
+                record = dict(rng.choice(earlier))
+            else:
+                record = next(fresh)
+            records.append(record)
+        earlier.extend(records[:100])
+        path = os.path.join(directory, f"shard{number}." + ("csv" if number % 2 else "json"))
+        if number % 2:
+            with open(path, "w", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file)
+                writer.writerow(COLUMNS)
+                writer.writerows((song["title"], song["singer"], song["rating"], song["play_count"]) for song in records)
+        else:
+            write_records(path, records)
+        paths.append(path)
+    return paths
+
+
+def main(tracks=200_000, shards=16, size=25_000, workers=None):
+    workers = workers or os.cpu_count() or 1
+    rng = random.Random(0)
+    library = list(make_records(tracks))
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "source.json")
+        write_records(source, library)
+        paths = make_shards(directory, library, shards, size, rng)
+        print(f"{shards} shards of {size} tracks into a {tracks}-track library, {os.cpu_count()} CPUs")
+        baseline = None
+        for count in range(1, workers + 1):
+            library_file = os.path.join(directory, f"song{count}.json")
+            shutil.copyfile(source, library_file)
+            started = time.perf_counter()
+            parsed = catalog_ingest.parse(paths, library_file, workers=count)
+            parse_time = time.perf_counter() - started
+            report = catalog_ingest.commit(parsed)
+            total = time.perf_counter() - started
+            catalog_ingest.lib.close_storage(library_file)
+            baseline = baseline or total
+            print(f"{count:>2} workers: {report['read'] / total:>9,.0f} tracks/s, {total:6.2f} s "
+                  f"(parse {parse_time:.2f} s, commit {total - parse_time:.2f} s), speed-up {baseline / total:.2f}x; "
+                  f"{report['added']} added, {report['updated']} updated, "
+                  f"{report['exact']} exact and {report['near']} near duplicates")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
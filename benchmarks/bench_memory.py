@@ -0,0 +1,55 @@
+"""Compare memory used by the columnar TrackStore with a dict of LibraryItem objects."""
+import gc
+import sys
+import tracemalloc
+
+from tracks_library import LibraryItem
+from track_store import TrackStore
+from benchmarks.synthetic import make_records
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+
+def build_dict(count):
+    library = {}
+    for index, song in enumerate(make_records(count), start=1):
+        library[str(index).zfill(2)] = LibraryItem(
+            song["title"], song["singer"], song["rating"], song["link"],
+            song["image_url"], song["play_count"],
+        )
+    return library
+
+
+def build_store(count):
+    store = TrackStore()
+    for index, song in enumerate(make_records(count), start=1):
+        store.add(
+            str(index).zfill(2), song["title"], song["singer"], song["rating"],
+            song["link"], song["image_url"], song["play_count"],
+        )
+    return store
+
+
+def measure(builder, count):
+    """Return the bytes still allocated by the structure builder(count) returns."""
+    gc.collect()
+    tracemalloc.start()
+    structure = builder(count)
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del structure
+    return current
+
+
+def main(sizes=SIZES):
+    print(f"{'tracks':>10} {'dict (MB)':>12} {'store (MB)':>12} {'saving':>8}")
+    for count in sizes:
+        dict_bytes = measure(build_dict, count)
+        store_bytes = measure(build_store, count)
+        saving = 1 - store_bytes / dict_bytes
+        print(f"{count:>10} {dict_bytes / 2**20:>12.1f} {store_bytes / 2**20:>12.1f} {saving:>8.0%}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,102 @@
+"""Load test for play_daemon: dozens of client processes sending play batches at once.
+
+    python -m benchmarks.bench_play_daemon [clients] [batches per client]
+
+Every client records the plays it sent; after the daemon's final write the
+counts in song.json must equal the starting counts plus every play sent. For
+contrast, the same clients then save by read-modify-write of song.json, the
+way the windows used to, and the lost increments are counted.
+"""
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks.synthetic import make_records
+from catalog_loader import iter_records, write_records
+from play_daemon import PlayClient, PlayDaemon
+
+TRACKS = 1000
+PLAYS_PER_BATCH = 10
+
+
+def batches_for(seed, batches):
+    rng = random.Random(seed)
+    for _ in range(batches):
+        yield Counter(str(rng.randrange(1, TRACKS + 1)).zfill(2) for _ in range(PLAYS_PER_BATCH))
+
+
+def daemon_client(socket_path, seed, batches, results):
+    client = PlayClient(socket_path)
+    sent = Counter()
+    for plays in batches_for(seed, batches):
+        client.send(plays=dict(plays))
+        sent.update(plays)
+    client.close()
+    results.put(dict(sent))
+
+
+def rewrite_client(json_file, seed, batches, results):
+    sent = Counter()
+    for plays in batches_for(seed, batches):
+        with open(json_file, encoding="utf-8") as file:
+            songs = json.load(file)
+        for key, count in plays.items():
+            songs[int(key) - 1]["play_count"] += count
+        write_records(json_file, songs)
+        sent.update(plays)
+    results.put(dict(sent))
+
+
+def run_clients(target, first_arg, clients, batches):
+    """Run the clients as separate processes; returns (plays sent per key, seconds)."""
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=target, args=(first_arg, seed, batches, results))
+                 for seed in range(clients)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    sent = Counter()
+    for _ in processes:
+        sent.update(results.get())
+    for process in processes:
+        process.join()
+    return sent, time.perf_counter() - started
+
+
+def file_counts(json_file):
+    return Counter({str(position).zfill(2): song["play_count"]
+                    for position, song in enumerate(iter_records(json_file), start=1)})
+
+
+def main(clients=48, batches=200):
+    with tempfile.TemporaryDirectory() as directory:
+        json_file = os.path.join(directory, "song.json")
+        write_records(json_file, make_records(TRACKS))
+        before = file_counts(json_file)
+
+        daemon = PlayDaemon(json_file, os.path.join(directory, "play.sock"))
+        daemon.start()
+        sent, seconds = run_clients(daemon_client, daemon.socket_path, clients, batches)
+        daemon.stop()
+        lost = sum((before + sent - file_counts(json_file)).values())
+        plays = sum(sent.values())
+        print(f"daemon:  {clients} clients, {plays} plays in {seconds:.2f}s "
+              f"= {plays / seconds:,.0f} plays/s, {clients * batches / seconds:,.0f} batches/s, "
+              f"{daemon.stats['writes']} file writes, lost increments: {lost}")
+
+        before = file_counts(json_file)
+        rewrite_batches = max(1, batches // 20)
+        sent, seconds = run_clients(rewrite_client, json_file, clients, rewrite_batches)
+        lost = sum((before + sent - file_counts(json_file)).values())
+        plays = sum(sent.values())
+        print(f"rewrite: {clients} clients, {plays} plays in {seconds:.2f}s "
+              f"= {plays / seconds:,.0f} plays/s, lost increments: {lost}")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
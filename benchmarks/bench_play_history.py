@@ -0,0 +1,64 @@
+"""Play history: recording rate, range query and trending times, and memory after a simulated month of plays."""
+import random
+import sys
+import time
+
+from play_history import PlayHistory
+from simulator import Popularity
+
+
+def series_bytes(history):
+    """Return the bytes held by the history's dicts and series."""
+    total = 0
+    for series_by_name in (history._tracks, history._artists):
+        total += sys.getsizeof(series_by_name)
+        total += sum(sys.getsizeof(series) + sys.getsizeof(series.counts) + sys.getsizeof(series.newest)
+                     for series in series_by_name.values())
+    return total
+
+
+def main(tracks=100_000, plays=2_000_000, days=35):
+    rng = random.Random(0)
+    popularity = Popularity([f"{key:06d}" for key in range(1, tracks + 1)], seed=0)
+    artists = {key: f"Artist {int(key) % 2000}" for key in popularity.keys}
+    now = [1_699_920_000.0]
+    history = PlayHistory(lambda: now[0], utc_offset=0)
+    step = days * 86400 / plays
+    picks = [popularity.pick(rng) for _ in range(plays)]
+
+    started = time.perf_counter()
+    for key in picks:
+        now[0] += step
+        history.record(key, artists[key])
+    recorded = time.perf_counter() - started
+    memory = series_bytes(history)
+
+    hit = popularity.keys[0]
+    queries = []
+    for start in (now[0] - 600, now[0] - 6 * 3600, history.today(), now[0] - 20 * 86400):
+        started = time.perf_counter()
+        for _ in range(10_000):
+            history.track_plays(hit, start)
+        queries.append((time.perf_counter() - started) / 10_000)
+    started = time.perf_counter()
+    history.artist_plays(artists[hit], now[0] - 86400)
+    artist = time.perf_counter() - started
+    started = time.perf_counter()
+    trending = history.trending()
+    trend = time.perf_counter() - started
+    started = time.perf_counter()
+    history.most_played(history.today())
+    today = time.perf_counter() - started
+
+    print(f"{plays} plays of {tracks} tracks over {days} days, {len(history)} series kept")
+    print(f"record:            {plays / recorded:>12,.0f} plays/s")
+    print(f"memory:            {memory / 1e6:>12.1f} MB ({memory / len(history):.0f} B per series)")
+    print("track_plays:       " + ", ".join(f"{label} {seconds * 1e6:.1f} us" for label, seconds in
+                                            zip(("10 min", "6 h", "today", "20 days"), queries)))
+    print(f"artist_plays:      {artist * 1e6:>12.1f} us (1 day)")
+    print(f"trending:          {trend * 1000:>12.1f} ms (top: {trending[0][0]} with {trending[0][1]} plays)")
+    print(f"most_played today: {today * 1000:>12.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
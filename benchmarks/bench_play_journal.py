@@ -0,0 +1,58 @@
+"""Plays per second when saving play counts by rewriting song.json versus appending to the journal."""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import tracks_library as lib
+from catalog_loader import write_records
+from benchmarks.synthetic import make_records
+
+DURATION = 2.0  # Seconds spent on each strategy
+
+
+def save_by_rewrite(json_file, track):
+    """The previous Viewtracks.save_play_count_to_json: read, scan and rewrite the whole file."""
+    with open(json_file, 'r+', encoding='utf-8') as file:
+        songs = json.load(file)
+        for song in songs:
+            if song["title"] == track.title and song["singer"] == track.singer:
+                song["play_count"] = track.play_count
+                break
+        file.seek(0)
+        json.dump(songs, file, indent=4)
+        file.truncate()
+
+
+def save_by_journal(json_file, track):
+    lib.save_play_count(track.key)
+
+
+def plays_per_second(json_file, save):
+    keys = list(lib.library)
+    plays = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        track = lib.library[keys[plays % len(keys)]]
+        track.play_count += 1
+        save(json_file, track)
+        plays += 1
+    return plays / (time.perf_counter() - start)
+
+
+def main(count=10_000):
+    with tempfile.TemporaryDirectory() as directory:
+        json_file = os.path.join(directory, "song.json")
+        write_records(json_file, make_records(count))
+        lib.load_library_from_json(json_file)
+        before = plays_per_second(json_file, save_by_rewrite)
+        after = plays_per_second(json_file, save_by_journal)
+        lib.get_journal(json_file).close()
+    print(f"catalog size: {count} tracks")
+    print(f"rewrite song.json: {before:>12.1f} plays/s")
+    print(f"play journal:      {after:>12.1f} plays/s ({after / before:.0f}x)")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,39 @@
+"""Time building, playing and saving a large playlist."""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import tracks_library as lib
+from catalog_loader import write_records
+from playlist import Playlist
+from benchmarks.synthetic import make_records
+
+
+def timed(label, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{label:<28} {(time.perf_counter() - start) * 1000:>9.1f} ms")
+    return result
+
+
+def main(entries=100_000, catalog=100_000):
+    with tempfile.TemporaryDirectory() as directory:
+        json_file = os.path.join(directory, "song.json")
+        write_records(json_file, make_records(catalog))
+        lib.load_library_from_json(json_file)
+        rng = random.Random(5)
+        keys = [lib.make_key(rng.randint(1, catalog)) for _ in range(entries)]
+
+        playlist = Playlist(repeat=2)
+        timed(f"add {entries} entries", lambda: [playlist.add(key) for key in keys])
+        timed("shuffle", playlist.shuffle_entries)
+        timed("display text", lambda: "".join(f"{lib.get_song(key)} - {lib.get_singer(key)}\n" for key in playlist))
+        counts = timed("play counts", playlist.play_counts)
+        timed("record plays (one write)", lambda: lib.record_plays(counts))
+        timed("compact into song.json", lib.get_journal(json_file).close)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
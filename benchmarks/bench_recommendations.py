@@ -0,0 +1,49 @@
+"""Co-play index: playlists recorded per second, suggestion latency, and saving and reopening the index."""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from recommendations import CoPlayIndex
+from simulator import Popularity
+
+
+def main(tracks=1_000_000, playlists=20_000, length=20):
+    rng = random.Random(0)
+    popularity = Popularity(list(range(1, tracks + 1)), seed=0)
+    played = [[popularity.pick(rng) for _ in range(length)] for _ in range(playlists)]
+    with tempfile.TemporaryDirectory() as directory:
+        index = CoPlayIndex(os.path.join(directory, "song.json.coplay"))
+        started = time.perf_counter()
+        pairs = sum(index.record(playlist) for playlist in played)
+        recorded = time.perf_counter() - started
+
+        seeds = [playlist[:5] for playlist in played[:1000]]
+        started = time.perf_counter()
+        for seed in seeds:
+            index.suggest(seed)
+        suggested = (time.perf_counter() - started) / len(seeds)
+
+        started = time.perf_counter()
+        index.save()
+        saved = time.perf_counter() - started
+        size = os.path.getsize(index.path)
+        started = time.perf_counter()
+        reopened = CoPlayIndex(index.path).load()
+        opened = time.perf_counter() - started
+        assert reopened.suggest(seeds[0]) == index.suggest(seeds[0])
+        started = time.perf_counter()
+        reopened.record(played[0])
+        first_record = time.perf_counter() - started
+
+    print(f"{playlists} playlists of {length} over {tracks} tracks: {len(index.pairs)} pairs, {len(index.top)} top lists")
+    print(f"record:          {playlists / recorded:>10,.0f} playlists/s ({pairs / recorded:,.0f} pair updates/s)")
+    print(f"suggest:         {suggested * 1e6:>10.1f} us (5 seeds)")
+    print(f"save:            {saved * 1000:>10.1f} ms, {size / 1e6:.1f} MB")
+    print(f"open (top only): {opened * 1000:>10.1f} ms")
+    print(f"first record:    {first_record * 1000:>10.1f} ms (reads the pairs)")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
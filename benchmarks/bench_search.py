@@ -0,0 +1,57 @@
+"""Time title and singer searches through the inverted index against the previous linear scan."""
+import random
+import statistics
+import sys
+import time
+
+from track_store import TrackStore
+from track_index import TrackIndex, tokenize
+from benchmarks.synthetic import make_records
+
+SIZES = (10_000, 100_000, 1_000_000)
+QUERIES = 200
+
+
+def build(count):
+    store = TrackStore()
+    index = TrackIndex(store)
+    for position, song in enumerate(make_records(count), start=1):
+        index.add(store.add(str(position).zfill(2), song["title"], song["singer"], song["rating"],
+                            song["link"], song["image_url"], song["play_count"]))
+    return store, index
+
+
+def median_us(function, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        function(query)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6
+
+
+def main(sizes=SIZES):
+    rng = random.Random(7)
+    print(f"{'tracks':>10} {'build (s)':>10} {'title (us)':>11} {'singer (us)':>12} {'scan (us)':>11}")
+    for count in sizes:
+        start = time.perf_counter()
+        store, index = build(count)
+        build_time = time.perf_counter() - start
+
+        rows = [rng.randrange(count) for _ in range(QUERIES)]
+        # A full first word plus the start of the second, as typed into a search box
+        title_queries = []
+        for row in rows:
+            tokens = tokenize(store.title_at(row))
+            title_queries.append(f"{tokens[0]} {tokens[1][:3]}")
+        singer_queries = [store.singer_name(store.singer_code_at(row)) for row in rows]
+
+        title_us = median_us(index.search_titles, title_queries)
+        singer_us = median_us(lambda q: index.search_singers(q, limit=50), singer_queries)
+        scan_us = median_us(lambda q: [key for key, track in store.items() if q in track.singer],
+                            singer_queries[:5])
+        print(f"{count:>10} {build_time:>10.1f} {title_us:>11.1f} {singer_us:>12.1f} {scan_us:>11.0f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
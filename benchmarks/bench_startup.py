@@ -0,0 +1,50 @@
+"""Compare startup from song.json with startup from the memory-mapped snapshot.
+
+"first rows" is how long until the first batch reaches the window, "full"
+includes building the search index.
+"""
+import gc
+import os
+import sys
+import tempfile
+import time
+
+import catalog_snapshot
+import tracks_library as lib
+from benchmarks.synthetic import make_records
+from catalog_loader import write_records
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+
+def time_load(json_file, use_snapshot):
+    """Return (seconds to first batch, seconds to full load)."""
+    lib.library = lib.index = None  # Free the previous library outside the timed part
+    gc.collect()
+    started = time.perf_counter()
+    batches = lib.iter_load_library(json_file, use_snapshot=use_snapshot)
+    next(batches)
+    first = time.perf_counter() - started
+    for _ in batches:
+        pass
+    return first, time.perf_counter() - started
+
+
+def main(sizes=SIZES):
+    print(f"{'tracks':>10} {'json first':>11} {'json full':>10} {'snap first':>11} {'snap full':>10} {'snap MB':>8}")
+    for count in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            json_file = os.path.join(directory, "song.json")
+            write_records(json_file, make_records(count))
+            json_first, json_full = time_load(json_file, use_snapshot=False)
+            catalog_snapshot.import_json(json_file)
+            snap_first, snap_full = time_load(json_file, use_snapshot=True)
+            snap_size = os.path.getsize(catalog_snapshot.snapshot_path(json_file))
+            lib.library.close()
+            lib.get_journal(json_file).close()
+            print(f"{count:>10} {json_first * 1000:>9.1f}ms {json_full:>9.2f}s "
+                  f"{snap_first * 1000:>9.1f}ms {snap_full:>9.2f}s {snap_size / 2**20:>8.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,70 @@
+"""Main-thread cost of showing a cover: full-size decode versus the thumbnail pipeline.
+
+    python -m benchmarks.bench_thumbnails [width] [height]
+
+Tk cannot start without a display, so the PhotoImage step is stood in for by
+decoding the same PNG with Pillow. The old path decodes the full cover on the
+Tk thread; the new one decodes only the display-size PNG there, and the
+resize runs in the process pool (timed separately, first and cached).
+"""
+import io
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import Future
+
+from PIL import Image
+
+from thumbnails import Thumbnails
+
+RUNS = 20
+
+
+class StaticFetcher:
+    """Stands in for a warm cover_art cache: every URL resolves to the same bytes."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def fetch(self, url):
+        future = Future()
+        future.set_result(self.data)
+        return future
+
+
+def noisy_png(width, height):
+    """A cover-sized PNG that does not compress to nothing."""
+    rng = random.Random(1)
+    image = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def decode_ms(png):
+    started = time.perf_counter()
+    for _ in range(RUNS):
+        Image.open(io.BytesIO(png)).load()
+    return (time.perf_counter() - started) / RUNS * 1000
+
+
+def main(width=1500, height=1500):
+    cover = noisy_png(width, height)
+    with tempfile.TemporaryDirectory() as directory:
+        thumbnails = Thumbnails(StaticFetcher(cover), directory)
+        started = time.perf_counter()
+        thumbnail = thumbnails.thumbnail("cover-1").result()
+        first_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        thumbnails.thumbnail("cover-2").result()
+        disk_ms = (time.perf_counter() - started) * 1000
+        thumbnails.close()
+    print(f"cover {width}x{height}, {len(cover) / 1024:.0f} KiB; thumbnail {len(thumbnail) / 1024:.0f} KiB")
+    print(f"Tk thread, full-size decode:  {decode_ms(cover):8.2f} ms per selection")
+    print(f"Tk thread, thumbnail decode:  {decode_ms(thumbnail):8.2f} ms per selection (0 when prefetched)")
+    print(f"pool, first resize (with process start): {first_ms:8.1f} ms; from disk cache: {disk_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
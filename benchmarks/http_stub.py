@@ -0,0 +1,67 @@
+"""A local HTTP server that serves fake cover images with ETag/Last-Modified support."""
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+class CoverServer:
+    """Serves /covers/<name> with a fixed body per name, after an optional delay."""
+
+    def __init__(self, latency=0.0, size=20_000):
+        self.latency = latency
+        self.size = size
+        self.requests = 0
+        self.not_modified = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, so pooled connections are reused
+
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(server.latency)
+                body = server.body(self.path)
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if not self.path.startswith("/covers/"):
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", LAST_MODIFIED)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def body(self, path):
+        seed = hashlib.sha256(path.encode("utf-8")).digest()
+        return (seed * (self.size // len(seed) + 1))[:self.size]
+
+    def url(self, name):
+        return f"http://127.0.0.1:{self.httpd.server_port}/covers/{name}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,207 @@
+"""Headless benchmark suite over synthetic catalogs; results are written as JSON.
+
+    python -m benchmarks.suite [--sizes 1000,100000,1000000] [--output FILE] [--compare OLD_FILE]
+
+Every case runs against a fresh song.json-shaped catalog in a temporary
+directory and never starts Tk. Each result records the median of a few runs,
+so two result files can be compared with --compare to spot regressions.
+"""
+import argparse
+import heapq
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import catalog_snapshot
+import charts
+import tracks_library as lib
+from benchmarks.synthetic import make_records
+from catalog_loader import write_records
+from track_csv import read_track_rows, write_track_rows
+
+SIZES = (1_000, 100_000, 1_000_000)
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+PLAYS = 1000  # Play counts saved per run of the persistence cases
+PLAY_EVENTS = 10_000  # Play events per run of the chart case, with the top 10 read after every REFRESH_EVERY
+REFRESH_EVERY = 10
+REGRESSION = 1.2  # --compare flags cases that got this much slower...
+NOISE_S = 0.005  # ...and by at least this many seconds, so tiny timings do not trip it
+
+
+def repeats(count):
+    """Runs per case; the largest catalogs get fewer."""
+    return 5 if count <= 10_000 else 3 if count <= 100_000 else 1
+
+
+def measure(func, runs, setup=None):
+    """Return the wall-clock seconds of each run of func()."""
+    times = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def top_and_rare_artist():
+    """Return the singer with the most tracks and one with the fewest."""
+    sizes = {}
+    for row in range(len(lib.library)):
+        code = lib.library.singer_code_at(row)
+        sizes[code] = sizes.get(code, 0) + 1
+    ordered = sorted(sizes, key=sizes.get)
+    return lib.library.singer_name(ordered[-1]), lib.library.singer_name(ordered[0])
+
+
+def run_size(count, directory):
+    """Yield (case, ops, times) for a catalog of count tracks."""
+    json_file = os.path.join(directory, "song.json")
+    csv_file = os.path.join(directory, "tracks.csv")
+    write_records(json_file, make_records(count))
+    runs = repeats(count)
+
+    def drop_snapshot():
+        snap_file = catalog_snapshot.snapshot_path(json_file)
+        if os.path.exists(snap_file):
+            os.remove(snap_file)
+
+    yield "load_library_from_json (parse)", 1, measure(lambda: lib.load_library_from_json(json_file), runs,
+                                                       setup=drop_snapshot)
+    yield "load_library_from_json (snapshot)", 1, measure(lambda: lib.load_library_from_json(json_file), runs)
+    lib.load_library_from_json(json_file)
+    lib.index.catch_up()
+
+    yield "list_all", 1, measure(lib.list_all, runs)
+    top, rare = top_and_rare_artist()
+    yield "list_by_artist (top artist)", 1, measure(lambda: lib.list_by_artist(top), runs)
+    yield "list_by_artist (rare artist)", 1, measure(lambda: lib.list_by_artist(rare), runs)
+    yield "get_all_artists", 1, measure(lib.get_all_artists, runs)
+
+    keys = [lib.library.key_at(row) for row in range(0, len(lib.library), max(1, len(lib.library) // PLAYS))][:PLAYS]
+
+    def save_each():
+        for key in keys:
+            lib.library[key].play_count += 1
+            lib.save_play_count(key)
+
+    yield "save_play_count", len(keys), measure(save_each, runs)
+    yield "record_plays (batch)", len(keys), measure(lambda: lib.record_plays(dict.fromkeys(keys, 1)), runs)
+    yield "play journal compaction", 1, measure(lib.get_journal(json_file).compact, runs,
+                                                setup=lambda: lib.record_plays(dict.fromkeys(keys, 1)))
+
+    ratings = iter(range(1_000_000))
+    yield "save_rating", 1, measure(lambda: lib.save_rating(keys[0], next(ratings) % 6), runs)
+    yield "save_edits (batch ratings)", len(keys), measure(
+        lambda: lib.save_edits(ratings=dict.fromkeys(keys, next(ratings) % 6)), runs)
+
+    tracks = lambda: map(lib.library.view_at, range(len(lib.library)))
+    played = lambda track: track.play_count > 0
+    yield "csv export (played tracks)", 1, measure(lambda: write_track_rows(csv_file, tracks(), played), runs)
+    yield "csv import", 1, measure(lambda: read_track_rows(csv_file), runs)
+
+    chart = charts.Charts()
+    yield "charts build", 1, measure(chart.top_played, runs, setup=lambda: setattr(chart, "store", None))
+    events = [keys[i % len(keys)] for i in range(PLAY_EVENTS)]
+
+    def plays_with_refresh():
+        for i, key in enumerate(events, start=1):
+            lib.update_play_count(key, lib.library[key].play_count + 1)
+            if i % REFRESH_EVERY == 0:
+                chart.top_played()
+
+    yield "charts refresh under plays", PLAY_EVENTS, measure(plays_with_refresh, runs)
+    store = lib.library
+    yield "top 10 by full scan", 1, measure(lambda: heapq.nlargest(10, range(len(store)), key=store.play_count_at), runs)
+    yield "csv export (played, from chart)", 1, measure(
+        lambda: write_track_rows(csv_file, map(store.view_at, chart.played_rows())), runs)
+    lib.remove_listener(chart.tracks_changed)
+
+    if importlib.util.find_spec("numpy") is not None:  # Optional dependency of the statistics
+        import analytics
+        yield "analytics export", 1, measure(analytics.export_arrays, runs)
+        arrays = analytics.export_arrays()
+        yield "analytics report", 1, measure(lambda: analytics.build_report(arrays), runs)
+
+    lib.get_storage(json_file).close()
+    lib.library = lib.index = None  # Unmap the snapshot before the directory goes away
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(RESULTS_DIR), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes):
+    results = []
+    for count in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            for case, ops, times in run_size(count, directory):
+                median = statistics.median(times)
+                results.append({"case": case, "tracks": count, "ops": ops, "median_s": median,
+                                "min_s": min(times), "runs_s": times})
+                print(f"{count:>9} {case:<36} {median * 1000:>10.2f} ms"
+                      + (f"  ({median / ops * 1e6:.1f} us/op)" if ops > 1 else ""))
+    return {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(old, new):
+    """Print each case's change against an earlier result file; returns the regressed cases."""
+    before = {(result["case"], result["tracks"]): result["median_s"] for result in old["results"]}
+    regressed = []
+    for result in new["results"]:
+        key = (result["case"], result["tracks"])
+        if key not in before:
+            continue
+        ratio = result["median_s"] / before[key] if before[key] else float("inf")
+        flag = ""
+        if ratio >= REGRESSION and result["median_s"] - before[key] >= NOISE_S:
+            flag = "  REGRESSION"
+            regressed.append(key)
+        print(f"{key[1]:>9} {key[0]:<36} {ratio:>6.2f}x{flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma-separated catalog sizes")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<date>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare with")
+    args = parser.parse_args(argv)
+
+    report = run([int(size) for size in args.sizes.split(",")])
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            if compare(json.load(file), report):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
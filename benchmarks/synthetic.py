@@ -0,0 +1,38 @@
+import random
+
+_SYLLABLES = ["la", "mo", "ri", "ka", "ne", "so", "tu", "vi", "da", "pe", "lo", "shi", "ran", "mi", "zo", "ber"]
+
+
+def make_words(count, rng):
+    """Return count distinct pseudo-words built from syllables."""
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_records(count, artists=None, seed=1234):
+    """Yield synthetic song.json-shaped records.
+
+    Artist popularity follows a Zipf-like skew so a handful of singers own most
+    of the catalog, as in real libraries. Titles are two to four words from a
+    fixed vocabulary. Every string is built fresh, the way json.load would
+    produce it.
+    """
+    rng = random.Random(seed)
+    if artists is None:
+        artists = max(10, count // 50)
+    words = make_words(5000, rng)
+    names = [(rng.choice(words).title(), rng.choice(words).title()) for _ in range(artists)]
+    weights = [1.0 / (rank + 1) for rank in range(artists)]
+    picks = rng.choices(range(artists), weights=weights, k=count)
+    for index, artist in enumerate(picks, start=1):
+        title = " ".join(rng.choice(words) for _ in range(rng.randint(2, 4)))
+        yield {
+            "title": title.title(),
+            "singer": f"{names[artist][0]} {names[artist][1]}",
+            "rating": rng.randint(0, 5),
+            "link": f"https://www.youtube.com/watch?v={index:011d}",
+            "image_url": f"https://example.com/covers/{index}.png",
+            "play_count": rng.randrange(1000),
+        }
@@ -0,0 +1,61 @@
+import os
+import threading
+from catalog_loader import iter_records, write_records
+
+stats = {"parses": 0, "hits": 0}  # How often a catalog file was parsed versus served from memory
+
+_lock = threading.Lock()
+_entries = {}  # absolute path -> (signature, records tuple or None)
+
+
+def signature(json_file):
+    """Return what identifies a version of the file on disk: (mtime in ns, size)."""
+    st = os.stat(json_file)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def load(json_file):
+    """Return the records of a catalog file as a tuple shared by every caller.
+
+    The file is only parsed again when its mtime or size has changed. Callers
+    must not modify the returned records; copy a record before changing it.
+    """
+    path = os.path.abspath(json_file)
+    current = signature(path)
+    with _lock:
+        cached, records = _entries.get(path, (None, None))
+        if cached == current and records is not None:
+            stats["hits"] += 1
+            return records
+    records = tuple(iter_records(path))
+    with _lock:
+        stats["parses"] += 1
+        _entries[path] = (current, records)
+    return records
+
+
+def save(json_file, records):
+    """Write records to a catalog file and keep them as the cached snapshot."""
+    records = tuple(records)
+    write_records(json_file, records)
+    path = os.path.abspath(json_file)
+    with _lock:
+        _entries[path] = (signature(path), records)
+
+
+def invalidate(json_file):
+    """Forget the cached snapshot of a file rewritten without going through save()."""
+    with _lock:
+        _entries.pop(os.path.abspath(json_file), None)
+
+
+def note_parse():
+    """Count a parse made outside load(), such as the streaming library loader."""
+    with _lock:
+        stats["parses"] += 1
+
+
+def note_hit():
+    """Count a parse avoided outside load()."""
+    with _lock:
+        stats["hits"] += 1
@@ -0,0 +1,249 @@
+"""Bulk ingestion of catalog shards (track list CSVs and song.json files) into the library.
+
+Shards are parsed and validated in a process pool with the rules of
+LibraryItem.__init__; the library file is read for duplicate detection in
+the same pool meanwhile. Every track is hashed twice with 64-bit BLAKE2b:
+
+    exact  title and singer with case, accents, punctuation and spacing normalized
+    near   the same, also ignoring word order, leading articles, "feat." credits
+           and qualifiers such as "(Remastered 2011)" or " - Radio Edit"
+
+Tracks sharing either hash are one track. Duplicates within a shard are
+merged in its worker, so only distinct tracks travel back; the parent then
+merges the shards in order and matches them against the library. The first
+copy of a track keeps its fields and the copies' play counts are merged
+into it (MERGES). New tracks and changed play counts are committed with one
+atomic write of the library file (tracks_library.add_tracks).
+
+    python catalog_ingest.py shard.csv more.json ... [--library song.json] [--workers 4] [--merge max]
+"""
+import argparse
+import hashlib
+import os
+import re
+from array import array
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import repeat
+
+import storage
+import tracks_library as lib
+from catalog_loader import iter_records, validate_record
+from track_csv import iter_track_row_batches
+from track_index import tokenize
+
+MERGES = {
+    "sum": lambda kept, other: kept + other,  # Counts from different sources add up
+    "max": max,  # Counts are totals, so shards that overlap do not double them
+}
+_QUALIFIED = re.compile(
+    r"[(\[][^)\]]*\b(?:feat|ft|featuring|with|remaster|remastered|version|edit|mono|stereo|single|radio|explicit|"
+    r"clean|deluxe|bonus)\b[^)\]]*[)\]]|\s-\s.*\b(?:remaster|remastered|version|edit|mono|stereo|single|radio|"
+    r"explicit|clean|deluxe|bonus)\b.*$", re.IGNORECASE)
+_FEATURING = re.compile(r"\s(?:feat|ft|featuring)\b.*$", re.IGNORECASE)
+_IGNORED = frozenset(("the", "a", "an", "and"))  # Words the near hash leaves out
+
+
+def _digest(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def fingerprints(title, singer):
+    """Return the (exact, near) hashes of a track."""
+    title_words, singer_words = tokenize(title), tokenize(singer)
+    exact = " ".join(title_words) + "\x1f" + " ".join(singer_words)
+    stripped = _FEATURING.sub("", _QUALIFIED.sub(" ", title))
+    words = sorted(word for word in (title_words if stripped == title else tokenize(stripped))
+                   if word not in _IGNORED)
+    if not words:
+        return _digest(exact), _digest(exact)  # Nothing left to compare but the exact form
+    stripped = _FEATURING.sub("", singer)
+    names = sorted(word for word in (singer_words if stripped == singer else tokenize(stripped))
+                   if word not in _IGNORED)
+    return _digest(exact), _digest(" ".join(words) + "\x1f" + " ".join(names))
+
+
+def _iter_shard(path, skipped):
+    """Yield song.json records for the valid tracks of a shard; invalid ones go to skipped as (position, reason)."""
+    if path.lower().endswith(".csv"):
+        for rows, _ in iter_track_row_batches(path, skipped=skipped):
+            for title, singer, rating, play_count in rows:
+                yield {"title": title, "singer": singer, "rating": rating, "link": "", "image_url": None,
+                       "play_count": play_count}
+    elif path.lower().endswith(".json"):
+        for position, song in enumerate(iter_records(path), start=1):
+            try:
+                fields = validate_record(song)
+                if not isinstance(fields["title"], str) or not isinstance(fields["singer"], str):
+                    raise ValueError("Title and singer must be text.")
+            except ValueError as e:
+                skipped.append((position, str(e)))
+                continue
+            yield {"title": fields["title"], "singer": fields["singer"], "rating": fields["rating"],
+                   "link": fields["link"], "image_url": fields["image_path"], "play_count": fields["play_count"]}
+    else:
+        raise ValueError("Shards must be .csv or .json files.")
+
+
+class _Merger:
+    """Distinct tracks by hash, merging the play counts of duplicates as they arrive."""
+
+    def __init__(self, merge):
+        self.merge = MERGES[merge]
+        self.tracks = []  # (exact, near, record)
+        self.slots = {}  # exact or near hash -> index in tracks
+        self.exact = self.near = 0  # Duplicates found
+
+    def add(self, exact, near, record):
+        slot = self.slots.get(exact)
+        if slot is not None:
+            self.exact += 1
+        else:
+            slot = self.slots.get(near)
+            if slot is None:
+                self.slots[exact] = self.slots[near] = len(self.tracks)
+                self.tracks.append((exact, near, record))
+                return
+            self.near += 1
+            self.slots.setdefault(exact, slot)
+        kept = self.tracks[slot][2]
+        kept["play_count"] = self.merge(kept["play_count"], record["play_count"])
+
+
+def parse_shard(path, merge="sum"):
+    """Read, validate and hash one shard; returns a dict of its distinct tracks and what was left out.
+
+    Runs in a pool process.
+    """
+    merger = _Merger(merge)
+    skipped = []
+    read = 0
+    try:
+        for record in _iter_shard(path, skipped):
+            read += 1
+            merger.add(*fingerprints(record["title"], record["singer"]), record)
+    except (OSError, ValueError) as e:  # Unreadable file, or not a JSON array
+        skipped.append((0, str(e)))
+    return {"path": path, "tracks": merger.tracks, "read": read, "exact": merger.exact, "near": merger.near,
+            "skipped": skipped}
+
+
+def hash_library(library_file):
+    """Return the track ids and hashes of a library file as arrays.
+
+    Runs in a pool process.
+    """
+    ids, exacts, nears = array("I"), array("Q"), array("Q")
+    backend = storage.open_storage(library_file, lib.make_key, lib.parse_key)  # Its own, not the library's
+    try:
+        for batch in backend.iter_batches():
+            for track_id, fields in batch:
+                exact, near = fingerprints(str(fields["title"]), str(fields["singer"]))
+                ids.append(track_id)
+                exacts.append(exact)
+                nears.append(near)
+    finally:
+        backend.close()
+    return {"ids": ids, "exact": exacts, "near": nears}
+
+
+def parse(paths, library_file=None, workers=None, merge="sum"):
+    """Parse shards and hash the library with workers processes (default: one per CPU); see commit()."""
+    library_file = os.path.abspath(library_file or lib.LIBRARY_FILE)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        library = hash_library(library_file)
+        shards = [parse_shard(path, merge) for path in paths]
+    else:
+        import multiprocessing
+        # Spawned rather than forked: the parent may run Tk and several threads
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            library = pool.submit(hash_library, library_file)
+            shards = list(pool.map(parse_shard, paths, repeat(merge)))
+            library = library.result()
+    return {"library_file": library_file, "merge": merge, "library": library, "shards": shards}
+
+
+def ingest_in_background(paths, library_file=None, workers=None, merge="sum"):
+    """Run parse() and commit() on a thread; returns a Future of the report. The library is not reloaded."""
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(commit(parse(paths, library_file, workers, merge)))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="catalog-ingest", daemon=True).start()
+    return future
+
+
+def commit(parsed):
+    """Merge parsed shards into their library file with one atomic write; returns a report.
+
+    The report counts tracks "read" from the shards, "added" to the library
+    and library tracks whose play count was "updated", "exact" and "near"
+    duplicates, and lists "skipped" records as (shard, position, reason).
+    "keys" are the new tracks' keys. Play counts are merged into those in
+    the library file and its journal while it is rewritten, not the library
+    in memory, so this may run off the Tk thread.
+    """
+    merger = _Merger(parsed["merge"])
+    report = {"read": 0, "skipped": []}
+    for shard in parsed["shards"]:
+        report["read"] += shard["read"]
+        merger.exact += shard["exact"]
+        merger.near += shard["near"]
+        report["skipped"].extend((shard["path"], position, reason) for position, reason in shard["skipped"])
+        for exact, near, record in shard["tracks"]:
+            merger.add(exact, near, record)
+
+    library = parsed["library"]
+    matched = set()  # Slots of shard tracks already in the library
+    counts = {}  # Key of a library track -> the shards' play count to merge into its own
+    for track_id, exact, near in zip(library["ids"], library["exact"], library["near"]):
+        slot = merger.slots.get(exact)
+        if slot is None:
+            slot = merger.slots.get(near)
+            if slot is None or slot in matched:
+                continue
+            merger.near += 1
+        elif slot in matched:
+            continue
+        else:
+            merger.exact += 1
+        matched.add(slot)
+        counts[lib.make_key(track_id)] = merger.tracks[slot][2]["play_count"]
+    records = [record for slot, (_, _, record) in enumerate(merger.tracks) if slot not in matched]
+    keys, updated = [], {}
+    if records or counts:  # Counts are merged during the write, so no play journaled meanwhile is lost
+        keys, updated = lib.add_tracks(records, counts, parsed["library_file"], merger.merge)
+    report.update(added=len(keys), updated=len(updated), exact=merger.exact, near=merger.near, keys=keys)
+    return report
+
+
+def ingest(paths, library_file=None, workers=None, merge="sum"):
+    """Parse, deduplicate and commit shards into a library file, then reload the library; returns commit()'s report."""
+    parsed = parse(paths, library_file, workers, merge)
+    report = commit(parsed)
+    lib.load_library_from_json(parsed["library_file"])
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add catalog shards to the library, merging duplicate tracks.")
+    parser.add_argument("shards", nargs="+", help="track list CSV and song.json files")
+    parser.add_argument("--library", default=lib.LIBRARY_FILE, help="library file to add to")
+    parser.add_argument("--workers", type=int, default=None, help="processes to parse with (default: one per CPU)")
+    parser.add_argument("--merge", choices=sorted(MERGES), default="sum", help="how duplicates' play counts merge")
+    args = parser.parse_args(argv)
+    report = commit(parse(args.shards, args.library, args.workers, args.merge))
+    lib.close_storage(args.library)
+    for shard, position, reason in report["skipped"]:
+        print(f"Skipped {shard} record {position}: {reason}")
+    print(f"Read {report['read']} tracks: {report['added']} added, {report['updated']} play counts updated, "
+          f"{report['exact']} exact and {report['near']} near duplicates merged.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import json
+import os
+import tempfile
+from track_store import check_rating, check_play_count
+from instrumentation import timed
+
+CHUNK_SIZE = 64 * 1024  # Characters read from disk per step
+BATCH_SIZE = 500  # Records handed to the caller per batch
+MAX_TRACK_ID = 2**32 - 1  # Track ids fit the snapshot's u32 columns
+DENSE_IDS = 2**24  # Track ids below this are tracked in a bitmap, larger ones in a set
+
+_WHITESPACE = " \t\r\n"
+
+
+def iter_records(json_file, chunk_size=CHUNK_SIZE):
+    """Yield the records of a JSON array file one at a time.
+
+    Only the current chunk and the record being decoded are held in memory, so
+    large catalogs are never parsed as a whole. Raises json.JSONDecodeError if
+    the file is not a JSON array.
+    """
+    decoder = json.JSONDecoder()
+    with open(json_file, 'r', encoding='utf-8') as file:
+        buffer = ""
+        pos = 0
+        eof = False
+        started = False
+
+        def fill():
+            nonlocal buffer, pos, eof
+            chunk = file.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk  # Drop the part already decoded
+            pos = 0
+
+        while True:
+            # Skip whitespace and separators until the next value starts
+            while pos < len(buffer) and (buffer[pos] in _WHITESPACE or (started and buffer[pos] == ",")):
+                pos += 1
+            if pos >= len(buffer):
+                if eof:
+                    raise json.JSONDecodeError("Unexpected end of file", buffer, pos)
+                fill()
+                continue
+
+            if not started:
+                if buffer[pos] != "[":
+                    raise json.JSONDecodeError("Expecting '['", buffer, pos)
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()  # The record continues in the next chunk
+                continue
+            if end == len(buffer) and not eof:
+                fill()  # A bare number may continue in the next chunk
+                continue
+            pos = end
+            yield record
+
+
+def track_id(position, song):
+    """Return the track id of a record: its "id" field, or its 1-based position if it has none.
+
+    Ids written into the file (storage.py assign-ids) stay with their record
+    when records are reordered, inserted or removed; positions do not.
+    """
+    if isinstance(song, dict) and "id" in song:
+        return song["id"]
+    return position
+
+
+class TrackIdSet:
+    """The track ids seen so far while reading a catalog, to find duplicates."""
+
+    def __init__(self):
+        self._bits = bytearray()  # One bit per id below DENSE_IDS; positions make ids dense
+        self._sparse = set()
+
+    def add(self, track_id):
+        """Add a track id; returns False if it was already there."""
+        if track_id >= DENSE_IDS:
+            if track_id in self._sparse:
+                return False
+            self._sparse.add(track_id)
+            return True
+        byte, bit = divmod(track_id, 8)
+        if byte >= len(self._bits):
+            self._bits += bytes(max(byte + 1, 2 * len(self._bits)) - len(self._bits))
+        if self._bits[byte] >> bit & 1:
+            return False
+        self._bits[byte] |= 1 << bit
+        return True
+
+
+def validate_record(song):
+    """Return LibraryItem keyword arguments for a record, or raise ValueError.
+
+    Applies the same rules as LibraryItem.__init__, and checks the optional track id.
+    """
+    if not isinstance(song, dict):
+        raise ValueError("Record must be a JSON object.")
+    for field in ("title", "singer", "link"):
+        if field not in song:
+            raise ValueError(f"Missing field '{field}'.")
+    if "id" in song and (type(song["id"]) is not int or not 1 <= song["id"] <= MAX_TRACK_ID):
+        raise ValueError(f"Track id must be an integer between 1 and {MAX_TRACK_ID}.")
+    rating = song.get("rating")
+    play_count = song.get("play_count", 0)
+    check_rating(rating)
+    check_play_count(play_count)
+    return {
+        "title": song["title"],
+        "singer": song["singer"],
+        "rating": rating,
+        "link": song["link"],
+        "image_path": song.get("image_url"),
+        "play_count": play_count,
+    }
+
+
+def iter_batches(json_file, batch_size=BATCH_SIZE, skipped=None, on_record=None):
+    """Yield lists of (track id, fields) for valid records, batch_size at a time.
+
+    Invalid records, and records repeating an earlier record's track id, are
+    left out and, if a skipped list is given, reported there as (position,
+    reason), positions being 1-based record numbers in the file. on_record, if
+    given, sees every record as read, valid or not.
+    """
+    batch = []
+    seen = TrackIdSet()
+    for position, song in enumerate(iter_records(json_file), start=1):
+        if on_record is not None:
+            on_record(song)
+        try:
+            fields = validate_record(song)
+            song_id = track_id(position, song)
+            if not seen.add(song_id):
+                raise ValueError(f"Duplicate track id {song_id}.")
+            batch.append((song_id, fields))
+        except ValueError as e:
+            if skipped is not None:
+                skipped.append((position, str(e)))
+            continue
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def pump(widget, batches, on_batch, on_done=None, on_error=None):
+    """Feed batches to on_batch from the Tk event loop, one batch per idle step.
+
+    The window stays responsive and can show the first batch while the rest of
+    the catalog is still being read. If on_error is given, an exception from
+    batches ends the pump and is passed to it. Returns a function that cancels
+    the remaining steps and closes batches.
+    """
+    cancelled = False
+
+    def step():
+        if cancelled:
+            return
+        try:
+            batch = next(batches)
+        except StopIteration:
+            if on_done:
+                on_done()
+            return
+        except Exception as e:
+            if on_error is None:
+                raise
+            on_error(e)
+            return
+        on_batch(batch)
+        widget.after(1, step)
+
+    def cancel():
+        nonlocal cancelled
+        cancelled = True
+        close = getattr(batches, "close", None)
+        if close:
+            close()  # Lets a generator clean up, e.g. remove a half-written file
+
+    widget.after(1, step)
+    return cancel
+
+
+@timed("catalog.write_records")
+def write_records(json_file, records):
+    """Write records as a pretty-printed JSON array, atomically replacing json_file.
+
+    Records are written one at a time, so records may be any iterable. The
+    output is identical to json.dump(list(records), file, indent=4).
+    """
+    directory = os.path.dirname(os.path.abspath(json_file))
+    fd, tmp_path = tempfile.mkstemp(prefix=".song-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            first = True
+            for record in records:
+                text = json.dumps(record, indent=4).replace("\n", "\n    ")
+                file.write(("[\n    " if first else ",\n    ") + text)
+                first = False
+            file.write("[]" if first else "\n]")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, json_file)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
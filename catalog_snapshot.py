@@ -0,0 +1,484 @@
+"""Binary, memory-mapped snapshot of a song.json catalog.
+
+Layout (all little-endian):
+
+    header        HEADER
+    records       record_count x RECORD, one per JSON record in file order
+    row_positions row_count x u32, 1-based record position of each library row
+    position_rows record_count x u32, library row of each record (NO_ROW if skipped)
+    record_ids    record_count x u32, track id of each record (0 if skipped)
+    singers       singer_count x (offset u32, length u32) into the string table
+    strings       UTF-8 string table
+
+Rating and play count sit at fixed offsets in every record, so updating them
+writes a few bytes in place. Records that are not in the standard song.json
+shape are kept as their JSON text (flag RAW) so exports stay exact.
+Track ids are mostly record positions, so row_of() checks the id at the
+position first and only falls back to an id index when records carry ids
+that differ from their positions.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections.abc import Mapping
+
+from catalog_loader import TrackIdSet, iter_records, track_id, validate_record, write_records
+from track_store import TrackView
+
+MAGIC = b"JBXS"
+VERSION = 2
+HEADER = struct.Struct("<4sIqQQQQQ")  # magic, version, source mtime_ns, source size, records, rows, singers, strings offset
+RECORD = struct.Struct("<QBBHI6I")  # play_count, rating, flags, reserved, singer code, title/link/image (offset, length)
+U32 = struct.Struct("<I")
+SPAN = struct.Struct("<II")
+NO_ROW = 0xFFFFFFFF
+
+IMAGE_NULL = 1  # "image_url" is present and null
+NO_IMAGE_KEY = 2  # The record has no "image_url" key
+RAW = 4  # The title span holds the record's JSON text
+INVALID = 8  # The record fails validation and is not part of the library
+HAS_ID = 16  # The record starts with an "id" field
+
+STANDARD_KEYS = ("title", "singer", "rating", "link", "image_url", "play_count")
+SHORT_KEYS = ("title", "singer", "rating", "link", "play_count")
+
+
+def snapshot_path(json_file):
+    """Return where the snapshot of a JSON catalog is kept."""
+    return json_file + ".snap"
+
+
+def _is_standard(song):
+    """Return True if a record can be stored field by field and rebuilt exactly."""
+    if not isinstance(song, dict):
+        return False
+    keys = tuple(song)
+    if keys[:1] == ("id",):
+        if type(song["id"]) is not int:
+            return False
+        keys = keys[1:]
+    if keys not in (STANDARD_KEYS, SHORT_KEYS):
+        return False
+    if not all(type(song[field]) is str for field in ("title", "singer", "link")):
+        return False
+    image_url = song.get("image_url")
+    if image_url is not None and type(image_url) is not str:
+        return False
+    rating, play_count = song["rating"], song["play_count"]
+    return type(rating) is int and 0 <= rating <= 5 and type(play_count) is int and 0 <= play_count < 2**64
+
+
+def _validate(song):
+    """validate_record(), plus the text fields must be strings so they can be stored and indexed."""
+    fields = validate_record(song)
+    if not all(type(fields[field]) is str for field in ("title", "singer", "link")):
+        raise ValueError("Title, singer and link must be strings.")
+    return fields
+
+
+class SnapshotBuilder:
+    """Collects records one at a time and writes them out as a snapshot."""
+
+    def __init__(self):
+        self.records = bytearray()
+        self.strings = bytearray()
+        self.row_positions = bytearray()
+        self.position_rows = bytearray()
+        self.record_ids = bytearray()
+        self.ids = TrackIdSet()
+        self.singers = []
+        self.singer_codes = {}
+        self.count = 0
+        self.rows = 0
+
+    def _string(self, text):
+        data = text.encode("utf-8", "surrogatepass")
+        offset = len(self.strings)
+        self.strings += data
+        return offset, len(data)
+
+    def _singer_code(self, singer):
+        code = self.singer_codes.get(singer)
+        if code is None:
+            code = self.singer_codes[singer] = len(self.singers)
+            self.singers.append(self._string(singer))
+        return code
+
+    def add(self, song):
+        """Append the next record of the catalog."""
+        self.count += 1
+        if _is_standard(song):
+            fields = song
+            flags = HAS_ID if "id" in song else 0
+            title = self._string(song["title"])
+            link = self._string(song["link"])
+            if "image_url" not in song:
+                flags |= NO_IMAGE_KEY
+                image = (0, 0)
+            elif song["image_url"] is None:
+                flags |= IMAGE_NULL
+                image = (0, 0)
+            else:
+                image = self._string(song["image_url"])
+        else:
+            flags = RAW
+            title = self._string(json.dumps(song))
+            link = image = (0, 0)
+            try:
+                fields = _validate(song)
+            except ValueError:
+                fields = None
+                flags |= INVALID
+
+        song_id = track_id(self.count, song) if fields is not None else None
+        if song_id is not None and not self.ids.add(song_id):
+            if not flags & RAW:  # Keep the duplicate's text for skipped_records()
+                flags, title, link, image = RAW, self._string(json.dumps(song)), (0, 0), (0, 0)
+            fields = None
+            flags |= INVALID
+        if fields is None:
+            self.records += RECORD.pack(0, 0, flags, 0, 0, *title, *link, *image)
+            self.position_rows += U32.pack(NO_ROW)
+            self.record_ids += U32.pack(0)
+            return
+        code = self._singer_code(fields["singer"])
+        play_count = fields.get("play_count", 0)
+        self.records += RECORD.pack(play_count, fields["rating"], flags, 0, code, *title, *link, *image)
+        self.position_rows += U32.pack(self.rows)
+        self.row_positions += U32.pack(self.count)
+        self.record_ids += U32.pack(song_id)
+        self.rows += 1
+
+    def write(self, snap_file, source_signature):
+        """Write the snapshot atomically, tagged with the signature of the JSON file it mirrors."""
+        singers = b"".join(SPAN.pack(*span) for span in self.singers)
+        strings_offset = (HEADER.size + len(self.records) + len(self.row_positions)
+                          + len(self.position_rows) + len(self.record_ids) + len(singers))
+        header = HEADER.pack(MAGIC, VERSION, source_signature[0], source_signature[1],
+                             self.count, self.rows, len(self.singers), strings_offset)
+        tmp_path = snap_file + ".tmp"
+        with open(tmp_path, 'wb') as file:
+            for part in (header, self.records, self.row_positions, self.position_rows, self.record_ids, singers,
+                         self.strings):
+                file.write(part)
+        os.replace(tmp_path, snap_file)
+
+
+class SnapshotStore(Mapping):
+    """Library store backed by a memory-mapped snapshot; same row accessors as TrackStore.
+
+    Opening it maps the file and reads the header, nothing more. The mapping
+    mirrors the JSON file: ratings and play counts set on the store are kept
+    in memory until mark_source() reports them written, so the snapshot never
+    holds an edit the file lacks.
+    """
+
+    def __init__(self, snap_file, key_for_id, id_for_key):
+        self.snap_file = snap_file
+        self.key_for_id = key_for_id
+        self.id_for_key = id_for_key
+        self._file = open(snap_file, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        (magic, version, mtime_ns, size, self.record_count, self.row_count,
+         self.singer_count, self.strings_offset) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{snap_file} is not a version {VERSION} catalog snapshot.")
+        self.source_signature = (mtime_ns, size)
+        self._records = HEADER.size
+        self._row_positions = self._records + self.record_count * RECORD.size
+        self._position_rows = self._row_positions + self.row_count * U32.size
+        self._record_ids = self._position_rows + self.record_count * U32.size
+        self._singer_spans = self._record_ids + self.record_count * U32.size
+        self._singer_names = [None] * self.singer_count  # Decoded on first use
+        self._id_positions = None  # track id -> position for ids that differ from their position, built on first need
+        self._raw = {}  # position -> parsed JSON of a RAW record
+        self._ratings = {}  # row -> rating set but not yet in the file
+        self._play_counts = {}  # row -> play count set but not yet in the file
+        self._lock = threading.Lock()  # mark_source() runs on the journal's compaction thread
+
+    # Mapping interface, keyed like TrackStore
+    def __len__(self):
+        return self.row_count
+
+    def __iter__(self):
+        return (self.key_at(row) for row in range(self.row_count))
+
+    def __contains__(self, key):
+        return self.row_of(key) is not None
+
+    def __getitem__(self, key):
+        row = self.row_of(key)
+        if row is None:
+            raise KeyError(key)
+        return TrackView(self, row)
+
+    def add(self, *args, **kwargs):
+        raise TypeError("Snapshot stores are read-only apart from ratings and play counts.")
+
+    def __repr__(self):
+        return f"SnapshotStore({self.row_count} tracks, {self.singer_count} singers)"
+
+    # Row accessors used by TrackView and TrackIndex
+    def _id_at(self, position):
+        return U32.unpack_from(self._map, self._record_ids + (position - 1) * U32.size)[0]
+
+    def _position_of(self, song_id):
+        """Return the position of the record with a track id, or None."""
+        if 1 <= song_id <= self.record_count and self._id_at(song_id) == song_id:
+            return song_id
+        if self._id_positions is None:
+            ids = array("I")
+            ids.frombytes(self._map[self._record_ids:self._singer_spans])
+            self._id_positions = {song_id: position for position, song_id in enumerate(ids, start=1)
+                                  if song_id and song_id != position}
+        return self._id_positions.get(song_id)
+
+    def row_of(self, key):
+        song_id = self.id_for_key(key)
+        position = self._position_of(song_id) if song_id is not None else None
+        if position is None:
+            return None
+        row = U32.unpack_from(self._map, self._position_rows + (position - 1) * U32.size)[0]
+        return None if row == NO_ROW else row
+
+    def _position(self, row):
+        if not 0 <= row < self.row_count:
+            raise IndexError("row out of range")
+        return U32.unpack_from(self._map, self._row_positions + row * U32.size)[0]
+
+    def _offset(self, row):
+        return self._records + (self._position(row) - 1) * RECORD.size
+
+    def _text(self, offset, length):
+        start = self.strings_offset + offset
+        return self._map[start:start + length].decode("utf-8", "surrogatepass")
+
+    def _raw_record(self, row):
+        position = self._position(row)
+        song = self._raw.get(position)
+        if song is None:
+            record = RECORD.unpack_from(self._map, self._offset(row))
+            song = self._raw[position] = json.loads(self._text(record[5], record[6]))
+        return song
+
+    def key_at(self, row):
+        return self.key_for_id(self._id_at(self._position(row)))
+
+    def view_at(self, row):
+        return TrackView(self, row)
+
+    def title_at(self, row):
+        record = RECORD.unpack_from(self._map, self._offset(row))
+        if record[2] & RAW:
+            return self._raw_record(row)["title"]
+        return self._text(record[5], record[6])
+
+    def singer_code_at(self, row):
+        return RECORD.unpack_from(self._map, self._offset(row))[4]
+
+    def singer_name(self, code):
+        name = self._singer_names[code]
+        if name is None:
+            offset, length = SPAN.unpack_from(self._map, self._singer_spans + code * SPAN.size)
+            name = self._singer_names[code] = self._text(offset, length)
+        return name
+
+    def singer_at(self, row):
+        return self.singer_name(self.singer_code_at(row))
+
+    def singers(self):
+        return [self.singer_name(code) for code in range(self.singer_count)]
+
+    def numeric_columns(self):
+        """Return the singer code, rating and play count columns as arrays, one item per row."""
+        codes, ratings, play_counts = array("I"), array("B"), array("Q")
+        with memoryview(self._map) as view, view[self._records:self._row_positions] as records:
+            for play_count, rating, flags, _, code, *_ in RECORD.iter_unpack(records):
+                if not flags & INVALID:  # Rows are the valid records in file order
+                    codes.append(code)
+                    ratings.append(rating)
+                    play_counts.append(play_count)
+        unsaved_ratings, unsaved_counts = self.unsaved()
+        for row, rating in unsaved_ratings.items():
+            ratings[row] = rating
+        for row, play_count in unsaved_counts.items():
+            play_counts[row] = play_count
+        return codes, ratings, play_counts
+
+    def unsaved(self):
+        """Return the ratings and play counts (row -> value) set since they were last written to the file."""
+        with self._lock:
+            return dict(self._ratings), dict(self._play_counts)
+
+    def record_buffers(self):
+        """Return a read-only view of the records, in file order, and one of the row positions (u32, 1-based).
+
+        The records hold the values in the file; unsaved() has the edits since.
+        Release both views before closing the store.
+        """
+        view = memoryview(self._map).toreadonly()
+        return view[self._records:self._row_positions], view[self._row_positions:self._position_rows]
+
+    def rating_at(self, row):
+        rating = self._ratings.get(row)
+        return RECORD.unpack_from(self._map, self._offset(row))[1] if rating is None else rating
+
+    def set_rating_at(self, row, rating):
+        with self._lock:
+            if RECORD.unpack_from(self._map, self._offset(row))[1] == rating:
+                self._ratings.pop(row, None)
+            else:
+                self._ratings[row] = rating
+
+    def play_count_at(self, row):
+        play_count = self._play_counts.get(row)
+        return RECORD.unpack_from(self._map, self._offset(row))[0] if play_count is None else play_count
+
+    def set_play_count_at(self, row, play_count):
+        with self._lock:
+            if RECORD.unpack_from(self._map, self._offset(row))[0] == play_count:
+                self._play_counts.pop(row, None)
+            else:
+                self._play_counts[row] = play_count
+
+    def link_at(self, row):
+        record = RECORD.unpack_from(self._map, self._offset(row))
+        if record[2] & RAW:
+            return self._raw_record(row)["link"]
+        return self._text(record[7], record[8])
+
+    def image_path_at(self, row):
+        record = RECORD.unpack_from(self._map, self._offset(row))
+        if record[2] & RAW:
+            return self._raw_record(row).get("image_url")
+        if record[2] & (IMAGE_NULL | NO_IMAGE_KEY):
+            return None
+        return self._text(record[9], record[10])
+
+    # Whole-snapshot operations
+    def skipped_records(self):
+        """Return (position, reason) for the records left out of the library because they are invalid."""
+        skipped = []
+        if self.record_count == self.row_count:
+            return skipped
+        for position in range(1, self.record_count + 1):
+            if U32.unpack_from(self._map, self._position_rows + (position - 1) * U32.size)[0] != NO_ROW:
+                continue
+            record = RECORD.unpack_from(self._map, self._records + (position - 1) * RECORD.size)
+            song = json.loads(self._text(record[5], record[6]))
+            try:
+                _validate(song)
+            except ValueError as e:
+                skipped.append((position, str(e)))
+                continue
+            skipped.append((position, f"Duplicate track id {track_id(position, song)}."))
+        return skipped
+
+    def iter_json_records(self):
+        """Yield every record as it would appear in song.json, including current ratings and counts."""
+        unsaved_ratings, unsaved_counts = self.unsaved()
+        for position in range(1, self.record_count + 1):
+            offset = self._records + (position - 1) * RECORD.size
+            play_count, rating, flags, _, code, *spans = RECORD.unpack_from(self._map, offset)
+            if unsaved_ratings or unsaved_counts:
+                row = U32.unpack_from(self._map, self._position_rows + (position - 1) * U32.size)[0]
+                rating = unsaved_ratings.get(row, rating)
+                play_count = unsaved_counts.get(row, play_count)
+            if flags & RAW:
+                song = json.loads(self._text(spans[0], spans[1]))
+                if not flags & INVALID:
+                    if song.get("rating") != rating:
+                        song["rating"] = rating
+                    if song.get("play_count", 0) != play_count:
+                        song["play_count"] = play_count
+                yield song
+                continue
+            song = {"id": self._id_at(position)} if flags & HAS_ID else {}
+            song.update({
+                "title": self._text(spans[0], spans[1]),
+                "singer": self.singer_name(code),
+                "rating": rating,
+                "link": self._text(spans[2], spans[3]),
+            })
+            if not flags & NO_IMAGE_KEY:
+                song["image_url"] = None if flags & IMAGE_NULL else self._text(spans[4], spans[5])
+            song["play_count"] = play_count
+            yield song
+
+    def mark_source(self, signature, ratings=None, play_counts=None):
+        """Record the signature of the JSON file after a rewrite that set ratings and play counts (key -> value).
+
+        The written values go into the mapping; edits that were not written stay in memory.
+        """
+        with self._lock:
+            for key, rating in (ratings or {}).items():
+                row = self.row_of(key)
+                if row is not None:
+                    struct.pack_into("<B", self._map, self._offset(row) + 8, rating)
+                    if self._ratings.get(row) == rating:
+                        del self._ratings[row]
+            for key, play_count in (play_counts or {}).items():
+                row = self.row_of(key)
+                if row is not None:
+                    struct.pack_into("<Q", self._map, self._offset(row), play_count)
+                    if self._play_counts.get(row) == play_count:
+                        del self._play_counts[row]
+            struct.pack_into("<qQ", self._map, 8, signature[0], signature[1])
+        self.source_signature = tuple(signature)
+
+    def flush(self):
+        self._map.flush()
+
+    def close(self):
+        if not self._map.closed:
+            self._map.flush()
+            self._map.close()
+        self._file.close()
+
+
+def open_snapshot(snap_file, source_signature, key_for_id, id_for_key):
+    """Open a snapshot if it exists and mirrors the JSON file with the given signature, else return None."""
+    try:
+        store = SnapshotStore(snap_file, key_for_id, id_for_key)
+    except (OSError, ValueError, struct.error):
+        return None
+    if store.source_signature != tuple(source_signature):
+        store.close()
+        return None
+    return store
+
+
+def import_json(json_file, snap_file=None):
+    """Build the snapshot of a JSON catalog."""
+    builder = SnapshotBuilder()
+    source_signature = os.stat(json_file)
+    for song in iter_records(json_file):
+        builder.add(song)
+    builder.write(snap_file or snapshot_path(json_file), (source_signature.st_mtime_ns, source_signature.st_size))
+
+
+def export_json(snap_file, json_file):
+    """Write a snapshot back out as a pretty-printed JSON catalog."""
+    store = SnapshotStore(snap_file, str, lambda key: None)
+    try:
+        write_records(json_file, store.iter_json_records())
+        st = os.stat(json_file)
+        store.mark_source((st.st_mtime_ns, st.st_size))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("import", "export"):
+        print("Usage: python catalog_snapshot.py import song.json [song.json.snap]\n"
+              "       python catalog_snapshot.py export song.json.snap song.json")
+        sys.exit(1)
+    if sys.argv[1] == "import":
+        import_json(sys.argv[2], *sys.argv[3:4])
+    else:
+        export_json(sys.argv[2], sys.argv[3])
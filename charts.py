@@ -0,0 +1,143 @@
+import heapq
+import tracks_library as lib
+
+TOP = 10  # Tracks per chart unless asked otherwise
+
+
+class TopChart:
+    """Top rows of a store by one value, kept in a heap that is pushed to on every change.
+
+    A change pushes a fresh (-value, row) entry in O(log n) and leaves the old
+    one behind; entries that no longer match the store are dropped when a
+    query meets them, and the heap is rebuilt once they outnumber live rows.
+    """
+
+    def __init__(self, value_at, rows=()):
+        self.value_at = value_at  # row -> current value
+        self.size = 0  # Live rows
+        self.heap = [(-value_at(row), row) for row in rows]
+        self.size = len(self.heap)
+        heapq.heapify(self.heap)
+
+    def add(self, row):
+        heapq.heappush(self.heap, (-self.value_at(row), row))
+        self.size += 1
+
+    def update(self, row):
+        heapq.heappush(self.heap, (-self.value_at(row), row))
+        if len(self.heap) > 2 * self.size + 64:
+            self._rebuild()
+
+    def _rebuild(self):
+        rows = {row for _, row in self.heap}
+        self.heap = [(-self.value_at(row), row) for row in rows]
+        heapq.heapify(self.heap)
+
+    def top(self, n=TOP):
+        """Return up to n rows with the highest values, ties in catalog order."""
+        rows, kept, seen = [], [], set()
+        while self.heap and len(rows) < n:
+            entry = heapq.heappop(self.heap)
+            value, row = -entry[0], entry[1]
+            if row in seen or self.value_at(row) != value:
+                continue  # Stale or duplicate entry; it is not pushed back
+            seen.add(row)
+            rows.append(row)
+            kept.append(entry)
+        for entry in kept:
+            heapq.heappush(self.heap, entry)
+        return rows
+
+    def above(self, threshold):
+        """Return the rows whose value is above threshold, without visiting the others."""
+        rows, stack, seen = [], [0] if self.heap else [], set()
+        while stack:
+            i = stack.pop()
+            value, row = -self.heap[i][0], self.heap[i][1]
+            if value <= threshold:
+                continue  # Heap order: nothing below this entry is larger
+            if row not in seen and self.value_at(row) == value:
+                seen.add(row)
+                rows.append(row)
+            stack.extend(child for child in (2 * i + 1, 2 * i + 2) if child < len(self.heap))
+        return rows
+
+
+class Charts:
+    """Most played, best rated and most played per artist over tracks_library.library.
+
+    Charts follow the library through tracks_library's change listeners, and
+    rebuild themselves only when a different library is loaded.
+    """
+
+    def __init__(self):
+        self.store = None
+        self.rows = 0  # Store rows the charts know about
+        lib.add_listener(self.tracks_changed)
+
+    def _sync(self):
+        store = lib.library
+        if store is not self.store:
+            self.store = store
+            self.rows = len(store)
+            self.by_plays = TopChart(store.play_count_at, range(self.rows))
+            self.by_rating = TopChart(store.rating_at, range(self.rows))
+            rows_by_artist = {}
+            for row in range(self.rows):
+                rows_by_artist.setdefault(store.singer_code_at(row), []).append(row)
+            self.by_artist = {code: TopChart(store.play_count_at, rows) for code, rows in rows_by_artist.items()}
+        for row in range(self.rows, len(store)):  # Rows added since, e.g. by a load still streaming in
+            self.by_plays.add(row)
+            self.by_rating.add(row)
+            code = store.singer_code_at(row)
+            if code not in self.by_artist:
+                self.by_artist[code] = TopChart(store.play_count_at)
+            self.by_artist[code].add(row)
+        self.rows = len(store)
+        return store
+
+    def tracks_changed(self, kind, keys):
+        """Listener: re-rank tracks whose rating or play count changed."""
+        store = self.store
+        if store is None or store is not lib.library or kind not in (lib.RATING_CHANGED, lib.COUNT_CHANGED):
+            return  # Rebuilt or extended on the next query
+        for key in keys:
+            row = store.row_of(key)
+            if row is None or row >= self.rows:
+                continue
+            if kind == lib.RATING_CHANGED:
+                self.by_rating.update(row)
+            else:
+                self.by_plays.update(row)
+                self.by_artist[store.singer_code_at(row)].update(row)
+
+    def top_played(self, n=TOP):
+        store = self._sync()
+        return [store.view_at(row) for row in self.by_plays.top(n)]
+
+    def top_rated(self, n=TOP):
+        store = self._sync()
+        return [store.view_at(row) for row in self.by_rating.top(n)]
+
+    def top_by_artist(self, singer, n=TOP):
+        store = self._sync()
+        for code, chart in self.by_artist.items():
+            if store.singer_name(code) == singer:
+                return [store.view_at(row) for row in chart.top(n)]
+        return []
+
+    def played_rows(self):
+        """Return the store rows of every track played at least once, in catalog order."""
+        self._sync()
+        return sorted(self.by_plays.above(0))
+
+
+_charts = None
+
+
+def get_charts():
+    """Return the charts shared by all windows, creating them on first use."""
+    global _charts
+    if _charts is None:
+        _charts = Charts()
+    return _charts
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import instrumentation
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "jukebox", "covers")
+MAX_WORKERS = 4  # Concurrent downloads, and pooled connections per host
+MEMORY_BYTES = 32 * 1024 * 1024  # Budget for covers kept in memory
+MAX_AGE = 24 * 60 * 60  # Seconds before a disk-cached cover is revalidated
+TIMEOUT = 10  # Seconds to wait for the server
+POLL_MS = 20  # How often Tk checks for finished downloads
+LATENCY_SAMPLES = 10_000  # Most recent fetch times kept for the benchmark
+
+
+class CoverArtFetcher:
+    """Downloads cover images on a thread pool with memory and disk caches.
+
+    The disk cache is content-addressed: image bytes are stored under their
+    SHA-256, and a small record per URL remembers the digest together with the
+    ETag and Last-Modified headers used to revalidate it.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_workers=MAX_WORKERS, memory_bytes=MEMORY_BYTES,
+                 max_age=MAX_AGE, timeout=TIMEOUT, session=None):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.max_age = max_age
+        self.timeout = timeout
+        self.session = session or self._make_session(max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cover-art")
+        self._memory = OrderedDict()  # url -> image bytes, least recently used first
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._inflight = {}  # url -> Future, so concurrent requests share one download
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "not_modified": 0, "downloads": 0, "errors": 0}
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)  # Seconds from request to result of recent fetches
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "urls"), exist_ok=True)
+
+    @staticmethod
+    def _make_session(max_workers):
+        import requests  # Loaded here so importing this module stays cheap
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def fetch(self, url):
+        """Return a Future that resolves to the image bytes for url."""
+        started = time.perf_counter()
+        with self._lock:
+            data = self._memory.get(url)
+            if data is not None:
+                self._memory.move_to_end(url)
+                self.stats["memory_hits"] += 1
+                instrumentation.count("cover_art.memory_hits")
+                self.latencies.append(time.perf_counter() - started)
+                future = Future()
+                future.set_result(data)
+                return future
+            future = self._inflight.get(url)
+            if future is None:
+                future = self._executor.submit(self._load, url, started)
+                self._inflight[url] = future
+            return future
+
+    @instrumentation.timed("cover_art.load")
+    def _load(self, url, started):
+        try:
+            data = self._load_uncached(url)
+            self._remember(url, data)
+            return data
+        except Exception:
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(url, None)
+                self.latencies.append(time.perf_counter() - started)
+
+    def _load_uncached(self, url):
+        record = self._read_record(url)
+        data = self._read_object(record["digest"]) if record else None
+        if data is not None and time.time() - record["checked"] < self.max_age:
+            self._count("disk_hits")
+            return data
+
+        headers = {}
+        if data is not None:
+            if record.get("etag"):
+                headers["If-None-Match"] = record["etag"]
+            if record.get("last_modified"):
+                headers["If-Modified-Since"] = record["last_modified"]
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except Exception:
+            if data is not None:
+                self._count("disk_hits")  # Offline: the cached copy is better than nothing
+                return data
+            raise
+
+        if response.status_code == 304 and data is not None:
+            self._count("not_modified")
+            record["checked"] = time.time()
+            self._write_record(url, record)
+            return data
+
+        response.raise_for_status()
+        data = response.content
+        self._count("downloads")
+        digest = hashlib.sha256(data).hexdigest()
+        self._write_object(digest, data)
+        self._write_record(url, {
+            "url": url,
+            "digest": digest,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "checked": time.time(),
+        })
+        return data
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+        instrumentation.count(f"cover_art.{name}")
+
+    def _remember(self, url, data):
+        with self._lock:
+            if url in self._memory:
+                self._memory_size -= len(self._memory.pop(url))
+            self._memory[url] = data
+            self._memory_size += len(data)
+            while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    def _record_path(self, url):
+        return os.path.join(self.cache_dir, "urls", hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_record(self, url):
+        try:
+            with open(self._record_path(url), 'r', encoding='utf-8') as file:
+                record = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return record if record.get("url") == url else None
+
+    def _write_record(self, url, record):
+        self._write_atomic(self._record_path(url), json.dumps(record).encode("utf-8"))
+
+    def _read_object(self, digest):
+        try:
+            with open(os.path.join(self.cache_dir, "objects", digest), 'rb') as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def _write_object(self, digest, data):
+        path = os.path.join(self.cache_dir, "objects", digest)
+        if not os.path.exists(path):  # Identical covers are stored once
+            self._write_atomic(path, data)
+
+    @staticmethod
+    def _write_atomic(path, data):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+    def hit_rate(self):
+        """Return the share of fetches answered without downloading the image again."""
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["not_modified"]
+        total = hits + self.stats["downloads"] + self.stats["errors"]
+        return hits / total if total else 0.0
+
+    def close(self):
+        """Wait for running downloads and release pooled connections."""
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+
+def deliver(widget, future, callback):
+    """Call callback(data, error) on the Tk thread once future has finished.
+
+    Tk widgets must only be touched from the main loop, so the future is
+    polled with after() rather than completed from the worker thread.
+    """
+    def check():
+        if not future.done():
+            widget.after(POLL_MS, check)
+            return
+        error = future.exception()
+        callback(None if error else future.result(), error)
+
+    check()
+
+
+_fetcher = None
+
+
+def get_fetcher():
+    """Return the fetcher shared by all windows, creating it on first use."""
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = CoverArtFetcher()
+    return _fetcher
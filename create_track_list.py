@@ -1,7 +1,10 @@
 import tkinter as tk
 from tkinter import scrolledtext, messagebox
-import json
 import os
+import tracks_library as lib
+import recommendations
+from playlist import Playlist
+from instrumentation import timed
 
 class TrackListApp:
     def __init__(self, master, shared_play_counts=None):
@@ -9,21 +12,19 @@ class TrackListApp:
         self.master.title("Create Track List")
         
         self.shared_play_counts = shared_play_counts  # Optional shared parameter
-        self.load_tracks()  # Load track data from JSON file
+        self.playlist = Playlist()  # Queue of track keys
+        self.load_tracks()  # Make sure the shared track library is loaded
         self.create_widgets()  # Create GUI widgets
-        self.playlist = []  # Initialize an empty playlist
 
     def load_tracks(self):
-        """Load track data from JSON file."""
+        """Load the shared track library from its file if no window has loaded it yet."""
         try:
-            file_path = '/Users/mk183/Documents/GREENWICH/JukeBox/song.json'  # Specify the file path
+            file_path = lib.LIBRARY_FILE  # song.json unless JUKEBOX_LIBRARY names another file
             if not os.path.exists(file_path):
                 raise FileNotFoundError(f"{file_path} does not exist.")
-            with open(file_path, 'r') as file:
-                self.tracks = json.load(file)  # Load tracks into a list
+            lib.ensure_library(file_path)  # Parsed only if no window has loaded this version yet
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load tracks: {e}")
-            self.tracks = []  # Initialize an empty list if loading fails
 
     def create_widgets(self):
         """Create GUI widgets."""
@@ -36,57 +37,145 @@ class TrackListApp:
         add_button = tk.Button(self.master, text="Add Track", command=self.add_track)
         add_button.pack(pady=5)
 
+        play_next_button = tk.Button(self.master, text="Play Next", command=self.play_next)
+        play_next_button.pack(pady=5)
+
         self.playlist_text = scrolledtext.ScrolledText(self.master, wrap=tk.WORD, width=40, height=10)
         self.playlist_text.pack(pady=10)
         self.playlist_text.config(state=tk.DISABLED)  # Disable text area to prevent manual editing
 
+        # Tracks often played with the first entries, from the playlists played so far
+        tk.Label(self.master, text="Often Played With These", font=("Helvetica", 10)).pack()
+        self.suggestions_list = tk.Listbox(self.master, width=40, height=recommendations.SUGGESTIONS)
+        self.suggestions_list.pack(pady=5)
+        tk.Button(self.master, text="Play Suggestion Next", command=self.play_suggestion_next).pack(pady=5)
+        self.suggested = []  # Keys of the listed suggestions
+
+        # Playback options
+        options = tk.Frame(self.master)
+        options.pack(pady=5)
+        tk.Button(options, text="Shuffle", command=self.shuffle_playlist).pack(side=tk.LEFT)
+        self.dedupe_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(options, text="No Duplicates", variable=self.dedupe_var, command=self.toggle_dedupe).pack(side=tk.LEFT)
+        tk.Label(options, text="Repeat").pack(side=tk.LEFT, padx=(10, 0))
+        self.repeat_spin = tk.Spinbox(options, from_=1, to=100, width=4)
+        self.repeat_spin.pack(side=tk.LEFT)
+
         play_button = tk.Button(self.master, text="Play Playlist", command=self.play_playlist)
         play_button.pack(pady=5)
 
         reset_button = tk.Button(self.master, text="Reset Playlist", command=self.reset_playlist)
         reset_button.pack(pady=5)
+        self.update_suggestions()
 
-    def add_track(self):
-        """Add track to the playlist."""
+    def get_track_key(self):
+        """Return the library key for the entered track number, or None after showing an error."""
         try:
             track_number = int(self.track_number_entry.get())  # Get track number from entry
-            if 1 <= track_number <= len(self.tracks):
-                track_info = self.tracks[track_number - 1]  # Get track information based on track number
-                self.playlist.append(track_info['title'])  # Add track title to the playlist
-                self.update_playlist_display()  # Update playlist display
-                messagebox.showinfo("Success", f"Added: {track_info['title']} by {track_info['singer']}")
-            else:
-                messagebox.showerror("Error", "Invalid track number.")
         except ValueError:
             messagebox.showerror("Error", "Please enter a valid integer.")
+            return None
+        key = lib.make_key(track_number)
+        if key not in lib.library:
+            messagebox.showerror("Error", "Invalid track number.")
+            return None
+        return key
+
+    def add_track(self):
+        """Add track to the end of the playlist."""
+        key = self.get_track_key()
+        if key is None:
+            return
+        if not self.playlist.add(key):
+            messagebox.showwarning("Warning", f"{lib.get_song(key)} is already in the playlist.")
+            return
+        self.append_to_display(key)  # Only the new line is drawn
+        self.update_suggestions()
+        messagebox.showinfo("Success", f"Added: {lib.get_song(key)} by {lib.get_singer(key)}")
+
+    @timed("playlist.play_next")
+    def play_next(self):
+        """Add track to the front of the playlist."""
+        key = self.get_track_key()
+        if key is not None:
+            self.queue_next(key)
+
+    def queue_next(self, key):
+        """Put a track at the front of the playlist and draw its line."""
+        if not self.playlist.play_next(key):
+            messagebox.showwarning("Warning", f"{lib.get_song(key)} is already in the playlist.")
+            return
+        self.playlist_text.config(state=tk.NORMAL)
+        self.playlist_text.insert("1.0", self.display_line(key))
+        self.playlist_text.config(state=tk.DISABLED)
+        self.update_suggestions()
+
+    def update_suggestions(self):
+        """List the tracks most often played with the first entries; a few top lists are read, never the whole index."""
+        self.suggested = recommendations.suggest_next(list(self.playlist)) if self.playlist else []
+        self.suggestions_list.delete(0, tk.END)
+        self.suggestions_list.insert(tk.END, *(self.display_line(key).rstrip("\n") for key in self.suggested))
+
+    def play_suggestion_next(self):
+        """Put the selected suggestion at the front of the playlist."""
+        selection = self.suggestions_list.curselection()
+        if not selection:
+            messagebox.showwarning("Warning", "Select a suggestion first.")
+            return
+        self.queue_next(self.suggested[selection[0]])
+
+    def toggle_dedupe(self):
+        """Apply the No Duplicates option, redrawing only if entries were removed."""
+        before = len(self.playlist)
+        self.playlist.set_dedupe(self.dedupe_var.get())
+        if len(self.playlist) != before:
+            self.update_playlist_display()
+            self.update_suggestions()
+
+    def shuffle_playlist(self):
+        """Shuffle the playlist and redraw it once."""
+        self.playlist.shuffle_entries()
+        self.update_playlist_display()
+        self.update_suggestions()  # Other entries come first now
+
+    @staticmethod
+    def display_line(key):
+        return f"{lib.get_song(key)} - {lib.get_singer(key)}\n"
+
+    def append_to_display(self, key):
+        """Append one playlist entry to the displayed playlist."""
+        self.playlist_text.config(state=tk.NORMAL)
+        self.playlist_text.insert(tk.END, self.display_line(key))
+        self.playlist_text.config(state=tk.DISABLED)
 
     def update_playlist_display(self):
-        """Update the displayed playlist."""
+        """Redraw the whole displayed playlist in a single insert."""
         self.playlist_text.config(state=tk.NORMAL)
         self.playlist_text.delete(1.0, tk.END)  # Clear the text area
-        for track in self.playlist:
-            self.playlist_text.insert(tk.END, f"{track}\n")  # Insert each track into the text area
+        self.playlist_text.insert(tk.END, "".join(self.display_line(key) for key in self.playlist))
         self.playlist_text.config(state=tk.DISABLED)
 
+    @timed("playlist.play")
     def play_playlist(self):
         """Simulate playing the playlist and increment play counts."""
         if not self.playlist:
             messagebox.showwarning("Warning", "Playlist is empty. Please add tracks first.")
             return
 
-        for track_title in self.playlist:
-            for track in self.tracks:
-                if track['title'] == track_title:
-                    track['play_count'] += 1  # Increment the play count
-                    break
-        
-        # Save updated play counts back to song.json
         try:
-            with open('song.json', 'w') as file:
-                json.dump(self.tracks, file, indent=4)  # Save the updated tracks list
-            messagebox.showinfo("Info", "Playlist played! (Counts updated)")
+            self.playlist.repeat = max(1, int(self.repeat_spin.get()))
+        except ValueError:
+            self.playlist.repeat = 1
+
+        # Save all increments of this run as one batched update
+        try:
+            lib.record_plays(self.playlist.play_counts())
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save play counts: {e}")
+            return
+        recommendations.record_playlist(list(self.playlist))  # Learn which tracks get played together, off this thread
+        self.update_suggestions()
+        messagebox.showinfo("Info", "Playlist played! (Counts updated)")
 
     def reset_playlist(self):
         """Reset the playlist."""
@@ -94,6 +183,7 @@ class TrackListApp:
         self.playlist_text.config(state=tk.NORMAL)
         self.playlist_text.delete(1.0, tk.END)  # Clear the text area
         self.playlist_text.config(state=tk.DISABLED)
+        self.update_suggestions()
         messagebox.showinfo("Info", "Playlist reset.")
 
 if __name__ == "__main__":
@@ -0,0 +1,182 @@
+"""Timers and counters around the jukebox's hot paths.
+
+Functions marked with @timed("name") record how often they ran and how long
+they took, and count("name") bumps a counter. Collection is off unless
+JUKEBOX_STATS=1 or enable() is called; while it is off a timed function
+costs one flag check on top of the call.
+
+The numbers are read with snapshot(), shown live in the main window, and can
+be written to a JSON file periodically (JUKEBOX_STATS_FILE). profile_next()
+runs the next call of one timed function under cProfile.
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+DUMP_INTERVAL = 10.0  # Seconds between writes of the stats file
+PROFILE_DIR = "profiles"
+STATS_FILE = os.environ.get("JUKEBOX_STATS_FILE")  # Periodic JSON dump of the stats, if set
+
+enabled = os.environ.get("JUKEBOX_STATS") == "1"
+_lock = threading.Lock()
+_timers = {}  # name -> [calls, total seconds, longest seconds]
+_counters = {}  # name -> count
+_names = []  # Every timed name, in the order the code declared them
+_armed = {}  # name -> directory the next call's profile is written to
+_profiled = []  # Paths of finished profiles, newest last
+
+
+def enable(on=True):
+    """Turn collection on or off; the numbers gathered so far are kept."""
+    global enabled
+    enabled = on
+
+
+def timed(name):
+    """Decorator that records calls and wall-clock time of a function under name."""
+    def decorate(func):
+        _names.append(name)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            if _armed:
+                profile_dir = _armed.pop(name, None)
+                if profile_dir is not None:
+                    return _profile(name, profile_dir, func, args, kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+def timed_iter(name, iterable):
+    """Yield from iterable, recording the time each item took to produce under name.
+
+    Closing this generator closes the iterable too, so a cancelled pump still cleans up.
+    """
+    iterator = iter(iterable)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            if enabled:
+                record(name, time.perf_counter() - started)
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+
+def record(name, seconds):
+    """Add one call of seconds to the timer name."""
+    with _lock:
+        timer = _timers.get(name)
+        if timer is None:
+            _timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            if seconds > timer[2]:
+                timer[2] = seconds
+
+
+def count(name, amount=1):
+    """Add amount to the counter name while collection is on."""
+    if enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+
+def names():
+    """Return the names of every timed function."""
+    return list(_names)
+
+
+def snapshot():
+    """Return the timers (calls, total/mean/max milliseconds) and counters collected so far."""
+    with _lock:
+        timers = {name: {"calls": calls, "total_ms": total * 1000, "mean_ms": total / calls * 1000, "max_ms": longest * 1000}
+                  for name, (calls, total, longest) in _timers.items()}
+        return {"enabled": enabled, "timers": timers, "counters": dict(_counters), "profiles": list(_profiled)}
+
+
+def reset():
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+        _profiled.clear()
+
+
+def format_stats(stats, limit=None):
+    """Return timers as text lines, the most total time first."""
+    ordered = sorted(stats["timers"].items(), key=lambda item: -item[1]["total_ms"])[:limit]
+    lines = [f"{'timer':<28} {'calls':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9}"]
+    lines += [f"{name:<28} {t['calls']:>7} {t['total_ms']:>10.1f} {t['mean_ms']:>9.2f} {t['max_ms']:>9.2f}"
+              for name, t in ordered]
+    lines += [f"{name:<28} {value:>7}" for name, value in sorted(stats["counters"].items())]
+    return "\n".join(lines)
+
+
+def dump(path):
+    """Write snapshot() to path as JSON, replacing the file atomically."""
+    stats = snapshot()
+    stats["time"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(stats, file, indent=2)
+    os.replace(tmp_path, path)
+
+
+def start_dumping(path, interval=DUMP_INTERVAL):
+    """Write the stats to path every interval seconds on a background thread; returns a function that stops it."""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                dump(path)
+            except OSError as e:
+                print(f"Error writing stats to {path}: {e}")
+
+    threading.Thread(target=run, name="stats-dump", daemon=True).start()
+
+    def stopper():
+        stop.set()
+        dump(path)  # Keep the final numbers
+    return stopper
+
+
+def profile_next(name, profile_dir=PROFILE_DIR):
+    """Run the next call of the timed function name under cProfile (collection must be on).
+
+    The profile is written to profile_dir as <name>-<time>.prof, for pstats or snakeviz.
+    """
+    if name not in _names:
+        raise KeyError(f"No timed function is called {name!r}.")
+    _armed[name] = profile_dir
+
+
+def _profile(name, profile_dir, func, args, kwargs):
+    import cProfile  # Only loaded when a capture was asked for
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        record(name, time.perf_counter() - started)
+        os.makedirs(profile_dir, exist_ok=True)
+        path = os.path.join(profile_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+        profiler.dump_stats(path)
+        with _lock:
+            _profiled.append(path)
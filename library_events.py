@@ -0,0 +1,60 @@
+"""Library change events for Tk windows, gathered over one idle cycle and handed over as one update.
+
+tracks_library publishes an event for every change (tracks added, rating or
+play count changed, library reloaded). A window that redrew on each of them
+would repaint 10k times for a burst of 10k plays, so LibraryChanges collects
+the keys per kind and calls the window once, when Tk next goes idle.
+"""
+import instrumentation
+import tracks_library as lib
+
+
+class LibraryChanges:
+    """Subscribes a window to the library's change events; call from the Tk thread only.
+
+    on_changes(changes) gets a dict of event kind -> set of keys. After a
+    reload it gets {LIBRARY_RELOADED: set()} alone, since every row may have
+    changed and the window redraws from scratch anyway. The subscription ends
+    when the widget is destroyed.
+    """
+
+    def __init__(self, widget, on_changes):
+        self.widget = widget
+        self.on_changes = on_changes
+        self.pending = {}  # kind -> keys changed since the last update
+        self._scheduled = None  # after_idle() id of the next update
+        self.closed = False
+        lib.add_listener(self.changed)
+        widget.bind("<Destroy>", self._on_destroy, add="+")
+
+    def changed(self, kind, keys):
+        """Listener: note the change and make sure an update runs when Tk is idle."""
+        instrumentation.count("library_events.events")
+        if lib.LIBRARY_RELOADED in self.pending:
+            pass  # Everything is redrawn already
+        elif kind == lib.LIBRARY_RELOADED:
+            self.pending = {kind: set()}
+        else:
+            self.pending.setdefault(kind, set()).update(keys)
+        if self._scheduled is None:
+            self._scheduled = self.widget.after_idle(self.flush)
+
+    def flush(self):
+        """Hand the changes gathered so far to the window."""
+        self._scheduled = None
+        changes, self.pending = self.pending, {}
+        if changes:
+            instrumentation.count("library_events.updates")
+            self.on_changes(changes)
+
+    def _on_destroy(self, event):
+        if event.widget is self.widget:
+            self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            lib.remove_listener(self.changed)
+        if self._scheduled is not None:
+            self.widget.after_cancel(self._scheduled)
+            self._scheduled = None
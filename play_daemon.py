@@ -0,0 +1,240 @@
+"""Local daemon that merges play and rating events from many jukebox front-ends.
+
+Front-ends send batches over a Unix socket instead of writing the library
+file themselves. Plays are sent as increments, so batches from different
+terminals add up instead of overwriting each other. The daemon applies them
+to its in-memory library and persists dirty tracks at a bounded interval
+with one atomic rewrite of the file.
+
+    python play_daemon.py song.json [--socket PATH] [--interval SECONDS]
+
+Protocol: one JSON object per line in each direction.
+
+    {"plays": {"01": 2}, "ratings": {"03": 5}}  ->  {"ok": true, "counts": {"01": 9}, "ratings": {"03": 5}}
+    {"flush": true}                             ->  {"ok": true}
+    {"stats": true}                             ->  {"ok": true, "stats": {...}}
+
+A batch is rejected as a whole ({"ok": false, "error": ...}) if any key is
+unknown or any value invalid.
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+
+import tracks_library as lib
+from track_store import check_rating
+
+INTERVAL = 2.0  # Longest time in seconds an accepted event waits before it is written to the library file
+
+
+def default_socket_path():
+    return os.path.join(tempfile.gettempdir(), f"jukebox-{os.getuid()}.sock")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                response = self.server.daemon.handle(json.loads(line))
+            except (ValueError, KeyError, TypeError) as e:
+                response = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128  # Many terminals may connect at once
+
+
+class PlayDaemon:
+    """Owns the library in this process and serves play and rating batches from clients."""
+
+    def __init__(self, library_file, socket_path=None, interval=INTERVAL):
+        self.library_file = library_file
+        self.socket_path = socket_path or default_socket_path()
+        self.interval = interval
+        self._lock = threading.Lock()  # Guards the library and the dirty sets
+        self._flush_lock = threading.Lock()  # One write at a time, so an older write never lands last
+        self._dirty_counts = {}
+        self._dirty_ratings = {}
+        self._stop = threading.Event()
+        self.stats = {"batches": 0, "plays": 0, "ratings": 0, "rejected": 0, "writes": 0}
+        self._server = None
+        self._threads = []
+
+    def start(self):
+        """Load the library, then serve clients and persist in background threads."""
+        lib.load_library_from_json(self.library_file)
+        lib.close_storage(self.library_file)  # Fold any journaled plays in; the daemon writes from now on
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # Left over from a daemon that did not shut down cleanly
+        self._server = _Server(self.socket_path, _Handler)
+        self._server.daemon = self
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, name="play-daemon-server", daemon=True),
+            threading.Thread(target=self._run_flusher, name="play-daemon-flush", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def handle(self, request):
+        """Apply one client request and return the response object."""
+        if not isinstance(request, dict):
+            raise ValueError("Request must be a JSON object.")
+        if request.get("flush"):
+            self.flush()
+            return {"ok": True}
+        if request.get("stats"):
+            with self._lock:
+                return {"ok": True, "stats": dict(self.stats)}
+        plays = request.get("plays") or {}
+        ratings = request.get("ratings") or {}
+        with self._lock:
+            try:
+                if self._stop.is_set():
+                    raise ValueError("The play daemon is shutting down.")
+                if not isinstance(plays, dict) or not isinstance(ratings, dict):
+                    raise ValueError("Plays and ratings must be JSON objects of track key -> value.")
+                for key, count in plays.items():
+                    if key not in lib.library:
+                        raise KeyError(f"Unknown track {key}.")
+                    if type(count) is not int or count < 1:
+                        raise ValueError("Plays must be positive integers.")
+                for key, rating in ratings.items():
+                    if key not in lib.library:
+                        raise KeyError(f"Unknown track {key}.")
+                    check_rating(rating)
+            except (KeyError, ValueError):
+                self.stats["rejected"] += 1
+                raise
+            counts = {}
+            for key, count in plays.items():
+                track = lib.library[key]
+                track.play_count += count
+                counts[key] = self._dirty_counts[key] = track.play_count
+            for key, rating in ratings.items():
+                lib.library[key].rating = self._dirty_ratings[key] = rating
+            self.stats["batches"] += 1
+            self.stats["plays"] += sum(plays.values())
+            self.stats["ratings"] += len(ratings)
+        return {"ok": True, "counts": counts, "ratings": ratings}
+
+    def flush(self):
+        """Write every change accepted so far to the library file."""
+        with self._flush_lock:
+            with self._lock:
+                counts, ratings = self._dirty_counts, self._dirty_ratings
+                if not counts and not ratings:
+                    return
+                self._dirty_counts, self._dirty_ratings = {}, {}
+            try:
+                lib.get_storage(self.library_file).apply(counts, ratings)
+            except Exception:
+                with self._lock:  # Keep the changes for the next attempt, newer values first
+                    self._dirty_counts = {**counts, **self._dirty_counts}
+                    self._dirty_ratings = {**ratings, **self._dirty_ratings}
+                raise
+            with self._lock:
+                self.stats["writes"] += 1
+
+    def _run_flusher(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error writing {self.library_file}: {e}")
+
+    def stop(self):
+        """Stop serving and write what is left."""
+        with self._lock:
+            self._stop.set()  # Batches accepted from here on are refused, so the last flush sees them all
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.flush()
+
+
+class PlayClient:
+    """Connection from a front-end to the daemon; safe to share between threads."""
+
+    def __init__(self, socket_path=None, timeout=10):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._socket = None
+        self._reader = None
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.socket_path)  # Blocking, so a full accept queue waits instead of failing
+        sock.settimeout(self.timeout)
+        self._socket = sock
+        self._reader = sock.makefile("rb")
+
+    def request(self, message):
+        """Send one request and return the daemon's response; raises ValueError if it was rejected."""
+        data = json.dumps(message).encode("utf-8") + b"\n"
+        with self._lock:
+            if self._socket is None:
+                self._connect()
+            try:
+                self._socket.sendall(data)
+                line = self._reader.readline()
+            except OSError:
+                self._disconnect()
+                raise
+            if not line:
+                self._disconnect()
+                raise ConnectionError("The play daemon closed the connection.")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise ValueError(response.get("error", "Request rejected by the play daemon."))
+        return response
+
+    def send(self, plays=None, ratings=None):
+        """Send a batch of plays (key -> increment) and ratings (key -> rating); returns the response."""
+        return self.request({"plays": plays or {}, "ratings": ratings or {}})
+
+    def _disconnect(self):
+        if self._socket is not None:
+            self._reader.close()
+            self._socket.close()
+            self._socket = self._reader = None
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge play and rating events from jukebox front-ends.")
+    parser.add_argument("library_file", nargs="?", default=lib.LIBRARY_FILE)
+    parser.add_argument("--socket", default=None, help="Unix socket path (default: a per-user file in the temp directory)")
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="seconds between writes")
+    args = parser.parse_args(argv)
+    daemon = PlayDaemon(args.library_file, args.socket, args.interval)
+    daemon.start()
+    print(f"Play daemon for {args.library_file} listening on {daemon.socket_path}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Recent play history per track and per artist, rolled up into minute, hour and day buckets.
+
+A play count alone cannot say what was played this hour or what is trending
+today, and a log of every play would grow for as long as the jukebox runs.
+Each track and artist played recently gets one array of counters instead:
+a ring of minutes reaching back an hour, one of hours reaching back two
+days and one of days reaching back a month. A play adds to the current
+bucket of all three, and a bucket is cleared when its ring comes round to
+it again, so the array never grows.
+Range queries add up the buckets of the finest ring that reaches back far
+enough, which is at most 61 of them.
+
+Series with no play inside the longest ring are dropped once an hour, so
+memory follows the number of tracks played in the last 30 days, not uptime.
+"""
+import heapq
+import math
+import threading
+import time
+from array import array
+
+# (name, seconds per bucket, buckets kept); finest first. One bucket more than the span, since a span
+# reaching back from now starts inside a bucket
+TIERS = (("minute", 60, 61), ("hour", 3600, 49), ("day", 86400, 31))
+MINUTE, HOUR, DAY = range(len(TIERS))
+SLOTS = sum(size for _, _, size in TIERS)  # Counters per series, every ring back to back
+OFFSETS = tuple(sum(size for _, _, size in TIERS[:tier]) for tier in range(len(TIERS)))  # First slot of each ring
+TRENDING_WINDOW = 3600  # Seconds of recent plays a track trends on
+TRENDING_BASELINE = 86400  # Seconds before the window its usual rate is taken from
+TOP = 10
+_ZEROS = array("I", bytes(4 * max(size for _, _, size in TIERS)))
+
+
+class Series:
+    """Play counters of one track or artist: every tier's ring buffer in one array."""
+
+    __slots__ = ("counts", "newest")
+
+    def __init__(self):
+        self.counts = array("I", bytes(4 * SLOTS))
+        self.newest = array("q", [-1] * len(TIERS))  # Newest bucket written per tier
+
+
+class PlayHistory:
+    """Minute, hour and day play counts of every track and artist played recently; safe to share between threads.
+
+    Days run from local midnight to midnight. Range queries count whole buckets,
+    so a range is widened to the bucket edges of the tier that answers it.
+    """
+
+    def __init__(self, clock=time.time, utc_offset=None):
+        self.clock = clock
+        self.utc_offset = time.localtime().tm_gmtoff if utc_offset is None else utc_offset  # Aligns days locally
+        self._tracks = {}  # key -> Series
+        self._artists = {}  # singer -> Series
+        self._lock = threading.Lock()
+        self._pruned = None  # Hour bucket of the last prune
+
+    def __len__(self):
+        """Return the number of series held (tracks and artists)."""
+        return len(self._tracks) + len(self._artists)
+
+    def bucket(self, tier, when):
+        """Return the number of the bucket of a tier that a time falls in."""
+        return int((when + self.utc_offset) // TIERS[tier][1])
+
+    def _last_bucket(self, tier, end):
+        """Return the bucket holding the moment just before end."""
+        return math.ceil((end + self.utc_offset) / TIERS[tier][1]) - 1
+
+    def bucket_start(self, tier, when):
+        """Return the time the bucket holding when started, e.g. local midnight for the day tier."""
+        width = TIERS[tier][1]
+        return self.bucket(tier, when) * width - self.utc_offset
+
+    def today(self):
+        """Return the time today started, for "plays today" queries."""
+        return self.bucket_start(DAY, self.clock())
+
+    def record(self, key, singer, plays=1, when=None):
+        """Add plays of a track (and of its singer, unless None) at when, by default now."""
+        when = self.clock() if when is None else when
+        buckets = [int((when + self.utc_offset) // width) for _, width, _ in TIERS]
+        with self._lock:
+            self._add(self._tracks, key, buckets, plays)
+            if singer is not None:
+                self._add(self._artists, singer, buckets, plays)
+            if self._pruned != buckets[HOUR]:
+                self._pruned = buckets[HOUR]
+                self._prune(self.bucket(DAY, self.clock()))
+
+    @staticmethod
+    def _clear(counts, offset, size, first, count):
+        """Zero count slots of the ring at offset, from the one of bucket first on, with at most two slice copies."""
+        start = first % size
+        head = min(count, size - start)
+        counts[offset + start:offset + start + head] = _ZEROS[:head]
+        if count > head:
+            counts[offset:offset + count - head] = _ZEROS[:count - head]
+
+    @classmethod
+    def _add(cls, series_by_name, name, buckets, plays):
+        series = series_by_name.get(name)
+        if series is None:
+            series = series_by_name[name] = Series()
+        counts, newest = series.counts, series.newest
+        for tier, (_, _, size) in enumerate(TIERS):
+            bucket, offset = buckets[tier], OFFSETS[tier]
+            if bucket > newest[tier]:
+                gap = min(bucket - newest[tier], size)  # Slots up to this bucket hold counts from a lap ago
+                cls._clear(counts, offset, size, bucket - gap + 1, gap)
+                newest[tier] = bucket
+            elif bucket <= newest[tier] - size:
+                continue  # Older than this ring reaches back
+            counts[offset + bucket % size] += plays
+
+    def _prune(self, day):
+        """Drop series without a play inside the day ring."""
+        for series_by_name in (self._tracks, self._artists):
+            stale = [name for name, series in series_by_name.items() if series.newest[DAY] <= day - TIERS[DAY][2]]
+            for name in stale:
+                del series_by_name[name]
+
+    def _sum(self, series, start, end, now):
+        """Add up the buckets of series from start to end, using the finest tier that reaches back to start.
+
+        An end of None counts up to and including now.
+        """
+        if series is None:
+            return 0
+        for tier, (_, _, size) in enumerate(TIERS):
+            if self.bucket(tier, start) > self.bucket(tier, now) - size:
+                break  # tier is the finest ring still holding start; else the coarsest, cut to what it holds
+        size, offset = TIERS[tier][2], OFFSETS[tier]
+        newest = series.newest[tier]
+        first = max(self.bucket(tier, start), self.bucket(tier, now) - size + 1, newest - size + 1)
+        last = min(self.bucket(tier, now) if end is None else self._last_bucket(tier, end), newest)
+        counts = series.counts
+        return sum(counts[offset + bucket % size] for bucket in range(first, last + 1))
+
+    def track_plays(self, key, start, end=None):
+        """Return the plays of a track from start to end (default: now)."""
+        now = self.clock()
+        with self._lock:
+            return self._sum(self._tracks.get(key), start, end, now)
+
+    def artist_plays(self, singer, start, end=None):
+        """Return the plays of every track of a singer from start to end (default: now)."""
+        now = self.clock()
+        with self._lock:
+            return self._sum(self._artists.get(singer), start, end, now)
+
+    def buckets(self, key, tier):
+        """Return a track's counts in every bucket of a tier (MINUTE, HOUR or DAY), oldest first."""
+        now_bucket = self.bucket(tier, self.clock())
+        size, offset = TIERS[tier][2], OFFSETS[tier]
+        with self._lock:
+            series = self._tracks.get(key)
+            if series is None:
+                return [0] * size
+            newest = series.newest[tier]
+            return [series.counts[offset + bucket % size] if newest - size < bucket <= newest else 0
+                    for bucket in range(now_bucket - size + 1, now_bucket + 1)]
+
+    def most_played(self, start, n=TOP):
+        """Return up to n (key, plays) with the most plays since start, most first."""
+        now = self.clock()
+        start_bucket = self.bucket(MINUTE, start)
+        with self._lock:
+            plays = ((key, self._sum(series, start, None, now)) for key, series in self._tracks.items()
+                     if series.newest[MINUTE] >= start_bucket)  # Tracks last played before start are skipped
+            return heapq.nlargest(n, ((key, count) for key, count in plays if count > 0), key=lambda item: item[1])
+
+    def trending(self, n=TOP, window=TRENDING_WINDOW, baseline=TRENDING_BASELINE):
+        """Return up to n (key, plays in window, score) of the tracks played most above their usual rate.
+
+        The score compares the plays in the last window seconds with what the
+        baseline before it predicts for a window that long, in units of that
+        prediction's Poisson spread, so one play of a rarely heard track does not
+        outrank a hit that doubled.
+        """
+        now = self.clock()
+        start = now - window
+        baseline_end = self.bucket_start(HOUR, start)  # Whole hours before the window, none of it
+        recent_bucket = self.bucket(MINUTE, start)
+        scored = []
+        with self._lock:
+            for key, series in self._tracks.items():
+                if series.newest[MINUTE] < recent_bucket:
+                    continue  # Nothing played in the window; skipped without summing
+                recent = self._sum(series, start, None, now)
+                if recent:
+                    expected = self._sum(series, baseline_end - baseline, baseline_end, now) * window / baseline
+                    scored.append((key, recent, (recent - expected) / math.sqrt(expected + 1)))
+        return heapq.nlargest(n, scored, key=lambda item: item[2])
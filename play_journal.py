@@ -0,0 +1,166 @@
+import os
+import struct
+import threading
+from catalog_loader import iter_records, track_id, write_records
+
+COUNT = struct.Struct("<Q")  # Play count stored after each key
+MAX_BYTES = 64 * 1024  # Compact once the journal grows past this size
+INTERVAL = 5.0  # Seconds between background compactions
+
+
+class PlayJournal:
+    """Append-only log of play counts that is folded into the catalog file in the background.
+
+    Each entry stores a track key and its new absolute play count, so replaying
+    an entry twice gives the same result. That keeps recovery simple: after a
+    crash the journal is replayed on top of song.json, whether or not the last
+    compaction finished.
+    """
+
+    def __init__(self, json_file, key_for_id, journal_file=None, max_bytes=MAX_BYTES, interval=INTERVAL,
+                 on_compacted=None):
+        self.json_file = json_file
+        self.journal_file = journal_file or json_file + ".journal"
+        self.key_for_id = key_for_id  # Maps a record's track id to its track key
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.on_compacted = on_compacted  # Called with the file and the counts written after each rewrite of it
+        self.pending = self.read()  # Latest count per key not yet compacted
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._file = None  # Opened on the first append so loading never creates a journal
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+
+    def read(self):
+        """Return the latest count per key recorded in the journal file."""
+        counts = {}
+        try:
+            with open(self.journal_file, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            return counts
+        pos = 0
+        while pos < len(data):
+            end = pos + 1 + data[pos]
+            if end + COUNT.size > len(data):
+                break  # Entry cut short by a crash; everything before it is intact
+            key = data[pos + 1:end].decode('utf-8')
+            counts[key] = COUNT.unpack_from(data, end)[0]
+            pos = end + COUNT.size
+        return counts
+
+    def append(self, key, play_count):
+        """Record a track's new play count; returns as soon as the entry is written."""
+        self.append_many({key: play_count})
+
+    def append_many(self, counts):
+        """Record new play counts for many tracks (key -> count) in a single write."""
+        with self._lock:
+            due = self._write(counts)
+        if due:
+            self._wake.set()
+
+    def merge_many(self, counts, merge, stored):
+        """Merge counts (key -> count) into the latest journaled ones, else those stored, in a single write.
+
+        Each track's count becomes merge(latest, count), read and written under
+        the journal's lock so no append in between is lost. Returns the counts
+        that changed (key -> count).
+        """
+        with self._lock:
+            merged = {}
+            for key, count in counts.items():
+                latest = self.pending.get(key, stored[key])
+                count = merge(latest, count)
+                if count != latest:
+                    merged[key] = count
+            due = self._write(merged) if merged else False
+        if due:
+            self._wake.set()
+        return merged
+
+    def _write(self, counts):
+        """Append entries with the lock held; returns True once a compaction is due."""
+        entries = []
+        for key, play_count in counts.items():
+            encoded = key.encode('utf-8')
+            entries.append(bytes([len(encoded)]) + encoded + COUNT.pack(play_count))
+        if self._file is None:
+            self._file = open(self.journal_file, 'ab')
+        self._file.write(b"".join(entries))
+        self._file.flush()
+        self.pending.update(counts)
+        return self._file.tell() >= self.max_bytes
+
+    def start(self):
+        """Start the background compaction thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="play-journal", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._closed:
+                break
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Error compacting play journal: {e}")
+
+    def paused(self):
+        """Context manager that keeps compaction from rewriting the catalog file, for callers that rewrite it."""
+        return self._compact_lock
+
+    def compact(self):
+        """Merge the journaled counts into the catalog file and shrink the journal."""
+        with self._compact_lock:
+            with self._lock:
+                if not self.pending:
+                    return
+                counts = dict(self.pending)
+                if self._file is None:
+                    self._file = open(self.journal_file, 'ab')
+                mark = self._file.tell()
+
+            def merged():
+                for position, song in enumerate(iter_records(self.json_file), start=1):
+                    key = self.key_for_id(track_id(position, song))
+                    if key in counts and isinstance(song, dict):
+                        song["play_count"] = counts[key]
+                    yield song
+
+            write_records(self.json_file, merged())
+            if self.on_compacted:
+                self.on_compacted(self.json_file, counts)
+
+            with self._lock:
+                # Keep only entries written while the catalog was being rewritten
+                self._file.close()
+                with open(self.journal_file, 'rb') as file:
+                    file.seek(mark)
+                    tail = file.read()
+                tmp_path = self.journal_file + ".tmp"
+                with open(tmp_path, 'wb') as file:
+                    file.write(tail)
+                os.replace(tmp_path, self.journal_file)
+                self._file = open(self.journal_file, 'ab')
+                for key, count in counts.items():
+                    if self.pending.get(key) == count:
+                        del self.pending[key]
+
+    def close(self):
+        """Stop the background thread and compact whatever is left."""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.compact()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
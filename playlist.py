@@ -0,0 +1,73 @@
+import random
+from collections import Counter, deque
+
+
+class Playlist:
+    """An ordered queue of track keys with shuffle, repeat and dedupe.
+
+    Entries are track keys rather than titles, so tracks that share a title
+    stay distinct and playing never has to search the catalog.
+    """
+
+    def __init__(self, dedupe=False, shuffle=False, repeat=1):
+        self.entries = deque()
+        self.members = Counter()  # key -> times it appears in entries
+        self.dedupe = dedupe
+        self.shuffle = shuffle
+        self.repeat = repeat
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, key):
+        return key in self.members
+
+    def add(self, key):
+        """Queue a track at the end; returns False if dedupe skipped it."""
+        if self.dedupe and key in self.members:
+            return False
+        self.entries.append(key)
+        self.members[key] += 1
+        return True
+
+    def play_next(self, key):
+        """Queue a track at the front; returns False if dedupe skipped it."""
+        if self.dedupe and key in self.members:
+            return False
+        self.entries.appendleft(key)
+        self.members[key] += 1
+        return True
+
+    def set_dedupe(self, dedupe):
+        """Turn dedupe on or off; turning it on drops later repeats of a track."""
+        self.dedupe = dedupe
+        if dedupe and len(self.members) < len(self.entries):
+            self.entries = deque(dict.fromkeys(self.entries))
+            self.members = Counter(self.entries)
+
+    def shuffle_entries(self, rng=random):
+        """Shuffle the queue in place."""
+        entries = list(self.entries)
+        rng.shuffle(entries)
+        self.entries = deque(entries)
+
+    def play_order(self, rng=random):
+        """Return the keys in the order one run plays them, honouring shuffle and repeat."""
+        order = []
+        for _ in range(self.repeat):
+            run = list(self.entries)
+            if self.shuffle:
+                rng.shuffle(run)
+            order.extend(run)
+        return order
+
+    def play_counts(self):
+        """Return how many times one run plays each key, without expanding the run."""
+        return Counter({key: count * self.repeat for key, count in self.members.items()})
+
+    def clear(self):
+        self.entries.clear()
+        self.members.clear()
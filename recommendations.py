@@ -0,0 +1,304 @@
+"""Co-play index: which tracks get played together, for "play next" suggestions.
+
+Every played playlist adds one to the count of each pair of different
+tracks that sit within WINDOW places of each other in it. Counts live in one
+dict keyed by the pair, and each track keeps its TOP_K most co-played
+neighbours, sorted. Counts only grow, so a neighbour can only enter a top
+list when its own count rises. The lists stay exact (up to which of tied
+neighbours is kept) while an update costs O(TOP_K), and a suggestion reads a
+few top lists without visiting the pairs.
+
+Played playlists are counted on one worker thread, so the windows never
+wait for the index. It is saved next to the library file SAVE_DELAY seconds
+after the first playlist that changed it, on that thread too, and at exit.
+Layout (all little-endian):
+
+    header      HEADER
+    top_tracks  tracks x u32, track id owning each top list
+    top_lengths tracks x u32, entries in each top list
+    neighbours  entries x u32, the top lists back to back, most co-played first
+    weights     entries x u32, co-play count of each of those entries
+    pairs       pairs x u64, (smaller id << 32) | larger id
+    counts      pairs x u32, co-play count of each pair
+
+Opening the index reads the top list arrays only, and a track's list is
+turned into Python objects when it is first used; the pairs are read the
+first time a playlist is recorded.
+"""
+import atexit
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import insort
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+
+import tracks_library as lib
+
+MAGIC = b"JBCP"
+VERSION = 1
+HEADER = struct.Struct("<4sIIIQQQ")  # magic, version, top_k, window, tracks, top entries, pairs
+TOP_K = 10  # Neighbours kept per track
+WINDOW = 5  # Tracks this many places apart or closer count as played together
+SEEDS = 5  # Playlist entries, soonest first, whose neighbours are suggested
+SUGGESTIONS = 5
+SAVE_DELAY = 10.0  # Seconds after a change before the index is written; later playlists join that write
+
+
+def index_path(library_file):
+    """Return where the co-play index of a library file is kept."""
+    return library_file + ".coplay"
+
+
+def _read_array(file, typecode, count):
+    values = array(typecode)
+    values.fromfile(file, count)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _write_array(file, values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    values.tofile(file)
+
+
+class CoPlayIndex:
+    """Co-play counts between track ids and each track's top neighbours; safe to share between threads."""
+
+    def __init__(self, path=None, top_k=TOP_K, window=WINDOW):
+        self.path = path
+        self.top_k = top_k
+        self.window = window
+        self.top = {}  # track id -> [(-count, neighbour id)], most co-played first
+        self._stored = {}  # track id -> number of its list in the loaded arrays, until it is first used
+        self._offsets = self._neighbours = self._weights = None  # Top lists as loaded, back to back
+        self.pairs = None  # pair -> count, read on the first record()
+        self._pairs_at = None  # File offset of the pairs section, if the index was loaded
+        self._pair_count = 0
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read the top lists from path; raises ValueError if the file is not a co-play index."""
+        with open(self.path, "rb") as file:
+            magic, version, top_k, window, tracks, entries, pairs = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{self.path} is not a version {VERSION} co-play index.")
+            owners = _read_array(file, "I", tracks)
+            lengths = _read_array(file, "I", tracks)
+            neighbours = _read_array(file, "I", entries)
+            weights = _read_array(file, "I", entries)
+            pairs_at = file.tell()
+        with self._lock:
+            self.top_k, self.window = top_k, window  # The lists were kept with these
+            self.top = {}
+            self._stored = dict(zip(owners, range(tracks)))
+            self._offsets = array("Q", accumulate(lengths, initial=0))
+            self._neighbours, self._weights = neighbours, weights
+            self.pairs = None
+            self._pairs_at, self._pair_count = pairs_at, pairs
+        return self
+
+    def _read_pairs(self):
+        """Return the pair counts saved in the file; called without the lock, so suggestions go on meanwhile."""
+        pairs_at, pair_count = self._pairs_at, self._pair_count
+        if pairs_at is None:
+            return {}
+        with open(self.path, "rb") as file:
+            file.seek(pairs_at)
+            pairs = _read_array(file, "Q", pair_count)
+            counts = _read_array(file, "I", pair_count)
+        return dict(zip(pairs, counts))
+
+    def _load_pairs(self):
+        if self.pairs is None:
+            pairs = self._read_pairs()
+            with self._lock:
+                if self.pairs is None:
+                    self.pairs = pairs
+
+    def record(self, track_ids):
+        """Count one played playlist, given as track ids in play order; returns the pairs counted."""
+        together = set()
+        for i, a in enumerate(track_ids):
+            for b in track_ids[i + 1:i + 1 + self.window]:
+                if a != b:
+                    together.add((a, b) if a < b else (b, a))  # A pair counts once per playlist
+        self._load_pairs()
+        with self._lock:
+            for a, b in together:
+                pair = a << 32 | b
+                count = self.pairs.get(pair, 0) + 1
+                self.pairs[pair] = count
+                self._offer(a, b, count)
+                self._offer(b, a, count)
+        return len(together)
+
+    def _top_of(self, track):
+        """Return a track's top list, made from the loaded arrays on first use; None if it has none."""
+        top = self.top.get(track)
+        if top is None:
+            number = self._stored.pop(track, None)
+            if number is not None:
+                start, end = self._offsets[number], self._offsets[number + 1]
+                top = self.top[track] = list(zip([-weight for weight in self._weights[start:end]],
+                                                 self._neighbours[start:end]))
+        return top
+
+    def _offer(self, track, neighbour, count):
+        """Put neighbour into track's top list with its new count if it now belongs there."""
+        top = self._top_of(track)
+        if top is None:
+            top = self.top[track] = []
+        for i, (_, other) in enumerate(top):
+            if other == neighbour:
+                del top[i]
+                break
+        else:
+            if len(top) >= self.top_k and -count >= top[-1][0]:
+                return  # Not above the weakest neighbour kept
+        insort(top, (-count, neighbour))
+        if len(top) > self.top_k:
+            top.pop()
+
+    def neighbours(self, track_id):
+        """Return the (track id, co-play count) of a track's top neighbours, most co-played first."""
+        with self._lock:
+            return [(neighbour, -count) for count, neighbour in self._top_of(track_id) or ()]
+
+    def suggest(self, seeds, exclude=()):
+        """Return track ids ranked by how often they were played with the seeds, leaving out seeds and exclude.
+
+        Costs O(len(seeds) x TOP_K) whatever the size of the index.
+        """
+        scores = {}
+        skip = set(seeds).union(exclude)
+        with self._lock:
+            for seed in seeds:
+                for count, neighbour in self._top_of(seed) or ():
+                    if neighbour not in skip:
+                        scores[neighbour] = scores.get(neighbour, 0) - count
+        return sorted(scores, key=lambda neighbour: (-scores[neighbour], neighbour))
+
+    def save(self):
+        """Write the index to path atomically; the lock is held while copying it, not while writing.
+
+        Saves must not run on two threads at once.
+        """
+        self._load_pairs()  # They go into the new file too
+        with self._lock:
+            owners, lengths, neighbours, weights = array("I"), array("I"), array("I"), array("I")
+            for owner, top in self.top.items():
+                owners.append(owner)
+                lengths.append(len(top))
+                for count, neighbour in top:
+                    neighbours.append(neighbour)
+                    weights.append(-count)
+            for owner, number in self._stored.items():  # Lists never used since loading are copied as they are
+                start, end = self._offsets[number], self._offsets[number + 1]
+                owners.append(owner)
+                lengths.append(end - start)
+                neighbours.extend(self._neighbours[start:end])
+                weights.extend(self._weights[start:end])
+            pairs, counts = array("Q", self.pairs.keys()), array("I", self.pairs.values())
+            header = HEADER.pack(MAGIC, VERSION, self.top_k, self.window, len(owners), len(neighbours), len(pairs))
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(header)
+            for values in (owners, lengths, neighbours, weights):
+                _write_array(file, values)
+            pairs_at = file.tell()
+            _write_array(file, pairs)
+            _write_array(file, counts)
+        os.replace(tmp_path, self.path)
+        with self._lock:
+            self._pairs_at, self._pair_count = pairs_at, len(pairs)
+
+
+_indexes = {}  # Library file path -> CoPlayIndex
+_worker = None  # Thread counting playlists and saving indexes
+_unsaved = set()  # Indexes changed since they were last saved; used on the worker thread only
+_save_timer = None
+
+
+def get_recommender(library_file=None):
+    """Return the co-play index of a library file (default: the windows' library), reading it on first use."""
+    path = os.path.abspath(library_file or lib.LIBRARY_FILE)
+    index = _indexes.get(path)
+    if index is None:
+        index = CoPlayIndex(index_path(path))
+        if os.path.exists(index.path):
+            try:
+                index.load()
+            except (OSError, ValueError, struct.error, EOFError) as e:
+                print(f"Ignoring co-play index {index.path}: {e}")
+                index = CoPlayIndex(index_path(path))  # Starts empty and replaces the file on the next save
+        _indexes[path] = index
+    return index
+
+
+def _get_worker():
+    global _worker
+    if _worker is None:
+        _worker = ThreadPoolExecutor(1, thread_name_prefix="coplay")
+        atexit.register(flush)
+    return _worker
+
+
+def _record(index, track_ids):
+    global _save_timer
+    if index.record(track_ids):
+        _unsaved.add(index)
+        if _save_timer is None:
+            _save_timer = threading.Timer(SAVE_DELAY, lambda: _get_worker().submit(_save_unsaved))
+            _save_timer.daemon = True
+            _save_timer.start()
+
+
+def _save_unsaved():
+    global _save_timer
+    if _save_timer is not None:
+        _save_timer.cancel()  # Harmless when it is the timer that called
+        _save_timer = None
+    while _unsaved:
+        index = _unsaved.pop()
+        try:
+            index.save()
+        except OSError as e:
+            print(f"Could not save co-play index {index.path}: {e}")
+
+
+def record_playlist(keys, library_file=None):
+    """Count a played playlist of track keys, in play order, on the worker thread; the save follows later."""
+    index = get_recommender(library_file)
+    track_ids = [lib.parse_key(key) for key in keys]
+    _get_worker().submit(_record, index, [track_id for track_id in track_ids if track_id is not None])
+
+
+def flush():
+    """Wait until every recorded playlist is counted and save the indexes they changed."""
+    if _worker is None:
+        return
+    try:
+        _worker.submit(_save_unsaved).result()
+    except RuntimeError:  # At exit the worker has already finished its queue
+        _save_unsaved()
+
+
+def suggest_next(keys, n=SUGGESTIONS, library_file=None):
+    """Return up to n keys of library tracks often played with the first SEEDS of keys, none of them in keys."""
+    index = get_recommender(library_file)
+    track_ids = [lib.parse_key(key) for key in keys]
+    seeds = [track_id for track_id in track_ids[:SEEDS] if track_id is not None]
+    suggestions = []
+    for track_id in index.suggest(seeds, exclude=track_ids):
+        key = lib.make_key(track_id)
+        if key in lib.library:
+            suggestions.append(key)
+            if len(suggestions) == n:
+                break
+    return suggestions
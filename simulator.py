@@ -0,0 +1,304 @@
+"""Jukebox traffic simulator: thousands of virtual listeners on a simulated clock.
+
+Each listener is an asyncio task. It builds a playlist from a popularity
+distribution, "listens" to each track for a few simulated minutes, and then
+records the play, and sometimes a rating, through the same tracks_library
+calls the windows use. Simulated time only moves when every listener is
+waiting, so an hour of traffic takes as long as its persistence calls.
+
+    python simulator.py [--tracks 10000] [--format json|sqlite] [--listeners 2000] [--duration 3600]
+    python simulator.py --library song.json [--daemon SOCKET] ...
+
+Without --library a synthetic catalog is written to a temporary directory.
+With --library that file is updated in place. The report gives event
+throughput, latency percentiles of the persistence calls, and whether the
+file ends up holding every play and rating that was sent.
+"""
+import argparse
+import asyncio
+import bisect
+import heapq
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import storage
+import tracks_library as lib
+from playlist import Playlist
+
+LISTENERS = 2000
+DURATION = 3600.0  # Simulated seconds
+TRACK_SECONDS = (120.0, 300.0)  # Simulated length of one play
+PLAYLIST_LENGTH = (3, 12)
+SESSION_GAP = 600.0  # Mean simulated seconds between a listener's playlists
+RATE_PROBABILITY = 0.1  # Chance that a play is followed by a rating
+DISTRIBUTIONS = ("zipf", "uniform")
+ZIPF_S = 1.1
+LATENCY_PERCENTILES = (50, 90, 99, 99.9)
+
+
+class SimClock:
+    """Simulated time for asyncio tasks; advances to the next timer once every task is waiting on it."""
+
+    def __init__(self):
+        self.now = 0.0
+        self._timers = []  # (wake time, sequence, future)
+        self._sequence = itertools.count()
+        self._active = 0  # Tasks that are running rather than sleeping on the clock
+        self._idle = asyncio.Event()
+
+    def started(self):
+        """Count a new task as running."""
+        self._active += 1
+
+    def finished(self):
+        """A task ended; it no longer holds the clock back."""
+        self._active -= 1
+        if self._active == 0:
+            self._idle.set()
+
+    async def sleep(self, delay):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._timers, (self.now + delay, next(self._sequence), future))
+        self.finished()
+        await future
+
+    async def run(self, until):
+        """Advance time until no timer is due at or before until."""
+        if self._active == 0:
+            self._idle.set()
+        while True:
+            await self._idle.wait()
+            self._idle.clear()
+            if not self._timers or self._timers[0][0] > until:
+                return
+            self.now = self._timers[0][0]
+            while self._timers and self._timers[0][0] == self.now:
+                _, _, future = heapq.heappop(self._timers)
+                self._active += 1
+                future.set_result(None)
+
+
+class Popularity:
+    """Picks track keys from a Zipf-like or uniform distribution over the catalog."""
+
+    def __init__(self, keys, distribution="zipf", s=ZIPF_S, seed=0):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution {distribution!r}; expected one of {DISTRIBUTIONS}.")
+        if not keys:
+            raise ValueError("The library has no tracks to play.")
+        self.keys = list(keys)
+        random.Random(seed).shuffle(self.keys)  # Popularity rank is unrelated to catalog order
+        if distribution == "zipf":
+            self.cumulative = list(itertools.accumulate(1.0 / rank ** s for rank in range(1, len(self.keys) + 1)))
+        else:
+            self.cumulative = None
+
+    def pick(self, rng):
+        if self.cumulative is None:
+            return self.keys[rng.randrange(len(self.keys))]
+        point = rng.random() * self.cumulative[-1]
+        return self.keys[min(bisect.bisect_right(self.cumulative, point), len(self.keys) - 1)]
+
+
+def percentiles(values, points=LATENCY_PERCENTILES):
+    """Return {percentile: value} by nearest rank; empty when there are no values."""
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    return {point: ordered[min(len(ordered) - 1, int(point / 100 * len(ordered)))] for point in points}
+
+
+class Simulator:
+    """Runs the listeners against the loaded library and keeps what they sent, for the consistency check."""
+
+    def __init__(self, popularity, listeners=LISTENERS, duration=DURATION, rate_probability=RATE_PROBABILITY, seed=0):
+        self.popularity = popularity
+        self.listeners = listeners
+        self.duration = duration
+        self.rate_probability = rate_probability
+        self.seed = seed
+        self.clock = None
+        self.before = {}  # key -> play count before the first simulated play
+        self.plays = Counter()  # key -> plays sent
+        self.ratings = {}  # key -> last rating sent
+        self.latencies = []  # Seconds per persistence call
+        self.errors = 0
+
+    def play(self, key):
+        if key not in self.before:
+            self.before[key] = lib.get_play_count(key)
+        started = time.perf_counter()
+        try:
+            lib.record_plays({key: 1})
+        except Exception as e:
+            self.errors += 1
+            print(f"Play of {key} failed: {e}")
+            return
+        self.latencies.append(time.perf_counter() - started)
+        self.plays[key] += 1
+
+    def rate(self, key, rating):
+        started = time.perf_counter()
+        try:
+            lib.save_rating(key, rating)
+        except Exception as e:
+            self.errors += 1
+            print(f"Rating of {key} failed: {e}")
+            return
+        self.latencies.append(time.perf_counter() - started)
+        self.ratings[key] = rating
+
+    async def listener(self, rng):
+        clock = self.clock
+        try:
+            await clock.sleep(rng.uniform(0, SESSION_GAP))  # Listeners do not all start at once
+            while True:
+                playlist = Playlist(dedupe=True)
+                for _ in range(rng.randint(*PLAYLIST_LENGTH)):
+                    playlist.add(self.popularity.pick(rng))
+                for key in playlist.play_order(rng):
+                    await clock.sleep(rng.uniform(*TRACK_SECONDS))
+                    self.play(key)
+                    if rng.random() < self.rate_probability:
+                        self.rate(key, rng.randint(1, 5))
+                await clock.sleep(rng.expovariate(1 / SESSION_GAP))
+        finally:
+            clock.finished()
+
+    async def run(self):
+        """Simulate duration seconds of traffic; returns the wall-clock seconds it took."""
+        self.clock = SimClock()
+        tasks = []
+        for number in range(self.listeners):
+            self.clock.started()
+            tasks.append(asyncio.create_task(self.listener(random.Random(f"{self.seed}:{number}"))))
+        started = time.perf_counter()
+        try:
+            await self.clock.run(self.duration)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return time.perf_counter() - started
+
+    def check(self, library_file):
+        """Persist everything, reread library_file from disk and compare it with what was sent."""
+        client = lib.get_daemon_client()
+        if client is not None:
+            client.request({"flush": True})
+        else:
+            lib.close_storage(library_file)  # Folds journaled plays into song.json
+        for _ in lib.iter_load_library(library_file, use_snapshot=False):
+            pass
+        lost = extra = 0
+        for key, sent in self.plays.items():
+            difference = lib.get_play_count(key) - (self.before[key] + sent)
+            lost += max(0, -difference)
+            extra += max(0, difference)
+        mismatched = sum(lib.get_rating(key) != rating for key, rating in self.ratings.items())
+        return {"lost_plays": lost, "extra_plays": extra, "rating_mismatches": mismatched}
+
+    def report(self, wall_seconds, consistency):
+        plays, ratings = sum(self.plays.values()), len(self.latencies) - sum(self.plays.values())
+        return {
+            "listeners": self.listeners,
+            "simulated_s": self.duration,
+            "wall_s": wall_seconds,
+            "plays": plays,
+            "ratings": ratings,
+            "errors": self.errors,
+            "events_per_s": (plays + ratings) / wall_seconds if wall_seconds else None,
+            "latency_ms": {str(point): value * 1000 for point, value in percentiles(self.latencies).items()},
+            "max_latency_ms": max(self.latencies, default=0) * 1000,
+            "consistency": consistency,
+        }
+
+
+def simulate(library_file, listeners=LISTENERS, duration=DURATION, distribution="zipf", zipf_s=ZIPF_S,
+             rate_probability=RATE_PROBABILITY, seed=0):
+    """Load library_file, run the simulation against it and return the report."""
+    client = lib.get_daemon_client()
+    if client is not None:
+        client.request({"flush": True})  # Start from the daemon's totals
+    lib.load_library_from_json(library_file)
+    popularity = Popularity(lib.library.keys(), distribution, zipf_s, seed)
+    simulator = Simulator(popularity, listeners, duration, rate_probability, seed)
+    wall_seconds = asyncio.run(simulator.run())
+    return simulator.report(wall_seconds, simulator.check(library_file))
+
+
+def format_report(report):
+    latency = ", ".join(f"p{point}={value:.2f}" for point, value in report["latency_ms"].items())
+    consistency = report["consistency"]
+    return "\n".join([
+        f"{report['listeners']} listeners, {report['simulated_s']:.0f} simulated seconds in {report['wall_s']:.2f}s",
+        f"Events: {report['plays']} plays, {report['ratings']} ratings, {report['errors']} errors "
+        f"= {report['events_per_s'] or 0:,.0f} events/s",
+        f"Persistence latency (ms): {latency}, max={report['max_latency_ms']:.2f}",
+        f"Consistency: {consistency['lost_plays']} plays lost, {consistency['extra_plays']} extra, "
+        f"{consistency['rating_mismatches']} ratings mismatched",
+    ])
+
+
+def make_library(directory, tracks, file_format):
+    """Write a synthetic catalog of tracks into directory and return its path."""
+    from benchmarks.synthetic import make_records
+    from catalog_loader import write_records
+    json_file = os.path.join(directory, "song.json")
+    write_records(json_file, make_records(tracks))
+    if file_format == "json":
+        return json_file
+    db_file = os.path.join(directory, "song.db")
+    storage.migrate(json_file, db_file)
+    return db_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate jukebox listeners against the library storage.")
+    parser.add_argument("--library", help="library file to update in place (default: a temporary synthetic one)")
+    parser.add_argument("--tracks", type=int, default=10_000, help="size of the synthetic catalog")
+    parser.add_argument("--format", choices=("json", "sqlite"), default="json", help="storage of the synthetic catalog")
+    parser.add_argument("--listeners", type=int, default=LISTENERS)
+    parser.add_argument("--duration", type=float, default=DURATION, help="simulated seconds")
+    parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="zipf")
+    parser.add_argument("--zipf-s", type=float, default=ZIPF_S, help="Zipf exponent of track popularity")
+    parser.add_argument("--rate-probability", type=float, default=RATE_PROBABILITY)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--daemon", help="send events to the play daemon on this socket (needs --library)")
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    args = parser.parse_args(argv)
+    if args.daemon and not args.library:
+        parser.error("--daemon needs --library, the file the daemon serves")
+
+    options = dict(listeners=args.listeners, duration=args.duration, distribution=args.distribution,
+                   zipf_s=args.zipf_s, rate_probability=args.rate_probability, seed=args.seed)
+    if args.daemon:
+        lib.use_daemon(args.daemon)
+    try:
+        if args.library:
+            report = simulate(args.library, **options)
+        else:
+            with tempfile.TemporaryDirectory() as directory:
+                report = simulate(make_library(directory, args.tracks, args.format), **options)
+                lib.close_storage(lib.library_file)
+                lib.library = lib.index = None  # Unmap the snapshot before the directory goes away
+    finally:
+        lib.use_daemon(None)
+
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Report written to {args.output}")
+    consistency = report["consistency"]
+    return 1 if consistency["lost_plays"] or consistency["rating_mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import tkinter as tk
+import instrumentation
+
+REFRESH_MS = 1000  # How often the panel redraws while collection is on
+ROWS = 8  # Timers shown, the most total time first
+
+class StatsPanel:
+    def __init__(self, parent):
+        """A frame with live timers and counters, a switch for collecting them and a profiling trigger."""
+        self.frame = tk.LabelFrame(parent, text="Performance")
+
+        self.enabled_var = tk.BooleanVar(self.frame, instrumentation.enabled)
+        enabled_chk = tk.Checkbutton(self.frame, text="Collect stats", variable=self.enabled_var, command=self.toggle)
+        enabled_chk.grid(row=0, column=0, sticky="W", padx=5)
+
+        reset_btn = tk.Button(self.frame, text="Reset", command=self.reset)
+        reset_btn.grid(row=0, column=1, padx=5)
+
+        names = instrumentation.names() or [""]
+        self.profile_var = tk.StringVar(self.frame, names[0])
+        self.profile_menu = tk.OptionMenu(self.frame, self.profile_var, *names)
+        self.profile_menu.grid(row=0, column=2, padx=5)
+        self.known_names = len(names)
+
+        profile_btn = tk.Button(self.frame, text="Profile Next Call", command=self.profile_next)
+        profile_btn.grid(row=0, column=3, padx=5)
+
+        self.status_lbl = tk.Label(self.frame, text="", font=("Helvetica", 10))
+        self.status_lbl.grid(row=1, column=0, columnspan=4, sticky="W", padx=5)
+
+        self.stats_txt = tk.Text(self.frame, width=72, height=ROWS + 1, wrap="none", font=("Courier", 9))
+        self.stats_txt.grid(row=2, column=0, columnspan=4, padx=5, pady=5)
+
+        self.refresh()
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def toggle(self):
+        instrumentation.enable(self.enabled_var.get())
+
+    def reset(self):
+        instrumentation.reset()
+        self.draw()
+
+    def profile_next(self):
+        """Capture the next call of the chosen function with cProfile."""
+        name = self.profile_var.get()
+        if not name:
+            return
+        self.enabled_var.set(True)
+        instrumentation.enable()
+        instrumentation.profile_next(name)
+        self.status_lbl.configure(text=f"The next call of {name} will be profiled.")
+
+    def update_names(self):
+        """Offer functions of windows opened since, whose modules load on first use."""
+        names = instrumentation.names()
+        if len(names) == self.known_names:
+            return
+        menu = self.profile_menu["menu"]
+        menu.delete(0, tk.END)
+        for name in names:
+            menu.add_command(label=name, command=lambda name=name: self.profile_var.set(name))
+        self.known_names = len(names)
+
+    def draw(self):
+        self.update_names()
+        stats = instrumentation.snapshot()
+        self.stats_txt.delete("1.0", tk.END)
+        self.stats_txt.insert("1.0", instrumentation.format_stats(stats, ROWS))
+        if stats["profiles"]:
+            self.status_lbl.configure(text=f"Last profile: {stats['profiles'][-1]}")
+
+    def refresh(self):
+        """Redraw every second; costs nothing beyond the timer while collection is off."""
+        if instrumentation.enabled:
+            self.draw()
+        self.frame.after(REFRESH_MS, self.refresh)
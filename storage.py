@@ -0,0 +1,391 @@
+"""Places the track library is kept: a song.json file (the default) or a SQLite database.
+
+Both backends offer the same methods, so tracks_library and the windows do
+not care which one a library file uses; the file extension decides.
+"""
+import contextlib
+import os
+import sys
+import threading
+
+import catalog
+from catalog_loader import BATCH_SIZE, MAX_TRACK_ID, TrackIdSet, iter_batches, iter_records, track_id, validate_record, write_records
+from play_journal import PlayJournal
+
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,  -- The record's "id" in the song.json it came from, else its record number there
+    title TEXT NOT NULL,
+    singer TEXT NOT NULL,
+    rating INTEGER NOT NULL CHECK (rating BETWEEN 0 AND 5),
+    link TEXT NOT NULL,
+    image_url TEXT,
+    play_count INTEGER NOT NULL DEFAULT 0 CHECK (play_count >= 0)
+);
+CREATE INDEX IF NOT EXISTS tracks_singer ON tracks (singer);
+CREATE INDEX IF NOT EXISTS tracks_rating ON tracks (rating);
+CREATE INDEX IF NOT EXISTS tracks_play_count ON tracks (play_count);
+"""
+COLUMNS = "id, title, singer, rating, link, image_url, play_count"
+ORDERS = {None: "id", "rating": "rating DESC, id", "play_count": "play_count DESC, id"}
+
+
+def is_sqlite_path(path):
+    return path.lower().endswith(SQLITE_SUFFIXES)
+
+
+class JsonStorage:
+    """A song.json file; play counts go to a journal and ratings rewrite the file."""
+
+    snapshots = True  # The library can be mapped from a catalog_snapshot
+
+    def __init__(self, path, key_for_id, id_for_key, on_rewritten=None):
+        self.path = os.path.abspath(path)
+        self.key_for_id = key_for_id
+        self.id_for_key = id_for_key
+        self.on_rewritten = on_rewritten  # Called with the path, counts and ratings after this process rewrites the file
+        self._journal = None
+        self._rewrite_lock = threading.Lock()  # Rewrites come from the Tk thread and from catalog ingestion
+
+    @property
+    def journal(self):
+        """The play-count journal, started on first use."""
+        if self._journal is None:
+            self._journal = PlayJournal(self.path, self.key_for_id, on_compacted=self._compacted)
+            self._journal.start()
+        return self._journal
+
+    def _compacted(self, path, counts=None, ratings=None):
+        catalog.invalidate(path)  # The journal rewrote the file behind the catalog cache
+        if self.on_rewritten:
+            self.on_rewritten(path, counts or {}, ratings or {})
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def signature(self):
+        return catalog.signature(self.path)
+
+    def pending(self):
+        """Return play counts saved but not yet in the file (key -> count)."""
+        return self.journal.pending
+
+    def iter_batches(self, batch_size=BATCH_SIZE, skipped=None, on_record=None):
+        return iter_batches(self.path, batch_size, skipped, on_record)
+
+    def records(self):
+        return catalog.load(self.path)
+
+    def save_play_counts(self, counts):
+        """Persist new play counts (key -> count)."""
+        self.journal.append_many(counts)
+
+    @contextlib.contextmanager
+    def _exclusive(self):
+        """Keep the journal from compacting into the file, and other threads from rewriting it, during a rewrite."""
+        with self._rewrite_lock, (self._journal.paused() if self._journal is not None else contextlib.nullcontext()):
+            yield
+
+    def apply(self, counts, ratings):
+        """Persist absolute play counts and ratings (key -> value) with one atomic rewrite of the file."""
+        def patched():
+            for position, song in enumerate(iter_records(self.path), start=1):
+                key = self.key_for_id(track_id(position, song))
+                if isinstance(song, dict) and (key in counts or key in ratings):
+                    song = dict(song)
+                    if key in counts:
+                        song["play_count"] = counts[key]
+                    if key in ratings:
+                        song["rating"] = ratings[key]
+                yield song
+
+        if counts and self._journal is not None:
+            self._journal.append_many(counts)  # Older journaled counts must not overwrite these when compacted
+        with self._exclusive():  # A compaction in between would be overwritten with the counts read here
+            write_records(self.path, patched())
+        self._compacted(self.path, counts, ratings)
+
+    def add_tracks(self, records, counts, merge=None):
+        """Append song.json records and persist play counts (key -> count) with one atomic rewrite.
+
+        Each count replaces the track's, or with merge becomes merge(current, count),
+        current being the count in the journal or the file during the rewrite.
+        The new records get explicit ids above every id in the file. Returns
+        their keys and the play counts that changed (key -> count). The library
+        in memory does not hold them yet, so the rewrite is not reported to
+        on_rewritten and the next ensure_library() reloads the file.
+        """
+        merge = merge or (lambda current, count: count)
+        keys, stored = [], {}
+        journal = self.journal  # Started, so plays not yet compacted are counted
+
+        def extended():
+            largest = 0
+            for position, song in enumerate(iter_records(self.path), start=1):
+                song_id = track_id(position, song)
+                if type(song_id) is int:
+                    largest = max(largest, song_id)
+                key = self.key_for_id(song_id)
+                if isinstance(song, dict) and key in counts:
+                    stored[key] = song.get("play_count", 0)
+                    song = dict(song, play_count=merge(journal.pending.get(key, stored[key]), counts[key]))
+                yield song
+            if largest + len(records) > MAX_TRACK_ID:
+                raise ValueError(f"Track ids would pass {MAX_TRACK_ID}.")
+            for song_id, record in enumerate(records, start=largest + 1):
+                keys.append(self.key_for_id(song_id))
+                # First, where catalog_snapshot expects it, and never a shard's own id
+                yield {"id": song_id, **{field: value for field, value in record.items() if field != "id"}}
+
+        with self._exclusive():  # Compaction waits, so journaled counts older than these cannot overwrite them
+            write_records(self.path, extended())
+            changed = journal.merge_many({key: counts[key] for key in stored}, merge, stored)
+        catalog.invalidate(self.path)
+        return keys, changed
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+class SqliteStorage:
+    """A SQLite database in WAL mode with indexes on singer, rating and play count.
+
+    Updates are batched into one executemany per call, and the queries behind
+    find() are answered from the indexes instead of scanning the library.
+    """
+
+    snapshots = False
+
+    def __init__(self, path, key_for_id, id_for_key):
+        self.path = os.path.abspath(path)
+        self.key_for_id = key_for_id
+        self.id_for_key = id_for_key
+        import sqlite3  # Loaded here so JSON libraries never pay for it
+        self._lock = threading.Lock()  # One connection shared by every thread of the process
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL; commits skip one fsync
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(tracks)")]
+        if "position" in columns:  # Databases made before the column was named for what it holds
+            with self.connection:
+                self.connection.execute("ALTER TABLE tracks RENAME COLUMN position TO id")
+        self.connection.executescript(SCHEMA)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def signature(self):
+        """Return a value that changes when another connection commits to the database."""
+        with self._lock:
+            return ("sqlite", self.connection.execute("PRAGMA data_version").fetchone()[0])
+
+    def pending(self):
+        return {}  # Every write is committed straight away
+
+    def iter_batches(self, batch_size=BATCH_SIZE, skipped=None, on_record=None):
+        """Yield lists of (track id, fields) like catalog_loader.iter_batches."""
+        with self._lock:
+            cursor = self.connection.execute(f"SELECT {COLUMNS} FROM tracks ORDER BY id")
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            batch = []
+            for song_id, title, singer, rating, link, image_url, play_count in rows:
+                if on_record is not None:
+                    on_record(self._record(title, singer, rating, link, image_url, play_count))
+                batch.append((song_id, {
+                    "title": title, "singer": singer, "rating": rating, "link": link,
+                    "image_path": image_url, "play_count": play_count,
+                }))
+            yield batch
+
+    @staticmethod
+    def _record(title, singer, rating, link, image_url, play_count):
+        return {"title": title, "singer": singer, "rating": rating, "link": link,
+                "image_url": image_url, "play_count": play_count}
+
+    def records(self):
+        """Return every track as a song.json record."""
+        with self._lock:
+            rows = self.connection.execute(f"SELECT {COLUMNS} FROM tracks ORDER BY id").fetchall()
+        return [self._record(*row[1:]) for row in rows]
+
+    def _update(self, column, values):
+        params = []
+        for key, value in values.items():
+            song_id = self.id_for_key(key)
+            if song_id is None:
+                raise KeyError(key)
+            params.append((value, song_id))
+        with self._lock, self.connection:  # One transaction for the whole batch
+            self.connection.executemany(f"UPDATE tracks SET {column} = ? WHERE id = ?", params)
+
+    def save_play_counts(self, counts):
+        """Persist new play counts (key -> count) in one transaction."""
+        self._update("play_count", counts)
+
+    def apply(self, counts, ratings):
+        """Persist absolute play counts and ratings (key -> value) in one transaction."""
+        with self._lock, self.connection:
+            for column, values in (("play_count", counts), ("rating", ratings)):
+                self.connection.executemany(f"UPDATE tracks SET {column} = ? WHERE id = ?",
+                                            [(value, self.id_for_key(key)) for key, value in values.items()])
+
+    def add_tracks(self, records, counts, merge=None):
+        """Insert song.json records after the last track and persist play counts in one transaction.
+
+        Each count replaces the track's, or with merge becomes merge(current, count).
+        Returns the keys of the new tracks and the play counts that changed (key -> count).
+        """
+        merge = merge or (lambda current, count: count)
+        changed = {}
+        with self._lock, self.connection:
+            for key, count in counts.items():
+                row = self.connection.execute("SELECT play_count FROM tracks WHERE id = ?",
+                                              (self.id_for_key(key),)).fetchone()
+                if row is None:
+                    continue
+                merged = merge(row[0], count)
+                if merged != row[0]:
+                    changed[key] = merged
+            largest = self.connection.execute("SELECT COALESCE(MAX(id), 0) FROM tracks").fetchone()[0]
+            if largest + len(records) > MAX_TRACK_ID:
+                raise ValueError(f"Track ids would pass {MAX_TRACK_ID}.")
+            rows = [(song_id, record["title"], record["singer"], record["rating"], record["link"],
+                     record.get("image_url"), record.get("play_count", 0))
+                    for song_id, record in enumerate(records, start=largest + 1)]
+            self.connection.executemany(f"INSERT INTO tracks ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self.connection.executemany("UPDATE tracks SET play_count = ? WHERE id = ?",
+                                        [(count, self.id_for_key(key)) for key, count in changed.items()])
+        return [self.key_for_id(row[0]) for row in rows], changed
+
+    def find(self, singer=None, min_rating=None, min_play_count=None, order_by=None, limit=None):
+        """Return the keys of tracks matching every given condition, using the indexes."""
+        sql, params = self.find_query(singer, min_rating, min_play_count, order_by, limit)
+        with self._lock:
+            rows = self.connection.execute(sql, params).fetchall()
+        return [self.key_for_id(song_id) for song_id, in rows]
+
+    @staticmethod
+    def find_query(singer=None, min_rating=None, min_play_count=None, order_by=None, limit=None):
+        conditions, params = [], []
+        if singer is not None:
+            conditions.append("singer = ?")
+            params.append(singer)
+        if min_rating is not None:
+            conditions.append("rating >= ?")
+            params.append(min_rating)
+        if min_play_count is not None:
+            conditions.append("play_count >= ?")
+            params.append(min_play_count)
+        sql = "SELECT id FROM tracks"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY " + ORDERS[order_by]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return sql, params
+
+    def import_json(self, json_file, batch_size=BATCH_SIZE):
+        """Copy the records of a song.json file into an empty database; returns the skipped records."""
+        with self._lock:
+            if self.connection.execute("SELECT 1 FROM tracks LIMIT 1").fetchone():
+                raise ValueError(f"{self.path} already holds tracks.")
+        skipped = []
+        rows = []
+        seen = TrackIdSet()
+        with self._lock, self.connection:
+            for position, song in enumerate(iter_records(json_file), start=1):
+                try:
+                    fields = validate_record(song)
+                    song_id = track_id(position, song)
+                    if not seen.add(song_id):
+                        raise ValueError(f"Duplicate track id {song_id}.")
+                except ValueError as e:
+                    skipped.append((position, str(e)))
+                    continue
+                rows.append((song_id, fields["title"], fields["singer"], fields["rating"], fields["link"],
+                             fields["image_path"], fields["play_count"]))
+                if len(rows) >= batch_size:
+                    self.connection.executemany(f"INSERT INTO tracks ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                    rows = []
+            self.connection.executemany(f"INSERT INTO tracks ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        with self._lock:
+            self.connection.execute("ANALYZE")  # Index statistics let the planner pick the selective index
+        return skipped
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+
+def open_storage(path, key_for_id, id_for_key, on_rewritten=None):
+    """Return the backend for a library file, chosen by its extension."""
+    if is_sqlite_path(path):
+        return SqliteStorage(path, key_for_id, id_for_key)
+    return JsonStorage(path, key_for_id, id_for_key, on_rewritten)
+
+
+def migrate(json_file, db_file):
+    """Create a SQLite library from a song.json file. Track keys stay the same."""
+    from tracks_library import make_key, parse_key
+    storage = SqliteStorage(db_file, make_key, parse_key)
+    try:
+        skipped = storage.import_json(json_file)
+    finally:
+        storage.close()
+    for position, reason in skipped:
+        print(f"Skipped record {position}: {reason}")
+    return skipped
+
+
+def assign_ids(json_file):
+    """Write an explicit "id" into every record of a song.json file that lacks one; returns how many got one.
+
+    A record keeps the id its position gave it, so track keys, journaled plays
+    and playlists stay valid; it only gets a new id above the largest one if an
+    explicit id elsewhere already took that number. From then on the keys
+    follow the records through any reorder or insert.
+    """
+    taken = TrackIdSet()
+    largest = 0
+    for song in iter_records(json_file):
+        if isinstance(song, dict) and type(song.get("id")) is int:
+            taken.add(song["id"])
+            largest = max(largest, song["id"])
+    largest = max(largest, sum(1 for _ in iter_records(json_file)))
+    assigned = 0
+
+    def numbered():
+        nonlocal largest, assigned
+        for position, song in enumerate(iter_records(json_file), start=1):
+            if isinstance(song, dict) and "id" not in song:
+                song_id = position
+                if not taken.add(song_id):
+                    largest += 1
+                    song_id = largest
+                song = {"id": song_id, **song}  # First, where catalog_snapshot expects it
+                assigned += 1
+            yield song
+
+    write_records(json_file, numbered())
+    catalog.invalidate(json_file)
+    return assigned
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "migrate":
+        migrate(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) == 3 and sys.argv[1] == "assign-ids":
+        print(f"Assigned ids to {assign_ids(sys.argv[2])} records.")
+    else:
+        print("Usage: python storage.py migrate song.json song.db\n"
+              "       python storage.py assign-ids song.json")
+        sys.exit(1)
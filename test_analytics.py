@@ -0,0 +1,59 @@
+import json
+import math
+import pytest
+import catalog_snapshot
+import tracks_library as lib
+
+np = pytest.importorskip("numpy")
+import analytics
+
+def write_songs(path, count):
+    songs = [{"title": f"Song {i}", "singer": f"Artist {i % 3}", "rating": (i * 7) % 6,
+              "link": "http://example.com", "image_url": None, "play_count": (i * i) % 50}
+             for i in range(1, count + 1)]
+    songs.insert(5, {"title": "Broken", "singer": "Artist 9", "rating": 9, "link": "x"})
+    path.write_text(json.dumps(songs, indent=4), encoding="utf-8")
+    return str(path)
+
+def pearson(xs, ys):
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    sxy = sum((x - mx) * (y - my) for x, y in zip(xs, ys))
+    return sxy / math.sqrt(sum((x - mx) ** 2 for x in xs) * sum((y - my) ** 2 for y in ys))
+
+class TestAnalytics:
+
+    @pytest.mark.parametrize("use_snapshot", [False, True])
+    def test_report_matches_python(self, tmp_path, use_snapshot):
+        """Test that the vectorized aggregates agree with a track-by-track computation on both stores."""
+        json_file = write_songs(tmp_path / "song.json", 60)
+        if use_snapshot:
+            catalog_snapshot.import_json(json_file)
+        for _ in lib.iter_load_library(json_file, use_snapshot=use_snapshot):
+            pass
+        assert isinstance(lib.library, catalog_snapshot.SnapshotStore) == use_snapshot
+        lib.set_rating("07", 5)  # Edits not written to the file count too
+        lib.library["08"].play_count = 500
+        tracks = list(lib.library.values())
+        report = analytics.build_report(analytics.export_arrays())
+        assert report["tracks"] == 60
+        assert report["total_plays"] == sum(track.play_count for track in tracks)
+        assert report["rating_distribution"] == [sum(track.rating == r for track in tracks) for r in range(6)]
+        assert report["rating_play_correlation"] == pytest.approx(
+            pearson([track.rating for track in tracks], [track.play_count for track in tracks]))
+        artist = report["top_artists"][0]
+        own = [track for track in tracks if track.singer == artist["singer"]]
+        assert artist["plays"] == max(sum(t.play_count for t in tracks if t.singer == s) for s in lib.get_all_artists())
+        assert artist["tracks"] == len(own)
+        assert artist["rating_play_correlation"] == pytest.approx(
+            pearson([track.rating for track in own], [track.play_count for track in own]))
+        assert "Artist 9" not in [artist["singer"] for artist in report["top_artists"]]
+        json.dumps(report, allow_nan=False)  # No NumPy types or NaN left in the report
+        if use_snapshot:
+            lib.library.close()  # The exported arrays do not hold on to the mapping
+
+    def test_empty_catalog(self):
+        """Test that an empty library gives a report without percentiles or correlations."""
+        arrays = analytics.export_arrays(lib.TrackStore())
+        report = analytics.build_report(arrays)
+        assert report["tracks"] == 0 and report["play_count_percentiles"] == {}
+        assert report["rating_play_correlation"] is None and report["top_artists"] == []
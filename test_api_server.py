@@ -0,0 +1,85 @@
+import asyncio
+import json
+import catalog
+import tracks_library as lib
+from api_server import LibraryServer
+
+def write_songs(path, count):
+    songs = [{"title": f"Song {i}", "singer": "Artist" if i % 2 else "Band", "rating": 1, "link": "http://example.com",
+              "image_url": None, "play_count": i} for i in range(1, count + 1)]
+    path.write_text(json.dumps(songs, indent=4), encoding="utf-8")
+    return str(path)
+
+def request(server, method, target, body=None):
+    status, data = asyncio.run(server.respond(method, target, json.dumps(body).encode() if body else b""))
+    return status, json.loads(data)
+
+class TestApiServer:
+
+    def test_reads_are_cached_until_a_change(self, tmp_path):
+        """Test that detail, search and top answer from the library, repeat from cache and drop it when a track changes."""
+        server = LibraryServer(write_songs(tmp_path / "song.json", 10))
+        server.load()
+        try:
+            assert request(server, "GET", "/tracks/03")[1]["title"] == "Song 3"
+            assert [t["key"] for t in request(server, "GET", "/top?by=plays&n=2")[1]["tracks"]] == ["10", "09"]
+            assert len(request(server, "GET", "/search?singer=band")[1]["tracks"]) == 5
+            assert request(server, "GET", "/tracks?offset=8")[1]["total"] == 10
+            hits = server.stats["cache_hits"]
+            assert request(server, "GET", "/tracks/03")[1]["play_count"] == 3
+            assert server.stats["cache_hits"] == hits + 1
+            lib.update_play_count("03", 50)
+            assert request(server, "GET", "/tracks/03")[1]["play_count"] == 50
+            assert request(server, "GET", "/top?by=plays&n=2")[1]["tracks"][0]["key"] == "03"
+            hits = server.stats["cache_hits"]
+            lib.update_play_count("01", 2)  # Shown by neither, and below the chart
+            lib.update_play_count("09", 11)  # Shown by the list, and now in the chart
+            assert len(request(server, "GET", "/search?singer=band")[1]["tracks"]) == 5
+            assert request(server, "GET", "/tracks?offset=8")[1]["tracks"][0]["play_count"] == 11
+            assert request(server, "GET", "/top?by=plays&n=2")[1]["tracks"][1]["key"] == "09"
+            assert server.stats["cache_hits"] == hits + 1  # Only the search stayed cached
+            lib.update_play_count("05", 49)  # Not shown, but now ranks in the chart
+            assert request(server, "GET", "/top?by=plays&n=2")[1]["tracks"][1]["key"] == "05"
+            assert request(server, "GET", "/tracks/99")[0] == 404
+            assert request(server, "GET", "/top?by=title")[0] == 400
+            assert request(server, "DELETE", "/tracks/03")[0] == 405
+            assert request(server, "POST", "/ratings", {"ratings": {"03": 9}})[0] == 400
+        finally:
+            server.close()
+
+    def test_writes_are_batched_and_persisted(self, tmp_path, monkeypatch):
+        """Test that plays sent together are one record_plays() call and ratings reach song.json before the reply."""
+        json_file = write_songs(tmp_path / "song.json", 4)
+        server = LibraryServer(json_file)
+        server.load()
+        calls = []
+        record_plays = lib.record_plays
+        monkeypatch.setattr(lib, "record_plays", lambda plays: calls.append(dict(plays)) or record_plays(plays))
+
+        async def send():
+            return await asyncio.gather(server.respond("POST", "/plays", b'{"plays": {"01": 2}}'),
+                                        server.respond("POST", "/plays", b'{"plays": {"01": 1, "02": 1}}'),
+                                        server.respond("POST", "/ratings", b'{"ratings": {"04": 5}}'))
+        try:
+            replies = [json.loads(body) for status, body in asyncio.run(send())]
+            assert calls == [{"01": 3, "02": 1}]
+            assert replies[1] == {"counts": {"01": 4, "02": 3}}
+            assert catalog.load(json_file)[3]["rating"] == 5
+        finally:
+            server.close()
+        assert [song["play_count"] for song in catalog.load(json_file)] == [4, 3, 3, 4]
+
+    def test_failed_rating_write_changes_nothing(self, tmp_path, monkeypatch):
+        """Test that a rating is not shown or cached when its batch cannot be written."""
+        server = LibraryServer(write_songs(tmp_path / "song.json", 4))
+        server.load()
+        def fail(ratings):
+            raise OSError("Disk full")
+        monkeypatch.setattr(lib, "persist_ratings", fail)
+        try:
+            assert request(server, "GET", "/tracks/02")[1]["rating"] == 1
+            assert request(server, "POST", "/ratings", {"ratings": {"02": 5}})[0] == 500
+            assert lib.library["02"].rating == 1
+            assert request(server, "GET", "/tracks/02")[1]["rating"] == 1
+        finally:
+            server.close()
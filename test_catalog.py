@@ -0,0 +1,48 @@
+import json
+import os
+import catalog
+import tracks_library as lib
+
+def write_songs(path, ratings):
+    songs = [{"title": f"Song {i}", "singer": "Artist", "rating": rating, "link": "http://example.com",
+              "image_url": None, "play_count": 0} for i, rating in enumerate(ratings, start=1)]
+    path.write_text(json.dumps(songs, indent=4), encoding="utf-8")
+    return str(path)
+
+class TestCatalog:
+
+    def test_unchanged_file_is_not_parsed_again(self, tmp_path):
+        """Test that repeated loads of an unchanged file are cache hits."""
+        path = write_songs(tmp_path / "song.json", [1, 2])
+        parses, hits = catalog.stats["parses"], catalog.stats["hits"]
+        first = catalog.load(path)
+        assert catalog.load(path) is first
+        assert catalog.stats["parses"] == parses + 1
+        assert catalog.stats["hits"] == hits + 1
+
+    def test_changed_file_is_parsed_again(self, tmp_path):
+        """Test that a change in size or mtime invalidates the snapshot."""
+        path = write_songs(tmp_path / "song.json", [1, 2])
+        catalog.load(path)
+        write_songs(tmp_path / "song.json", [1, 2, 3])
+        assert len(catalog.load(path)) == 3
+
+    def test_save_keeps_snapshot(self, tmp_path):
+        """Test that records saved in-process are served without a parse."""
+        path = write_songs(tmp_path / "song.json", [1, 2])
+        records = [dict(record, rating=5) for record in catalog.load(path)]
+        catalog.save(path, records)
+        parses = catalog.stats["parses"]
+        assert [record["rating"] for record in catalog.load(path)] == [5, 5]
+        assert catalog.stats["parses"] == parses
+
+    def test_ensure_library(self, tmp_path):
+        """Test that the library is only reloaded when its file changes."""
+        path = write_songs(tmp_path / "song.json", [1, 2])
+        assert lib.ensure_library(path) is True
+        assert lib.ensure_library(path) is False
+        write_songs(tmp_path / "song.json", [3, 3, 3])
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+        assert lib.ensure_library(path) is True
+        assert len(lib.library) == 3
@@ -0,0 +1,91 @@
+import json
+import tracks_library as lib
+import catalog_ingest
+from catalog_ingest import commit, fingerprints, parse, parse_shard
+from catalog_loader import iter_records
+
+def record(title, singer, play_count=0, rating=1):
+    return {"title": title, "singer": singer, "rating": rating, "link": "http://example.com", "image_url": None,
+            "play_count": play_count}
+
+def write_json(path, records):
+    path.write_text(json.dumps(records, indent=4), encoding="utf-8")
+    return str(path)
+
+class TestCatalogIngest:
+
+    def test_exact_and_near_duplicates_share_a_hash(self):
+        """Test that case, accents, word order, articles, credits and qualifiers do not make a different track."""
+        exact, near = fingerprints("Hey Jude", "The Beatles")
+        assert fingerprints("hey  JUDE!", "the beatles")[0] == exact
+        assert fingerprints("Hey Jude (Remastered 2015)", "Beatles")[1] == near
+        assert fingerprints("Hey Jude - Radio Edit", "Beatles feat. Billy Preston")[1] == near
+        assert fingerprints("Jude, Hey", "The Beatles")[1] == near
+        assert fingerprints("Hey Jude (Live)", "The Beatles")[1] != near
+        assert fingerprints("Café", "Björk")[0] == fingerprints("Cafe", "Bjork")[0]
+
+    def test_shards_are_validated_and_merged(self, tmp_path):
+        """Test that invalid records are skipped and duplicates within a shard merge their play counts."""
+        csv_file = tmp_path / "update.csv"
+        csv_file.write_text("Song,Artist,Rating,Play Count\nSong A,Band,3,2\nsong a,band,4,5\nSong B,Band,9,1\n",
+                            encoding="utf-8")
+        shard = parse_shard(str(csv_file))
+        assert [(song["title"], song["play_count"]) for _, _, song in shard["tracks"]] == [("Song A", 7)]
+        assert (shard["read"], shard["exact"], [line for line, _ in shard["skipped"]]) == (2, 1, [4])
+        json_file = write_json(tmp_path / "update.json", [record("X", "Y"), {"title": "Z"}, record("X", "Y", rating=7)])
+        shard = parse_shard(json_file)
+        assert len(shard["tracks"]) == 1 and [position for position, _ in shard["skipped"]] == [2, 3]
+        assert parse_shard(str(tmp_path / "notes.txt"))["skipped"][0][0] == 0
+
+    def test_ingest_adds_new_tracks_and_merges_counts(self, tmp_path):
+        """Test that shards in two processes reach the library in one write, matched against tracks already there."""
+        library_file = write_json(tmp_path / "song.json", [record("Hey Jude", "The Beatles", 10),
+                                                           record("Yesterday", "The Beatles", 4)])
+        lib.load_library_from_json(library_file)
+        lib.record_plays({"02": 1})  # Journaled, not in the file yet
+        first = write_json(tmp_path / "a.json", [record("HEY JUDE (Remastered)", "Beatles", 3),
+                                                 record("Let It Be", "The Beatles", 2)])
+        second = tmp_path / "b.csv"
+        second.write_text("Song,Artist,Rating,Play Count\nlet it be,the beatles,5,1\nYesterday,The Beatles,2,6\n",
+                          encoding="utf-8")
+        parsed = parse([first, str(second)], library_file, workers=2)
+        report = commit(parsed)
+        assert (report["read"], report["added"], report["updated"]) == (4, 1, 2)
+        assert (report["exact"], report["near"], report["keys"]) == (2, 1, ["03"])
+        songs = list(iter_records(library_file))
+        assert [song["play_count"] for song in songs] == [13, 11, 3]
+        assert songs[2]["id"] == 3 and songs[2]["title"] == "Let It Be"
+        lib.close_storage(library_file)
+
+        report = catalog_ingest.ingest([first], library_file, workers=1, merge="max")
+        assert (report["added"], report["updated"]) == (0, 0)  # Counts already at least these
+        assert lib.get_play_count("03") == 3 and len(lib.library) == 3
+        lib.record_plays({"03": 1})
+        report = catalog_ingest.ingest_in_background([first], library_file, workers=1).result(timeout=60)
+        assert (report["added"], report["updated"]) == (0, 2)
+        assert not lib.is_library_current(library_file)  # Left for the caller to reload
+        lib.close_storage(library_file)
+        assert [song["play_count"] for song in iter_records(library_file)] == [16, 11, 6]  # Journaled play kept
+
+    def test_counts_merge_with_plays_compacted_after_parsing(self, tmp_path):
+        """Test that plays journaled or compacted between parse() and commit() add to the shards' counts."""
+        library_file = write_json(tmp_path / "song.json", [record("Hey Jude", "The Beatles", 18),
+                                                           record("Yesterday", "The Beatles", 4)])
+        lib.load_library_from_json(library_file)
+        lib.record_plays({"01": 2})
+        parsed = parse([write_json(tmp_path / "a.json", [record("Hey Jude", "The Beatles", 10)])], library_file,
+                       workers=1)
+        lib.get_journal(library_file).compact()  # Folds the 20 into the file after it was hashed
+        lib.record_plays({"02": 1})
+        assert commit(parsed)["updated"] == 1
+        lib.close_storage(library_file)
+        assert [song["play_count"] for song in iter_records(library_file)] == [30, 5]
+
+    def test_added_tracks_keep_their_assigned_ids(self, tmp_path):
+        """Test that an "id" in an added record does not replace the id the track is given."""
+        library_file = write_json(tmp_path / "song.json", [record("Hey Jude", "The Beatles")])
+        lib.load_library_from_json(library_file)
+        keys, _ = lib.add_tracks([dict(id=1, **record("Let It Be", "The Beatles"))])
+        lib.close_storage(library_file)
+        songs = list(iter_records(library_file))
+        assert keys == ["02"] and list(songs[1])[0] == "id" and songs[1]["id"] == 2
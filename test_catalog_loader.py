@@ -0,0 +1,53 @@
+import json
+import pytest
+import tracks_library as lib
+from catalog_loader import iter_records, iter_batches
+
+def write_songs(path, songs):
+    path.write_text(json.dumps(songs, indent=4), encoding="utf-8")
+    return str(path)
+
+def song(title, rating=3, play_count=0):
+    return {"title": title, "singer": "Artist", "rating": rating, "link": "http://example.com",
+            "image_url": None, "play_count": play_count}
+
+class TestCatalogLoader:
+
+    def test_records_streamed_across_chunks(self, tmp_path):
+        """Test that records split across read chunks are decoded intact."""
+        songs = [song(f"Song {i}") for i in range(20)]
+        path = write_songs(tmp_path / "song.json", songs)
+        assert list(iter_records(path, chunk_size=5)) == songs
+
+    def test_batches_skip_invalid_records(self, tmp_path):
+        """Test that invalid records are reported instead of aborting the load."""
+        songs = [song("A"), song("B", rating=6), song("C", play_count=-1), "junk", song("D")]
+        path = write_songs(tmp_path / "song.json", songs)
+        skipped = []
+        batches = list(iter_batches(path, batch_size=1, skipped=skipped))
+        assert [[position for position, _ in batch] for batch in batches] == [[1], [5]]
+        assert [position for position, _ in skipped] == [2, 3, 4]
+        assert skipped[0][1] == "Rating must be an integer between 0 and 5."
+
+    def test_not_an_array(self, tmp_path):
+        """Test that a file that is not a JSON array is rejected."""
+        path = tmp_path / "song.json"
+        path.write_text('{"title": "A"}', encoding="utf-8")
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_records(str(path)))
+
+    def test_library_keys_follow_file_positions(self, tmp_path):
+        """Test that skipped records do not shift the keys of later tracks."""
+        path = write_songs(tmp_path / "song.json", [song("A"), song("B", rating=9), song("C")])
+        skipped = lib.load_library_from_json(path)
+        assert len(skipped) == 1
+        assert list(lib.library) == ["01", "03"]
+        assert lib.get_song("03") == "C"
+
+    def test_keys_follow_track_ids(self, tmp_path):
+        """Test that records with ids keep their keys when reordered and later duplicates are skipped."""
+        songs = [dict(song("C"), id=3), song("Second"), dict(song("A"), id=1), dict(song("Again"), id=3)]
+        path = write_songs(tmp_path / "song.json", songs)
+        skipped = lib.load_library_from_json(path)
+        assert skipped == [(4, "Duplicate track id 3.")]
+        assert [(key, lib.get_song(key)) for key in lib.library] == [("03", "C"), ("02", "Second"), ("01", "A")]
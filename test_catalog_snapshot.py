@@ -0,0 +1,95 @@
+import json
+import catalog_snapshot
+import tracks_library as lib
+
+SONGS = [
+    {"title": "Café Song", "singer": "Ána", "rating": 4, "link": "http://example.com/1",
+     "image_url": "http://example.com/1.jpg", "play_count": 7},
+    {"title": "Second", "singer": "Bob", "rating": 2, "link": "http://example.com/2",
+     "image_url": None, "play_count": 0},
+    {"title": "No Image Key", "singer": "Ána", "rating": 0, "link": "http://example.com/3", "play_count": 1},
+    {"singer": "Odd Order", "title": "Extra", "rating": 3, "link": "x", "extra": [1.5, True]},
+    {"title": "Bad Rating", "singer": "Bob", "rating": 9, "link": "x"},
+    "not a record",
+]
+
+def write_songs(path, songs=SONGS):
+    path.write_text(json.dumps(songs, indent=4), encoding="utf-8")
+    return str(path)
+
+class TestCatalogSnapshot:
+
+    def test_round_trip_is_exact(self, tmp_path):
+        """Test that import then export reproduces the JSON file byte for byte."""
+        path = write_songs(tmp_path / "song.json")
+        catalog_snapshot.import_json(path)
+        catalog_snapshot.export_json(path + ".snap", str(tmp_path / "out.json"))
+        assert (tmp_path / "out.json").read_text(encoding="utf-8") == (tmp_path / "song.json").read_text(encoding="utf-8")
+
+    def test_snapshot_matches_json_load(self, tmp_path):
+        """Test that a library mapped from the snapshot equals one parsed from JSON."""
+        path = write_songs(tmp_path / "song.json")
+        skipped_json = lib.load_library_from_json(path)
+        parsed = [(key, track.info(), track.link, track.image_path) for key, track in lib.library.items()]
+        skipped_snapshot = lib.load_library_from_json(path)
+        assert isinstance(lib.library, catalog_snapshot.SnapshotStore)
+        assert [(key, track.info(), track.link, track.image_path) for key, track in lib.library.items()] == parsed
+        assert [position for position, _ in skipped_snapshot] == [position for position, _ in skipped_json]
+        assert [track.key for track in lib.search_by_singer("ana")] == ["01", "03"]
+
+    def test_updates_reach_the_mapped_file_once_written(self, tmp_path):
+        """Test that ratings and play counts show at once but go into the mapped file only when reported written."""
+        path = write_songs(tmp_path / "song.json")
+        catalog_snapshot.import_json(path)
+        store = catalog_snapshot.SnapshotStore(path + ".snap", lib.make_key, lib.parse_key)
+        store["04"].rating = 5
+        store["02"].play_count = 12
+        assert (store["04"].rating, store["02"].play_count) == (5, 12)
+        assert list(store.iter_json_records())[1]["play_count"] == 12
+        store.mark_source(store.source_signature, ratings={"04": 5})
+        store.close()
+        out = str(tmp_path / "out.json")
+        catalog_snapshot.export_json(path + ".snap", out)
+        with open(out, encoding="utf-8") as file:
+            songs = json.load(file)
+        assert songs[3] == dict(SONGS[3], rating=5)
+        assert songs[1]["play_count"] == SONGS[1]["play_count"]  # Never written to song.json
+
+    def test_unsaved_edits_do_not_survive_a_rewrite(self, tmp_path):
+        """Test that a journal compaction does not mark a snapshot holding an unsaved rating as current."""
+        path = write_songs(tmp_path / "song.json")
+        lib.load_library_from_json(path)
+        lib.load_library_from_json(path)
+        assert isinstance(lib.library, catalog_snapshot.SnapshotStore)
+        lib.set_rating("01", 0)
+        lib.record_plays({"02": 1})
+        lib.close_storage(path)
+        assert lib.is_library_current(path)
+        lib.load_library_from_json(path)
+        assert isinstance(lib.library, catalog_snapshot.SnapshotStore)
+        assert lib.get_rating("01") == SONGS[0]["rating"]
+        assert lib.get_play_count("02") == SONGS[1]["play_count"] + 1
+
+    def test_stale_snapshot_is_ignored(self, tmp_path):
+        """Test that a snapshot is only used while the JSON file is unchanged."""
+        path = write_songs(tmp_path / "song.json")
+        lib.load_library_from_json(path)
+        write_songs(tmp_path / "song.json", SONGS[:2])
+        lib.load_library_from_json(path)
+        assert not isinstance(lib.library, catalog_snapshot.SnapshotStore)
+        assert len(lib.library) == 2
+
+    def test_track_ids_survive_the_snapshot(self, tmp_path):
+        """Test that a snapshot of records with ids keeps their keys, skips duplicates and exports exactly."""
+        songs = [{"id": 7, **SONGS[0]}, {"id": 2, **SONGS[1]}, SONGS[2], {"id": 7, **SONGS[2]}, {"id": 1, **SONGS[3]}]
+        path = write_songs(tmp_path / "song.json", songs)
+        skipped_json = lib.load_library_from_json(path)
+        parsed = [(key, track.info()) for key, track in lib.library.items()]
+        skipped_snapshot = lib.load_library_from_json(path)
+        assert isinstance(lib.library, catalog_snapshot.SnapshotStore)
+        assert [(key, track.info()) for key, track in lib.library.items()] == parsed
+        assert [key for key, _ in parsed] == ["07", "02", "03", "01"]
+        assert skipped_snapshot == skipped_json == [(4, "Duplicate track id 7.")]
+        assert lib.get_rating("01") == 3 and "04" not in lib.library
+        catalog_snapshot.export_json(path + ".snap", str(tmp_path / "out.json"))
+        assert (tmp_path / "out.json").read_text(encoding="utf-8") == (tmp_path / "song.json").read_text(encoding="utf-8")
@@ -0,0 +1,59 @@
+import json
+import random
+import tracks_library as lib
+from charts import Charts, TopChart
+
+def write_songs(path, count):
+    songs = [{"title": f"Song {i}", "singer": "Artist" if i % 2 else "Other", "rating": i % 6,
+              "link": "http://example.com", "image_url": None, "play_count": i % 7}
+             for i in range(1, count + 1)]
+    path.write_text(json.dumps(songs, indent=4), encoding="utf-8")
+    return str(path)
+
+def expected_top(rows, value_at, n):
+    return sorted(rows, key=lambda row: (-value_at(row), row))[:n]
+
+class TestCharts:
+
+    def test_top_chart_follows_updates(self):
+        """Test that a chart pushed to after random changes matches a full sort."""
+        rng = random.Random(1)
+        values = [rng.randrange(5) for _ in range(300)]
+        chart = TopChart(values.__getitem__, range(len(values)))
+        for _ in range(2000):
+            row = rng.randrange(len(values))
+            values[row] = rng.randrange(100)
+            chart.update(row)
+            assert chart.top(10) == expected_top(range(len(values)), values.__getitem__, 10)
+        assert len(chart.heap) <= 2 * len(values) + 64
+        assert sorted(chart.above(50)) == [row for row, value in enumerate(values) if value > 50]
+
+    def test_charts_follow_library_changes(self, tmp_path):
+        """Test that plays and ratings set through tracks_library re-rank every chart."""
+        lib.load_library_from_json(write_songs(tmp_path / "song.json", 40))
+        charts = Charts()
+        try:
+            charts.top_played()
+            lib.record_plays({"02": 50})
+            lib.set_rating("04", 5)
+            lib.update_play_count("03", 60)
+            assert [track.key for track in charts.top_played(2)] == ["03", "02"]
+            assert [track.key for track in charts.top_by_artist("Other", 2)] == ["02", "06"]
+            assert charts.top_rated(2)[0].key == "04"
+            assert charts.top_by_artist("Nobody") == []
+            store = lib.library
+            played = [row for row in range(len(store)) if store.play_count_at(row) > 0]
+            assert charts.played_rows() == played
+        finally:
+            lib.remove_listener(charts.tracks_changed)
+
+    def test_charts_rebuild_on_reload(self, tmp_path):
+        """Test that charts follow a library loaded after they were built."""
+        charts = Charts()
+        try:
+            lib.load_library_from_json(write_songs(tmp_path / "song.json", 10))
+            assert charts.top_played(1)[0].key == "06"
+            lib.load_library_from_json(write_songs(tmp_path / "other.json", 3))
+            assert [track.key for track in charts.top_played()] == ["03", "02", "01"]
+        finally:
+            lib.remove_listener(charts.tracks_changed)
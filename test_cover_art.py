@@ -0,0 +1,57 @@
+import pytest
+from cover_art import CoverArtFetcher
+from benchmarks.http_stub import CoverServer
+
+pytest.importorskip("requests")
+
+class TestCoverArtFetcher:
+
+    def test_memory_cache(self, tmp_path):
+        """Test that a second fetch is answered from memory."""
+        with CoverServer() as server:
+            fetcher = CoverArtFetcher(str(tmp_path))
+            url = server.url("a.png")
+            first = fetcher.fetch(url).result()
+            assert fetcher.fetch(url).result() == first
+            assert server.requests == 1
+            assert fetcher.stats["memory_hits"] == 1
+            fetcher.close()
+
+    def test_disk_cache_revalidates(self, tmp_path):
+        """Test that a stale disk entry is revalidated with a conditional request."""
+        with CoverServer() as server:
+            url = server.url("a.png")
+            fetcher = CoverArtFetcher(str(tmp_path))
+            data = fetcher.fetch(url).result()
+            fetcher.close()
+
+            fetcher = CoverArtFetcher(str(tmp_path), max_age=0)
+            assert fetcher.fetch(url).result() == data
+            assert server.not_modified == 1
+            assert fetcher.stats["not_modified"] == 1
+            fetcher.close()
+
+            fetcher = CoverArtFetcher(str(tmp_path))
+            assert fetcher.fetch(url).result() == data
+            assert fetcher.stats["disk_hits"] == 1
+            assert server.requests == 2
+            fetcher.close()
+
+    def test_memory_cache_is_bounded(self, tmp_path):
+        """Test that the least recently used cover is evicted first."""
+        with CoverServer(size=1000) as server:
+            fetcher = CoverArtFetcher(str(tmp_path), memory_bytes=2500)
+            for name in ("a", "b", "c"):
+                fetcher.fetch(server.url(name)).result()
+            assert list(fetcher._memory) == [server.url("b"), server.url("c")]
+            fetcher.close()
+
+    def test_errors_are_reported(self, tmp_path):
+        """Test that a failed download surfaces through the future."""
+        with CoverServer() as server:
+            fetcher = CoverArtFetcher(str(tmp_path))
+            url = server.url("a.png").replace("/covers/", "/missing/")
+            with pytest.raises(Exception):
+                fetcher.fetch(url).result()
+            assert fetcher.stats["errors"] == 1
+            fetcher.close()
@@ -0,0 +1,69 @@
+import json
+import pytest
+import instrumentation
+
+@pytest.fixture
+def stats():
+    was = instrumentation.enabled
+    instrumentation.reset()
+    yield instrumentation
+    instrumentation.enable(was)
+    instrumentation.reset()
+
+@instrumentation.timed("test.double")
+def double(value):
+    return value * 2
+
+class TestInstrumentation:
+
+    def test_disabled_records_nothing(self, stats):
+        """Test that timers and counters stay empty while collection is off."""
+        stats.enable(False)
+        assert double(2) == 4
+        stats.count("test.counter")
+        assert stats.snapshot()["timers"] == {} and stats.snapshot()["counters"] == {}
+
+    def test_enabled_records_calls(self, stats, tmp_path):
+        """Test that timed calls, iterator steps and counters are collected and dumped."""
+        stats.enable()
+        for value in range(3):
+            double(value)
+        assert list(stats.timed_iter("test.steps", iter([1, 2]))) == [1, 2]
+        stats.count("test.counter", 5)
+        snapshot = stats.snapshot()
+        assert snapshot["timers"]["test.double"]["calls"] == 3
+        assert snapshot["timers"]["test.steps"]["calls"] == 2
+        assert snapshot["counters"] == {"test.counter": 5}
+        path = str(tmp_path / "stats.json")
+        stats.dump(path)
+        with open(path, encoding="utf-8") as file:
+            assert json.load(file)["timers"]["test.double"]["calls"] == 3
+
+    def test_timed_iter_closes_source(self, stats):
+        """Test that closing the timed iterator closes the generator it wraps."""
+        closed = []
+
+        def source():
+            try:
+                yield 1
+                yield 2
+            finally:
+                closed.append(True)
+
+        steps = stats.timed_iter("test.steps", source())
+        next(steps)
+        steps.close()
+        assert closed == [True]
+
+    def test_profile_next_call(self, stats, tmp_path):
+        """Test that only the next call of the chosen function is profiled."""
+        import pstats
+        stats.enable()
+        stats.profile_next("test.double", str(tmp_path))
+        double(1)
+        double(2)
+        profiles = stats.snapshot()["profiles"]
+        assert len(profiles) == 1 and profiles[0].startswith(str(tmp_path))
+        assert pstats.Stats(profiles[0]).total_calls > 0
+        with pytest.raises(KeyError):
+            stats.profile_next("test.unknown")
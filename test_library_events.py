@@ -0,0 +1,102 @@
+import json
+import pytest
+import storage
+import tracks_library as lib
+from library_events import LibraryChanges
+
+def write_songs(path, count):
+    songs = [{"title": f"Song {i}", "singer": "Artist", "rating": 1, "link": "http://example.com",
+              "image_url": None, "play_count": 0} for i in range(1, count + 1)]
+    path.write_text(json.dumps(songs, indent=4), encoding="utf-8")
+    return str(path)
+
+class IdleWidget:
+    """Stands in for a Tk widget: after_idle() callbacks run when the test calls idle()."""
+
+    def __init__(self):
+        self.callbacks = {}
+
+    def after_idle(self, callback):
+        self.callbacks[len(self.callbacks)] = callback
+        return len(self.callbacks) - 1
+
+    def after_cancel(self, callback_id):
+        self.callbacks.pop(callback_id, None)
+
+    def bind(self, sequence, func, add=None):
+        pass
+
+    def idle(self):
+        callbacks, self.callbacks = list(self.callbacks.values()), {}
+        for callback in callbacks:
+            callback()
+
+class TestLibraryEvents:
+
+    def test_library_publishes_fine_grained_events(self, tmp_path):
+        """Test that loads, ratings and play counts publish their own kind of event with the keys concerned."""
+        events = []
+        listener = lambda kind, keys: events.append((kind, sorted(keys)))
+        lib.add_listener(listener)
+        try:
+            lib.load_library_from_json(write_songs(tmp_path / "song.json", 3))
+            lib.record_plays({"02": 1})
+            lib.save_edits(ratings={"01": 5, "03": 4}, play_counts={"03": 9})
+        finally:
+            lib.remove_listener(listener)
+        assert events == [(lib.LIBRARY_RELOADED, []), (lib.TRACKS_ADDED, ["01", "02", "03"]),
+                          (lib.COUNT_CHANGED, ["02"]), (lib.RATING_CHANGED, ["01", "03"]), (lib.COUNT_CHANGED, ["03"])]
+
+    def test_plays_without_a_library_file_change_nothing(self, tmp_path, monkeypatch):
+        """Test that record_plays refuses before counting or publishing when no library file is loaded."""
+        lib.load_library_from_json(write_songs(tmp_path / "song.json", 2))
+        monkeypatch.setattr(lib, "library_file", None)
+        events = []
+        listener = lambda kind, keys: events.append(kind)
+        lib.add_listener(listener)
+        try:
+            with pytest.raises(RuntimeError):
+                lib.record_plays({"01": 3})
+        finally:
+            lib.remove_listener(listener)
+        assert lib.get_play_count("01") == 0 and events == []
+
+    def test_failed_rating_write_changes_nothing(self, tmp_path, monkeypatch):
+        """Test that save_rating leaves the library and its listeners alone when the file cannot be written."""
+        lib.load_library_from_json(write_songs(tmp_path / "song.json", 2))
+        def fail(path, records):
+            raise OSError("Disk full")
+        monkeypatch.setattr(storage, "write_records", fail)
+        events = []
+        listener = lambda kind, keys: events.append(kind)
+        lib.add_listener(listener)
+        try:
+            with pytest.raises(OSError):
+                lib.save_rating("01", 5)
+            with pytest.raises(KeyError):
+                lib.save_rating("09", 5)
+        finally:
+            lib.remove_listener(listener)
+        assert lib.library["01"].rating == 1 and events == []
+
+    def test_burst_is_one_update_per_idle_cycle(self, tmp_path):
+        """Test that 10k play count changes reach a window as a single update with every key."""
+        lib.load_library_from_json(write_songs(tmp_path / "song.json", 100))
+        widget, updates = IdleWidget(), []
+        changes = LibraryChanges(widget, updates.append)
+        try:
+            for i in range(10_000):
+                key = lib.make_key(i % 100 + 1)
+                lib.update_play_count(key, i)
+            lib.set_rating("07", 3)
+            widget.idle()
+            assert len(updates) == 1
+            assert updates[0] == {lib.COUNT_CHANGED: set(lib.library), lib.RATING_CHANGED: {"07"}}
+            lib.set_rating("08", 2)
+            lib.load_library_from_json(write_songs(tmp_path / "song.json", 5))
+            widget.idle()
+            assert updates[1] == {lib.LIBRARY_RELOADED: set()}  # A reload supersedes row changes
+        finally:
+            changes.close()
+        lib.set_rating("01", 4)
+        assert widget.callbacks == {}
@@ -0,0 +1,77 @@
+import json
+import socket
+import threading
+import pytest
+import tracks_library as lib
+
+if not hasattr(socket, "AF_UNIX"):
+    pytest.skip("Unix sockets are not available", allow_module_level=True)
+
+from play_daemon import PlayClient, PlayDaemon
+
+def write_songs(path, count):
+    songs = [{"title": f"Song {i}", "singer": "Artist", "rating": 3, "link": "http://example.com",
+              "image_url": None, "play_count": 0} for i in range(1, count + 1)]
+    path.write_text(json.dumps(songs, indent=4), encoding="utf-8")
+    return str(path)
+
+def read_songs(path):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+@pytest.fixture
+def daemon(tmp_path):
+    path = write_songs(tmp_path / "song.json", 10)
+    daemon = PlayDaemon(path, str(tmp_path / "play.sock"), interval=0.05)
+    daemon.start()
+    yield daemon
+    daemon.stop()
+
+class TestPlayDaemon:
+
+    def test_concurrent_clients_lose_no_plays(self, daemon):
+        """Test that play batches from many clients all reach the library file."""
+        def client_run(seed):
+            client = PlayClient(daemon.socket_path)
+            for i in range(50):
+                client.send(plays={lib.make_key((seed + i) % 9 + 2): 1, "01": 2})
+            client.close()
+
+        threads = [threading.Thread(target=client_run, args=(seed,)) for seed in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        daemon.stop()
+        counts = [song["play_count"] for song in read_songs(daemon.library_file)]
+        assert sum(counts) == 12 * 50 * 3
+        assert counts[0] == 12 * 50 * 2
+
+    def test_invalid_batch_is_rejected_whole(self, daemon):
+        """Test that a batch with a bad rating, or a request of the wrong shape, changes nothing."""
+        client = PlayClient(daemon.socket_path)
+        with pytest.raises(ValueError):
+            client.send(plays={"01": 1}, ratings={"02": 9})
+        for malformed in ([1], {"plays": [1]}, {"ratings": "02"}):
+            with pytest.raises(ValueError):
+                client.request(malformed)  # Answered, not a dropped connection
+        assert client.send(ratings={"02": 5})["ratings"] == {"02": 5}
+        client.request({"flush": True})
+        client.close()
+        songs = read_songs(daemon.library_file)
+        assert songs[0]["play_count"] == 0
+        assert songs[1]["rating"] == 5
+
+    def test_library_client_mode(self, daemon, tmp_path):
+        """Test that record_plays in client mode sends increments and takes the daemon's totals."""
+        other = PlayClient(daemon.socket_path)
+        other.send(plays={"03": 4})
+        lib.use_daemon(daemon.socket_path)
+        try:
+            assert lib.record_plays({"03": 1}) == {"03": 5}
+            assert lib.get_play_count("03") == 5
+            with pytest.raises(RuntimeError):
+                lib.save_play_count("03")
+        finally:
+            lib.use_daemon(None)
+            other.close()
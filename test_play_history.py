@@ -0,0 +1,76 @@
+import json
+import tracks_library as lib
+from play_history import DAY, HOUR, MINUTE, PlayHistory, TIERS
+
+MIDNIGHT = 1_699_920_000  # Days start here in UTC, which these histories use
+
+class Clock:
+    def __init__(self, now=MIDNIGHT):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def write_songs(path, count):
+    songs = [{"title": f"Song {i}", "singer": "Artist" if i % 2 else "Band", "rating": 1, "link": "http://example.com",
+              "image_url": None, "play_count": 0} for i in range(1, count + 1)]
+    path.write_text(json.dumps(songs, indent=4), encoding="utf-8")
+    return str(path)
+
+class TestPlayHistory:
+
+    def test_range_queries_use_the_finest_rollup(self):
+        """Test that track and artist plays are counted per minute, hour and day over their ranges."""
+        clock = Clock()
+        history = PlayHistory(clock, utc_offset=0)
+        day = clock.now
+        for minute in range(3 * 24 * 60):  # One play a minute for three days, two of "01" in the last hour
+            clock.now = day + minute * 60
+            history.record("01", "Artist", 2 if minute >= 3 * 24 * 60 - 60 else 1)
+            history.record("02", "Artist")
+        now = clock.now
+        assert history.track_plays("01", now - 600) == 2 * 11  # Minutes: the current one and the ten before
+        assert history.track_plays("01", now - 3 * 3600) == 3 * 60 + 2 * 60  # Hours: widened to the hour edges
+        assert history.track_plays("02", history.today()) == 24 * 60
+        assert history.track_plays("02", day, day + 86400) == 24 * 60  # Days: a range ended two days ago
+        assert history.artist_plays("Artist", now - 600) == 3 * 11
+        assert history.track_plays("03", now - 600) == 0
+        assert history.buckets("02", HOUR)[-2:] == [60, 60]
+        assert len(history.buckets("02", DAY)) == TIERS[DAY][2]
+
+    def test_memory_is_bounded_and_old_plays_expire(self):
+        """Test that rings clear buckets they come round to and idle tracks are dropped after a month."""
+        clock = Clock()
+        history = PlayHistory(clock, utc_offset=0)
+        history.record("01", "Artist", 5)
+        clock.now += 2 * 3600
+        history.record("02", "Band")
+        assert history.track_plays("01", clock.now - 3600) == 0
+        assert history.buckets("01", MINUTE) == [0] * TIERS[MINUTE][2]
+        assert history.track_plays("01", clock.now - 3 * 3600) == 5
+        for day in range(1, 40):
+            clock.now += 86400
+            history.record("02", "Band")
+        assert len(history) == 2  # "02" and "Band"; "01" and "Artist" aged out
+        assert history.track_plays("02", clock.now - 45 * 86400) == TIERS[DAY][2]
+
+    def test_trending_and_library_plays(self, tmp_path):
+        """Test that plays through tracks_library reach the history and a sudden burst trends above a steady hit."""
+        clock = Clock()
+        history = PlayHistory(clock, utc_offset=0)
+        for hour in range(24):
+            clock.now += 3600
+            history.record("01", "Artist", 30)  # A steady hit
+            history.record("02", "Band", 1)
+        clock.now += 3600
+        history.record("01", "Artist", 40)
+        history.record("02", "Band", 20)
+        history.record("03", "Artist", 1)
+        assert [key for key, _, _ in history.trending(2)] == ["02", "01"]
+        assert history.most_played(history.today(), 1) == [("01", 30 + 40)]
+
+        lib.load_library_from_json(write_songs(tmp_path / "song.json", 3))
+        before = lib.history.track_plays("02", lib.history.clock() - 60)
+        lib.record_plays({"02": 3, "04": 1})
+        assert lib.history.track_plays("02", lib.history.clock() - 60) == before + 3
+        lib.close_storage(lib.library_file)
@@ -0,0 +1,50 @@
+import json
+import tracks_library as lib
+from play_journal import PlayJournal
+
+def write_songs(path, counts):
+    songs = [{"title": f"Song {i}", "singer": "Artist", "rating": 3, "link": "http://example.com",
+              "image_url": None, "play_count": count} for i, count in enumerate(counts, start=1)]
+    path.write_text(json.dumps(songs, indent=4), encoding="utf-8")
+    return str(path)
+
+def read_counts(path):
+    with open(path, encoding="utf-8") as file:
+        return [song["play_count"] for song in json.load(file)]
+
+class TestPlayJournal:
+
+    def test_replay_after_crash(self, tmp_path):
+        """Test that counts written only to the journal survive a restart."""
+        path = write_songs(tmp_path / "song.json", [1, 2, 3])
+        journal = PlayJournal(path, lib.make_key)
+        journal.append("02", 5)
+        journal.append("02", 6)
+        journal.append("03", 4)
+        # Simulate a crash: no compaction, plus a half-written trailing entry
+        with open(journal.journal_file, "ab") as file:
+            file.write(b"\x0201\x07")
+        assert PlayJournal(path, lib.make_key).read() == {"02": 6, "03": 4}
+
+    def test_compact_merges_into_json(self, tmp_path):
+        """Test that compaction writes counts to song.json and empties the journal."""
+        path = write_songs(tmp_path / "song.json", [1, 2, 3])
+        journal = PlayJournal(path, lib.make_key)
+        journal.append("01", 10)
+        journal.compact()
+        assert read_counts(path) == [10, 2, 3]
+        assert journal.pending == {}
+        assert journal.read() == {}
+        # Replaying a journal that was already compacted gives the same counts
+        journal.append("01", 10)
+        journal.compact()
+        assert read_counts(path) == [10, 2, 3]
+
+    def test_library_load_replays_journal(self, tmp_path):
+        """Test that loading the library applies journaled counts."""
+        path = write_songs(tmp_path / "song.json", [1, 2, 3])
+        lib.load_library_from_json(path)
+        lib.update_play_count("03", 8)
+        lib.save_play_count("03")
+        lib.load_library_from_json(path)
+        assert lib.get_play_count("03") == 8
@@ -0,0 +1,41 @@
+import random
+from playlist import Playlist
+
+class TestPlaylist:
+
+    def test_queue_and_play_next(self):
+        """Test that tracks queue at the end and play-next tracks go first."""
+        playlist = Playlist()
+        playlist.add("01")
+        playlist.add("02")
+        playlist.play_next("03")
+        assert list(playlist) == ["03", "01", "02"]
+
+    def test_dedupe(self):
+        """Test that dedupe rejects repeats and removes existing ones when enabled."""
+        playlist = Playlist()
+        for key in ["01", "02", "01", "03", "02"]:
+            playlist.add(key)
+        playlist.set_dedupe(True)
+        assert list(playlist) == ["01", "02", "03"]
+        assert playlist.add("01") is False
+        assert playlist.play_next("02") is False
+        assert len(playlist) == 3
+
+    def test_play_counts_with_repeat(self):
+        """Test that one run counts every entry once per repeat."""
+        playlist = Playlist(repeat=3)
+        for key in ["01", "02", "01"]:
+            playlist.add(key)
+        assert playlist.play_counts() == {"01": 6, "02": 3}
+        assert len(playlist.play_order()) == 9
+
+    def test_shuffle_keeps_entries(self):
+        """Test that shuffling reorders without losing tracks."""
+        playlist = Playlist(shuffle=True)
+        keys = [str(i).zfill(2) for i in range(1, 51)]
+        for key in keys:
+            playlist.add(key)
+        order = playlist.play_order(random.Random(1))
+        assert sorted(order) == keys
+        assert order != keys
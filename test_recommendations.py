@@ -0,0 +1,70 @@
+import json
+import os
+import random
+from itertools import combinations
+import tracks_library as lib
+import recommendations
+from recommendations import CoPlayIndex
+
+def write_songs(path, count):
+    songs = [{"title": f"Song {i}", "singer": "Artist", "rating": 1, "link": "http://example.com",
+              "image_url": None, "play_count": 0} for i in range(1, count + 1)]
+    path.write_text(json.dumps(songs, indent=4), encoding="utf-8")
+    return str(path)
+
+def co_play_counts(playlists, track, window):
+    counts = {}
+    for playlist in playlists:
+        pairs = {tuple(sorted((a, b))) for i, a in enumerate(playlist) for b in playlist[i + 1:i + 1 + window] if a != b}
+        for a, b in pairs:
+            if track in (a, b):
+                other = b if a == track else a
+                counts[other] = counts.get(other, 0) + 1
+    return counts
+
+class TestRecommendations:
+
+    def test_top_lists_match_counting_from_scratch(self):
+        """Test that incrementally kept top neighbours have the counts of a full recount after random playlists."""
+        rng = random.Random(3)
+        index = CoPlayIndex(top_k=4, window=3)
+        playlists = [[rng.randrange(1, 40) for _ in range(rng.randint(1, 12))] for _ in range(300)]
+        for playlist in playlists:
+            index.record(playlist)
+        for track in range(1, 40):
+            counts = co_play_counts(playlists, track, 3)
+            neighbours = index.neighbours(track)
+            assert all(counts[other] == count for other, count in neighbours)
+            assert [count for _, count in neighbours] == sorted(counts.values(), reverse=True)[:4]  # Ties may swap
+
+    def test_index_is_saved_and_reopened(self, tmp_path):
+        """Test that a saved index suggests the same tracks after reopening and keeps counting from its pairs."""
+        path = str(tmp_path / "song.json.coplay")
+        index = CoPlayIndex(path)
+        for _ in range(3):
+            index.record([1, 2, 3])
+        index.record([1, 4])
+        index.save()
+        reopened = CoPlayIndex(path).load()
+        assert reopened.pairs is None  # Only the top lists are read up front
+        assert reopened.suggest([1]) == [2, 3, 4]
+        assert reopened.suggest([1, 2], exclude=[3]) == [4]
+        for _ in range(3):
+            reopened.record([1, 4])
+        assert reopened.neighbours(1) == [(4, 4), (2, 3), (3, 3)]
+        reopened.save()
+        assert CoPlayIndex(path).load().neighbours(3) == [(1, 3), (2, 3)]  # Never used by reopened, still saved
+        assert all(a < b for a, b in ((pair >> 32, pair & 0xFFFFFFFF) for pair in reopened.pairs))
+
+    def test_played_playlists_feed_suggestions(self, tmp_path):
+        """Test that suggest_next offers library tracks played with the first entries, not ones already queued, once counted."""
+        json_file = write_songs(tmp_path / "song.json", 6)
+        lib.load_library_from_json(json_file)
+        recommendations.record_playlist(["01", "02", "03"], json_file)
+        recommendations.record_playlist(["01", "03", "99"], json_file)
+        assert not os.path.exists(recommendations.index_path(json_file))  # Saved later, off the caller's thread
+        recommendations.flush()
+        assert recommendations.suggest_next(["01"], library_file=json_file) == ["03", "02"]
+        assert recommendations.suggest_next(["01", "03"], library_file=json_file) == ["02"]
+        assert CoPlayIndex(recommendations.index_path(json_file)).load().neighbours(1) == [(3, 2), (2, 1), (99, 1)]
+        lib.close_storage(json_file)
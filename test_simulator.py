@@ -0,0 +1,67 @@
+import asyncio
+import json
+import pytest
+import storage
+import tracks_library as lib
+from simulator import Popularity, SimClock, simulate
+
+def write_songs(path, count):
+    songs = [{"title": f"Song {i}", "singer": f"Artist {i % 4}", "rating": 3, "link": "http://example.com",
+              "image_url": None, "play_count": i} for i in range(1, count + 1)]
+    path.write_text(json.dumps(songs, indent=4), encoding="utf-8")
+    return str(path)
+
+class TestSimulator:
+
+    def test_clock_runs_tasks_in_simulated_order(self):
+        """Test that sleepers wake in order of simulated time and stop at the end of the run."""
+        woke = []
+
+        async def sleeper(clock, name, delays):
+            try:
+                for delay in delays:
+                    await clock.sleep(delay)
+                    woke.append((clock.now, name))
+            finally:
+                clock.finished()
+
+        async def run():
+            clock = SimClock()
+            tasks = []
+            for name, delays in (("a", [5, 5, 5]), ("b", [3, 9]), ("c", [100])):
+                clock.started()
+                tasks.append(asyncio.create_task(sleeper(clock, name, delays)))
+            await clock.run(until=20)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run(run())
+        assert woke == [(3, "b"), (5, "a"), (10, "a"), (12, "b"), (15, "a")]
+
+    def test_zipf_favours_top_ranks(self):
+        """Test that the Zipf distribution picks its top-ranked track far more often than uniform does."""
+        import random
+        keys = [lib.make_key(position) for position in range(1, 101)]
+        zipf, uniform = Popularity(keys, "zipf", seed=1), Popularity(keys, "uniform", seed=1)
+        rng = random.Random(2)
+        zipf_top = sum(zipf.pick(rng) == zipf.keys[0] for _ in range(5000))
+        uniform_top = sum(uniform.pick(rng) == uniform.keys[0] for _ in range(5000))
+        assert zipf_top > 5 * uniform_top
+        with pytest.raises(ValueError):
+            Popularity(keys, "pareto")
+
+    @pytest.mark.parametrize("file_format", ["json", "sqlite"])
+    def test_every_event_reaches_the_file(self, tmp_path, file_format):
+        """Test that plays and ratings from many listeners all end up in the library file."""
+        library_file = write_songs(tmp_path / "song.json", 40)
+        if file_format == "sqlite":
+            storage.migrate(library_file, str(tmp_path / "song.db"))
+            library_file = str(tmp_path / "song.db")
+        report = simulate(library_file, listeners=200, duration=1800, rate_probability=0.2, seed=3)
+        lib.close_storage(library_file)
+        assert report["plays"] > 500 and report["ratings"] > 50 and report["errors"] == 0
+        assert report["consistency"] == {"lost_plays": 0, "extra_plays": 0, "rating_mismatches": 0}
+        again = simulate(library_file, listeners=200, duration=1800, rate_probability=0.2, seed=3)
+        lib.close_storage(library_file)
+        assert (again["plays"], again["ratings"]) == (report["plays"], report["ratings"])
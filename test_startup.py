@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MODULES = ("tracks_library", "track_player", "view_tracks", "create_track_list", "update_tracks", "storage", "charts", "top_tracks",
+           "instrumentation", "stats_panel", "library_events", "api_server", "play_history", "recommendations",
+           "catalog_ingest")
+
+class TestStartup:
+
+    def test_imports_have_no_side_effects(self, tmp_path):
+        """Test that importing the app prints nothing, writes nothing and leaves heavy packages unloaded."""
+        code = (
+            f"import sys; sys.path.insert(0, {ROOT!r})\n"
+            f"import {', '.join(MODULES)}\n"
+            "print(sorted(m for m in ('PIL', 'requests', 'numpy', 'sqlite3') if m in sys.modules))\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout == "[]\n"
+        assert list(tmp_path.iterdir()) == []
+
+    def test_player_defers_ingestion(self, tmp_path):
+        """Test that importing the player leaves catalog ingestion and its process pool for the ingest command."""
+        code = (
+            f"import sys; sys.path.insert(0, {ROOT!r})\n"
+            "import track_player\n"
+            "print(sorted(m for m in ('catalog_ingest', 'concurrent.futures') if m in sys.modules))\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout == "[]\n"
@@ -0,0 +1,190 @@
+import json
+import pytest
+import threading
+import catalog
+import storage
+import tracks_library as lib
+
+def write_songs(path, ratings):
+    songs = [{"title": f"Song {i}", "singer": "Artist" if i % 2 else "Other", "rating": rating,
+              "link": "http://example.com", "image_url": None, "play_count": i}
+             for i, rating in enumerate(ratings, start=1)]
+    songs.append({"title": "Broken", "singer": "Artist", "rating": 9, "link": "x"})
+    path.write_text(json.dumps(songs, indent=4), encoding="utf-8")
+    return str(path)
+
+def migrated(tmp_path, ratings):
+    json_file = write_songs(tmp_path / "song.json", ratings)
+    db_file = str(tmp_path / "song.db")
+    skipped = storage.migrate(json_file, db_file)
+    return json_file, db_file, skipped
+
+class TestStorage:
+
+    def test_migration_keeps_keys(self, tmp_path):
+        """Test that a library migrated to SQLite loads with the same keys and fields."""
+        json_file, db_file, skipped = migrated(tmp_path, [1, 2, 3])
+        assert [position for position, _ in skipped] == [4]
+        lib.load_library_from_json(json_file)
+        from_json = [(key, track.info()) for key, track in lib.library.items()]
+        lib.load_library_from_json(db_file)
+        assert [(key, track.info()) for key, track in lib.library.items()] == from_json
+        assert lib.is_library_current(db_file)
+
+    def test_sqlite_writes_persist(self, tmp_path):
+        """Test that play counts and ratings saved through the library reach the database."""
+        _, db_file, _ = migrated(tmp_path, [1, 2, 3])
+        lib.load_library_from_json(db_file)
+        lib.record_plays({"01": 2, "03": 1})
+        lib.save_rating("02", 5)
+        lib.load_library_from_json(db_file)
+        assert [lib.get_play_count(key) for key in ("01", "02", "03")] == [3, 2, 4]
+        assert lib.get_rating("02") == 5
+
+    def test_find_tracks_same_on_both_backends(self, tmp_path):
+        """Test that indexed SQLite queries agree with the in-memory scan over JSON."""
+        json_file, db_file, _ = migrated(tmp_path, [4, 2, 5, 4, 1])
+        queries = [dict(singer="Artist"), dict(min_rating=4, order_by="rating"),
+                   dict(min_play_count=2, order_by="play_count", limit=2)]
+        lib.load_library_from_json(json_file)
+        expected = [[track.key for track in lib.find_tracks(**query)] for query in queries]
+        lib.load_library_from_json(db_file)
+        assert [[track.key for track in lib.find_tracks(**query)] for query in queries] == expected
+        assert expected[1] == ["03", "01", "04"]
+
+    def test_old_databases_get_the_id_column(self, tmp_path):
+        """Test that a database whose track id column is still named position is renamed in place and keeps its tracks."""
+        import sqlite3
+        db_file = str(tmp_path / "song.db")
+        with sqlite3.connect(db_file) as connection:
+            connection.executescript(storage.SCHEMA.replace("id INTEGER PRIMARY KEY", "position INTEGER PRIMARY KEY"))
+            connection.execute("INSERT INTO tracks VALUES (7, 'Song', 'Artist', 3, 'x', NULL, 2)")
+        connection.close()
+        lib.load_library_from_json(db_file)
+        assert (lib.get_song("07"), lib.get_play_count("07")) == ("Song", 2)
+        lib.record_plays({"07": 1})
+        assert lib.get_storage(db_file).find(min_play_count=3) == ["07"]
+        lib.close_storage(db_file)
+
+    def test_queries_use_indexes(self, tmp_path):
+        """Test that SQLite plans the filters through the singer, rating and play_count indexes."""
+        _, db_file, _ = migrated(tmp_path, [1])
+        backend = lib.get_storage(db_file)
+        for column, query in (("singer", dict(singer="Artist")), ("rating", dict(min_rating=4, order_by="rating")),
+                              ("play_count", dict(min_play_count=1, order_by="play_count"))):
+            sql, params = backend.find_query(**query)
+            plan = " ".join(row[-1] for row in backend.connection.execute("EXPLAIN QUERY PLAN " + sql, params))
+            assert f"tracks_{column}" in plan
+
+    def test_rating_save_holds_off_compaction(self, tmp_path, monkeypatch):
+        """Test that a journal compaction racing a rating save does not lose the compacted plays."""
+        json_file = write_songs(tmp_path / "song.json", [1, 2, 3])
+        backend = storage.JsonStorage(json_file, lib.make_key, lib.parse_key)
+        backend.save_play_counts({"01": 50})
+        iter_records, compactions = storage.iter_records, []
+
+        def racing_iter_records(path):
+            records = list(iter_records(path))
+            compaction = threading.Thread(target=backend.journal.compact)
+            compaction.start()
+            compaction.join(0.2)  # Without the lock it rewrites the file here, before the rating save does
+            compactions.append(compaction)
+            return iter(records)
+
+        monkeypatch.setattr(storage, "iter_records", racing_iter_records)
+        backend.apply({}, {"02": 5})
+        compactions[0].join()
+        backend.close()
+        with open(json_file, encoding="utf-8") as file:
+            songs = json.load(file)
+        assert (songs[0]["play_count"], songs[1]["rating"]) == (50, 5)
+
+    def test_batch_edits_are_one_atomic_write(self, tmp_path, monkeypatch):
+        """Test that many ratings and counts are written at once, and a bad edit writes nothing."""
+        json_file = write_songs(tmp_path / "song.json", [1, 2, 3, 4])
+        lib.load_library_from_json(json_file)
+        writes = []
+        monkeypatch.setattr(storage, "write_records", lambda path, records: writes.append(list(records)))
+        lib.save_edits(ratings={"01": 5, "03": 0, "04": 2}, play_counts={"02": 40})
+        assert len(writes) == 1
+        assert [(song["rating"], song["play_count"]) for song in writes[0][:4]] == [(5, 1), (2, 40), (0, 3), (2, 4)]
+        for edits in (dict(ratings={"01": 1, "02": 7}), dict(ratings={"02": 1, "99": 1})):
+            with pytest.raises((KeyError, ValueError)):
+                lib.save_edits(**edits)
+        assert len(writes) == 1
+        assert [lib.get_rating(key) for key in ("01", "02")] == [5, 2]
+        events = []
+        listener = lambda kind, keys: events.append(kind)
+        lib.add_listener(listener)
+
+        def failing_write(path, records):
+            raise OSError("Disk full")
+
+        monkeypatch.setattr(storage, "write_records", failing_write)
+        with pytest.raises(OSError):
+            lib.save_edits(ratings={"01": 0})
+        lib.remove_listener(listener)
+        assert lib.get_rating("01") == 5 and events == []
+
+    def test_added_tracks_get_new_ids_on_both_backends(self, tmp_path):
+        """Test that added tracks are numbered after every id in the file, even an invalid record's, with counts set."""
+        json_file, db_file, _ = migrated(tmp_path, [1, 2, 3])
+        new = {"title": "New", "singer": "Other", "rating": 4, "link": "x", "image_url": None, "play_count": 7}
+        for library_file, key in ((json_file, "05"), (db_file, "04")):
+            lib.load_library_from_json(library_file)
+            lib.record_plays({"02": 1})  # Starts the JSON journal, which compacts into the file afterwards
+            assert lib.add_tracks([new], {"02": 20}) == ([key], {"02": 20})
+            if library_file == json_file:
+                lib.get_journal(json_file).compact()
+            assert not lib.is_library_current(library_file)  # The compaction must not mark the old library current
+            lib.close_storage(library_file)
+            lib.load_library_from_json(library_file)
+            assert [(lib.get_song(k), lib.get_play_count(k)) for k in ("02", key)] == [("Song 2", 20), ("New", 7)]
+            lib.close_storage(library_file)
+
+    def test_assigned_ids_keep_edits_on_their_songs(self, tmp_path):
+        """Test that after assign-ids a reordered file keeps keys, ratings and journaled plays on the right songs."""
+        json_file = write_songs(tmp_path / "song.json", [1, 2, 3])
+        assert storage.assign_ids(json_file) == 4
+        with open(json_file, encoding="utf-8") as file:
+            songs = json.load(file)
+        assert [song["id"] for song in songs] == [1, 2, 3, 4]
+        songs.reverse()
+        songs.insert(1, {"id": 5, "title": "New", "singer": "Other", "rating": 0, "link": "x"})
+        (tmp_path / "song.json").write_text(json.dumps(songs, indent=4), encoding="utf-8")
+        lib.load_library_from_json(json_file)
+        assert [lib.get_song(key) for key in ("01", "03", "05")] == ["Song 1", "Song 3", "New"]
+        lib.record_plays({"01": 4})
+        lib.save_edits(ratings={"03": 5, "05": 4})
+        lib.close_storage(json_file)
+        lib.load_library_from_json(json_file)
+        assert [(lib.get_rating(key), lib.get_play_count(key)) for key in ("01", "02", "03", "05")] == [
+            (1, 5), (2, 2), (5, 3), (4, 0)]
+        db_file = str(tmp_path / "song.db")
+        storage.migrate(json_file, db_file)
+        lib.load_library_from_json(db_file)
+        assert [lib.get_song(key) for key in ("01", "03", "05")] == ["Song 1", "Song 3", "New"]
+
+    def test_threads_share_one_storage_per_file(self, tmp_path, monkeypatch):
+        """Test that threads opening a library file's storage at the same time get one backend, so one journal."""
+        json_file = write_songs(tmp_path / "song.json", [1, 2])
+        open_storage, barrier = storage.open_storage, threading.Barrier(4)
+
+        def slow_open_storage(*args, **kwargs):
+            threading.Event().wait(0.05)  # Long enough for the other threads to look the file up
+            return open_storage(*args, **kwargs)
+
+        monkeypatch.setattr(storage, "open_storage", slow_open_storage)
+        backends = []
+
+        def open_at_once():
+            barrier.wait()
+            backends.append(lib.get_storage(json_file))
+
+        threads = [threading.Thread(target=open_at_once) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        lib.close_storage(json_file)
+        assert len(backends) == 4 and all(backend is backends[0] for backend in backends)
@@ -0,0 +1,62 @@
+import io
+from concurrent.futures import CancelledError, Future
+import pytest
+from thumbnails import Thumbnails
+
+Image = pytest.importorskip("PIL.Image")
+
+def png_bytes(size, mode="RGB"):
+    output = io.BytesIO()
+    Image.new(mode, size, "red").save(output, format="PNG")
+    return output.getvalue()
+
+class StaticFetcher:
+    """Answers every URL with the same bytes, the way a warm cover_art cache would."""
+
+    def __init__(self, data):
+        self.data = data
+        self.fetches = 0
+
+    def fetch(self, url):
+        self.fetches += 1
+        future = Future()
+        future.set_result(self.data)
+        return future
+
+class TestThumbnails:
+
+    def test_resized_in_pool_and_cached_on_disk(self, tmp_path):
+        """Test that a large cover is shrunk to display size once and then read back from disk."""
+        fetcher = StaticFetcher(png_bytes((1200, 800)))
+        thumbnails = Thumbnails(fetcher, str(tmp_path), size=(200, 200), processes=1)
+        try:
+            png = thumbnails.thumbnail("http://example.com/a.png").result(timeout=60)
+            assert Image.open(io.BytesIO(png)).size == (200, 133)
+            assert thumbnails.stats["resized"] == 1
+        finally:
+            thumbnails.close()
+
+        again = Thumbnails(fetcher, str(tmp_path), size=(200, 200))
+        assert again.thumbnail("http://example.com/b.png").result(timeout=10) == png  # Same bytes, other URL
+        assert again.stats == {"photo_hits": 0, "disk_hits": 1, "resized": 0, "errors": 0}
+        assert again._pool is None
+
+    def test_bad_image_fails_the_future(self, tmp_path):
+        """Test that undecodable bytes surface as the future's exception."""
+        thumbnails = Thumbnails(StaticFetcher(b"not an image"), str(tmp_path), processes=1)
+        try:
+            with pytest.raises(Exception):
+                thumbnails.thumbnail("http://example.com/x.png").result(timeout=60)
+            assert thumbnails.stats["errors"] == 1
+        finally:
+            thumbnails.close()
+
+    def test_resize_cancelled_by_close_fails_the_future(self, tmp_path):
+        """Test that a resize the closing pool never ran still finishes the thumbnail's future, so no poller waits on it."""
+        thumbnails = Thumbnails(StaticFetcher(b""), str(tmp_path))
+        job, future = Future(), Future()
+        job.cancel()
+        thumbnails._resized(job, future)
+        assert future.done()
+        with pytest.raises(CancelledError):
+            future.result()
@@ -0,0 +1,47 @@
+from track_csv import iter_track_row_batches, iter_write_track_rows, read_track_rows, write_track_rows
+from tracks_library import LibraryItem
+
+def items(count):
+    return [LibraryItem(f"Song {i}", "Artist", i % 6, "x", play_count=i % 3) for i in range(count)]
+
+class TestTrackCsv:
+
+    def test_round_trip(self, tmp_path):
+        """Test that exported tracks are read back as (song, artist, rating, play count) rows."""
+        path = str(tmp_path / "tracks.csv")
+        write_track_rows(path, [LibraryItem("Song, One", "Artist", 4, "x", play_count=2)])
+        assert read_track_rows(path) == [("Song, One", "Artist", 4, 2)]
+
+    def test_invalid_rows_are_skipped(self, tmp_path):
+        """Test that rows with missing columns or bad numbers are reported and left out."""
+        path = tmp_path / "tracks.csv"
+        path.write_text("Song,Artist,Rating,Play Count\nA,B,3,1\nC,D,9,1\nE,F,x,1\nG,H,2\n", encoding="utf-8")
+        skipped = []
+        assert read_track_rows(str(path), skipped) == [("A", "B", 3, 1)]
+        assert [line for line, _ in skipped] == [3, 4, 5]
+
+    def test_import_in_batches_with_progress(self, tmp_path):
+        """Test that import yields bounded batches and ends with the whole file read."""
+        path = str(tmp_path / "tracks.csv")
+        write_track_rows(path, items(250))
+        batches = list(iter_track_row_batches(path, batch_size=100))
+        assert [len(rows) for rows, _ in batches] == [100, 100, 50]
+        assert batches[-1][1] == (tmp_path / "tracks.csv").stat().st_size
+
+    def test_export_filters_while_writing(self, tmp_path):
+        """Test that export writes only the kept tracks and reports progress per step."""
+        path = str(tmp_path / "tracks.csv")
+        steps = list(iter_write_track_rows(path, iter(items(30)), keep=lambda track: track.play_count > 0,
+                                           batch_size=10))
+        assert steps == [(10, 6), (20, 13), (30, 20), (30, 20)]
+        assert len(read_track_rows(path)) == 20
+
+    def test_cancelled_export_leaves_file_untouched(self, tmp_path):
+        """Test that closing the export early keeps the previous file and no temporary file."""
+        path = tmp_path / "tracks.csv"
+        path.write_text("old", encoding="utf-8")
+        steps = iter_write_track_rows(str(path), iter(items(30)), batch_size=10)
+        next(steps)
+        steps.close()
+        assert path.read_text(encoding="utf-8") == "old"
+        assert [p.name for p in tmp_path.iterdir()] == ["tracks.csv"]
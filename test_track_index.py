@@ -0,0 +1,34 @@
+from track_store import TrackStore
+from track_index import TrackIndex, tokenize
+
+class TestTrackIndex:
+
+    def make_index(self):
+        store = TrackStore()
+        index = TrackIndex(store)
+        for key, title, singer in [("01", "Shape of You", "Ed Sheeran"),
+                                   ("02", "Don't Start Now", "Dua Lipa"),
+                                   ("03", "Cold Heart (PNAU Remix)", "Elton John & Dua Lipa"),
+                                   ("04", "Señorita", "Camila Cabello")]:
+            index.add(store.add(key, title, singer, 3, "http://example.com"))
+        return index
+
+    def test_tokenize_normalizes(self):
+        """Test that tokens are lower-cased and stripped of accents."""
+        assert tokenize("Señorita (PNAU Remix)") == ["senorita", "pnau", "remix"]
+
+    def test_title_prefix_search(self):
+        """Test that the last query word matches as a prefix."""
+        index = self.make_index()
+        assert index.search_titles("sha") == [0]
+        assert index.search_titles("shape of y") == [0]
+        assert index.search_titles("shape yo") == [0]
+        assert index.search_titles("sha of") == []  # Only the last word is a prefix
+        assert index.search_titles("SENOR") == [3]
+
+    def test_singer_search(self):
+        """Test that singer searches find collaborations in catalog order."""
+        index = self.make_index()
+        assert index.search_singers("dua lipa") == [1, 2]
+        assert index.search_singers("dua lipa", limit=1) == [1]
+        assert index.search_singers("nobody") == []
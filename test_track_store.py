@@ -0,0 +1,47 @@
+import pytest
+from track_store import TrackStore
+
+class TestTrackStore:
+
+    def make_store(self):
+        store = TrackStore()
+        store.add("01", "Shape of You", "Ed Sheeran", 5, "http://example.com/1", "http://example.com/1.jpg", 18)
+        store.add("02", "Perfect", "Ed Sheeran", 4, "http://example.com/2")
+        return store
+
+    def test_views_read_columns(self):
+        """Test that views expose the same fields as LibraryItem."""
+        store = self.make_store()
+        assert len(store) == 2
+        assert "01" in store and "03" not in store
+        assert store["01"].info() == ("Shape of You", "Ed Sheeran", 5, 18)
+        assert store["02"].image_path is None
+        assert store["02"].play_count == 0
+
+    def test_singers_are_interned(self):
+        """Test that repeated singer names are stored once."""
+        store = self.make_store()
+        assert store.singers() == ["Ed Sheeran"]
+
+    def test_views_write_through(self):
+        """Test that updating a view updates the store."""
+        store = self.make_store()
+        store["01"].play_count += 1
+        store["02"].rating = 1
+        assert store["01"].play_count == 19
+        assert store["02"].rating == 1
+
+    def test_invalid_values_rejected(self):
+        """Test that the store validates like LibraryItem."""
+        store = self.make_store()
+        with pytest.raises(ValueError, match="Rating must be an integer between 0 and 5."):
+            store["01"].rating = 6
+        with pytest.raises(ValueError, match="Play count must be a non-negative integer."):
+            store.add("03", "Song", "Artist", 3, "http://example.com", play_count=-1)
+        assert len(store) == 2
+
+    def test_duplicate_key_rejected(self):
+        """Test that a key cannot be added twice."""
+        store = self.make_store()
+        with pytest.raises(KeyError):
+            store.add("01", "Other", "Artist", 3, "http://example.com")
@@ -0,0 +1,29 @@
+import pytest
+from virtual_list import render_window, clamp_first, ConcatRows
+
+class TestVirtualList:
+
+    def test_render_window_adds_overscan(self):
+        """Test that the rendered range covers the visible rows plus the overscan margin."""
+        assert render_window(0, 15, 5, 1_000_000) == (0, 20)
+        assert render_window(500_000, 15, 5, 1_000_000) == (499_995, 500_020)
+        assert render_window(999_985, 15, 5, 1_000_000) == (999_980, 1_000_000)
+        assert render_window(0, 15, 5, 3) == (0, 3)
+
+    def test_clamp_first(self):
+        """Test that scrolling stops at both ends of the list."""
+        assert clamp_first(-4, 15, 100) == 0
+        assert clamp_first(99, 15, 100) == 85
+        assert clamp_first(10, 15, 3) == 0
+
+    def test_concat_rows(self):
+        """Test that ConcatRows indexes across its parts without copying them."""
+        imported = [("Song", "Artist", "3", "1")]
+        rows = ConcatRows(range(3), imported)
+        assert len(rows) == 4
+        assert [rows[i] for i in range(4)] == [0, 1, 2, imported[0]]
+        assert rows[-1] == imported[0]
+        imported.append(("Other", "Artist", "2", "0"))
+        assert len(rows) == 5
+        with pytest.raises(IndexError):
+            rows[5]
@@ -0,0 +1,185 @@
+"""Cover thumbnails: decoded and resized to display size off the Tk thread, cached on disk and in memory.
+
+Cover bytes come from cover_art. A process pool decodes them with Pillow,
+scales them to SIZE and encodes a small PNG. The PNG is stored on disk under
+the SHA-256 of the source bytes, so a cover is only ever resized once. The Tk
+thread then only turns that small PNG into a PhotoImage, which Tk decodes in
+C. A bounded LRU of ready PhotoImage objects makes revisiting, and rows that
+were prefetched, show at once.
+"""
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+
+import cover_art
+import instrumentation
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "jukebox", "thumbnails")
+SIZE = (200, 200)  # Largest width and height a cover is shown at
+PROCESSES = 2
+MAX_PHOTOS = 64  # Ready PhotoImage objects kept in memory
+PREFETCH = 3  # Rows above and below the selection whose thumbnails are prepared
+
+
+def make_thumbnail(data, size, path):
+    """Decode image bytes, shrink them to fit size and save them as PNG at path; returns the PNG bytes.
+
+    Runs in a pool process, so it imports Pillow itself.
+    """
+    from io import BytesIO
+    from PIL import Image
+    with Image.open(BytesIO(data)) as image:
+        image.draft("RGB", size)  # Lets JPEG decode at a reduced scale
+        image.thumbnail(size)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+        output = BytesIO()
+        image.save(output, format="PNG")
+    png = output.getvalue()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(png)
+    os.replace(tmp_path, path)
+    return png
+
+
+class Thumbnails:
+    """Display-size covers for the windows; only show() and prefetch() touch Tk."""
+
+    def __init__(self, fetcher=None, cache_dir=CACHE_DIR, size=SIZE, processes=PROCESSES, max_photos=MAX_PHOTOS):
+        self.fetcher = fetcher
+        self.cache_dir = cache_dir
+        self.size = tuple(size)
+        self.processes = processes
+        self.max_photos = max_photos
+        self._pool = None  # Started with the first cover that needs resizing
+        self._lock = threading.Lock()
+        self._pending = {}  # url -> Future of thumbnail PNG bytes
+        self._photos = OrderedDict()  # url -> PhotoImage, least recently used first
+        self.stats = {"photo_hits": 0, "disk_hits": 0, "resized": 0, "errors": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}-{self.size[0]}x{self.size[1]}.png")
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                import multiprocessing
+                # Spawned rather than forked: the parent runs Tk and several threads
+                self._pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+        instrumentation.count(f"thumbnails.{name}")
+
+    def thumbnail(self, url):
+        """Return a Future that resolves to the thumbnail PNG bytes for url."""
+        with self._lock:
+            future = self._pending.get(url)
+            if future is not None:
+                return future
+            future = self._pending[url] = Future()
+        future.add_done_callback(lambda _: self._forget(url))
+        fetcher = self.fetcher or cover_art.get_fetcher()
+        fetcher.fetch(url).add_done_callback(lambda source: self._resize(source, future))
+        return future
+
+    def _forget(self, url):
+        with self._lock:
+            self._pending.pop(url, None)
+
+    def _resize(self, source, future):
+        # Runs on the cover_art worker that produced the bytes
+        try:
+            data = source.result()
+            path = self._path(hashlib.sha256(data).hexdigest())
+            try:
+                with open(path, "rb") as file:
+                    png = file.read()
+            except FileNotFoundError:
+                job = self._get_pool().submit(make_thumbnail, data, self.size, path)
+                job.add_done_callback(lambda job: self._resized(job, future))
+                return
+            self._count("disk_hits")
+            future.set_result(png)
+        except Exception as e:
+            self._count("errors")
+            future.set_exception(e)
+
+    def _resized(self, job, future):
+        if job.cancelled():  # close() shut the pool down before it got to this cover
+            future.set_exception(CancelledError("Thumbnails were closed."))
+            return
+        error = job.exception()
+        if error is not None:
+            self._count("errors")
+            future.set_exception(error)
+        else:
+            self._count("resized")
+            future.set_result(job.result())
+
+    def photo(self, url):
+        """Return the ready PhotoImage for url, or None."""
+        photo = self._photos.get(url)
+        if photo is not None:
+            self._photos.move_to_end(url)
+        return photo
+
+    def _make_photo(self, url, png):
+        photo = self.photo(url)
+        if photo is None:
+            import tkinter as tk
+            photo = tk.PhotoImage(data=base64.b64encode(png))  # Tk decodes the PNG itself
+            self._photos[url] = photo
+            while len(self._photos) > self.max_photos:
+                self._photos.popitem(last=False)
+        return photo
+
+    def show(self, widget, url, callback):
+        """Call callback(photo, error) on the Tk thread: at once if the photo is ready, else when it is."""
+        photo = self.photo(url)
+        if photo is not None:
+            self._count("photo_hits")
+            callback(photo, None)
+            return
+
+        def ready(png, error):
+            if error is not None:
+                callback(None, error)
+                return
+            try:
+                photo = self._make_photo(url, png)
+            except Exception as e:
+                callback(None, e)
+                return
+            callback(photo, None)
+
+        cover_art.deliver(widget, self.thumbnail(url), ready)
+
+    def prefetch(self, widget, urls):
+        """Prepare photos for urls (nearest first) so selecting them later shows them at once."""
+        for url in urls:
+            if url and url not in self._photos and url not in self._pending:
+                self.show(widget, url, lambda photo, error: None)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+_thumbnails = None
+
+
+def get_thumbnails():
+    """Return the thumbnail cache shared by all windows, creating it on first use."""
+    global _thumbnails
+    if _thumbnails is None:
+        _thumbnails = Thumbnails()
+    return _thumbnails
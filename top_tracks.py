@@ -0,0 +1,86 @@
+import tkinter as tk
+from tkinter import ttk
+import tracks_library as lib
+from charts import get_charts
+from library_events import LibraryChanges
+
+CHARTS = ("Most Played", "Best Rated", "Most Played by Artist", "Played Today", "Trending Now")
+HISTORY_CHARTS = {"Played Today": "Plays Today", "Trending Now": "Plays (1h)"}  # Chart -> heading of its play column
+AGING_MS = 60_000  # Charts over recent plays are redrawn this often, as plays age out of them
+
+class TopTracksWindow:
+    def __init__(self, window):
+        """Show the top tracks by plays, by rating, for one artist or over recent plays, redrawn when the library changes."""
+        self.window = window
+        window.title("Top Tracks")
+        self.charts = get_charts()
+        try:
+            lib.ensure_library(lib.LIBRARY_FILE)  # Parsed only if no window has loaded this version yet
+        except Exception as e:
+            print(f"Failed to load tracks: {e}")
+
+        self.chart_var = tk.StringVar(window, CHARTS[0])
+        chart_menu = tk.OptionMenu(window, self.chart_var, *CHARTS, command=lambda _: self.refresh())
+        chart_menu.grid(row=0, column=0, padx=10, pady=10)
+
+        artists = lib.get_all_artists() or [""]
+        self.artist_var = tk.StringVar(window, artists[0])
+        artist_menu = tk.OptionMenu(window, self.artist_var, *artists, command=lambda _: self.refresh())
+        artist_menu.grid(row=0, column=1, padx=10, pady=10)
+
+        self.tree = ttk.Treeview(window, columns=("Rank", "Song", "Artist", "Rating", "Play Count"),
+                                 show="headings", height=10)
+        for column, width in (("Rank", 50), ("Song", 200), ("Artist", 150), ("Rating", 80), ("Play Count", 100)):
+            self.tree.heading(column, text=column)
+            self.tree.column(column, anchor="w" if column in ("Song", "Artist") else "center", width=width)
+        self.tree.grid(row=1, column=0, columnspan=2, padx=10, pady=10)
+
+        self.shown = []  # Keys of the listed tracks
+        self._aging = None  # after() id of the next redraw of a chart over recent plays
+        self.changes = LibraryChanges(window, self.library_changed)
+        self.refresh()
+
+    def current_chart(self):
+        """Return the selected chart as (track, plays shown) pairs."""
+        chart = self.chart_var.get()
+        history = lib.history
+        if chart in HISTORY_CHARTS:
+            if chart == "Played Today":
+                ranked = history.most_played(history.today())
+            else:
+                ranked = [(key, plays) for key, plays, _ in history.trending()]
+            return [(lib.library[key], plays) for key, plays in ranked if key in lib.library]
+        if chart == "Best Rated":
+            tracks = self.charts.top_rated()
+        elif chart == "Most Played by Artist":
+            tracks = self.charts.top_by_artist(self.artist_var.get())
+        else:
+            tracks = self.charts.top_played()
+        return [(track, track.play_count) for track in tracks]
+
+    def library_changed(self, changes):
+        """Redraw when the changes can reorder the chart or touch a track it lists."""
+        ranked_by = lib.RATING_CHANGED if self.chart_var.get() == "Best Rated" else lib.COUNT_CHANGED
+        if (changes.keys() - {lib.RATING_CHANGED, lib.COUNT_CHANGED} or ranked_by in changes
+                or any(key in keys for keys in changes.values() for key in self.shown)):
+            self.refresh()
+
+    def refresh(self):
+        """Redraw the selected chart; the charts are kept up to date, so this costs O(top) per call.
+
+        Charts over recent plays cost O(tracks played in their range) instead.
+        """
+        if self._aging is not None:
+            self.window.after_cancel(self._aging)  # A menu change redraws now; keep a single timer
+            self._aging = None
+        if not self.window.winfo_exists():
+            return
+        self.tree.delete(*self.tree.get_children())
+        chart = self.chart_var.get()
+        self.tree.heading("Play Count", text=HISTORY_CHARTS.get(chart, "Play Count"))
+        ranked = self.current_chart()
+        for rank, (track, plays) in enumerate(ranked, start=1):
+            self.tree.insert("", "end", values=(rank, track.title, track.singer, track.rating, plays))
+        self.shown = [track.key for track, _ in ranked]
+        if chart in HISTORY_CHARTS:
+            self._aging = self.window.after(AGING_MS, self.refresh)
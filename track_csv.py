@@ -0,0 +1,101 @@
+import csv
+import os
+import tempfile
+from track_store import check_rating, check_play_count
+
+COLUMNS = ["Song", "Artist", "Rating", "Play Count"]  # Header of exported track lists
+IMPORT_BATCH = 2000  # CSV rows validated and handed over per step
+EXPORT_BATCH = 5000  # Tracks looked at per export step
+
+
+def _lines(file, progress):
+    # Decode line by line from a binary file so the bytes read so far are known for progress
+    for line in file:
+        progress[0] += len(line)
+        yield line.decode("utf-8")
+
+
+def parse_track_row(song, artist, rating, play_count):
+    """Return (song, artist, rating, play count) with the numbers converted, or raise ValueError."""
+    try:
+        rating, play_count = int(rating), int(play_count)
+    except ValueError:
+        raise ValueError("Rating and play count must be integers.") from None
+    check_rating(rating)
+    check_play_count(play_count)
+    return (song, artist, rating, play_count)
+
+
+def iter_track_row_batches(csv_file, batch_size=IMPORT_BATCH, skipped=None):
+    """Yield (rows, bytes read so far) for a track list CSV, batch_size valid rows at a time.
+
+    The file is read as it goes, so memory does not grow with its size.
+    Invalid rows are left out and, if a skipped list is given, reported there
+    as (line number, reason).
+    """
+    progress = [0]
+    with open(csv_file, mode="rb") as file:
+        reader = csv.reader(_lines(file, progress))
+        header = {name: index for index, name in enumerate(next(reader, []))}
+        indices = [header.get(column) for column in COLUMNS]
+        batch = []
+        for row in reader:
+            if not row:
+                continue  # Blank line
+            try:
+                for column, index in zip(COLUMNS, indices):
+                    if index is None or index >= len(row):
+                        raise ValueError(f"Missing column '{column}'.")
+                batch.append(parse_track_row(*[row[index] for index in indices]))
+            except ValueError as e:
+                if skipped is not None:
+                    skipped.append((reader.line_num, str(e)))
+                continue
+            if len(batch) >= batch_size:
+                yield batch, progress[0]
+                batch = []
+        yield batch, progress[0]
+
+
+def read_track_rows(csv_file, skipped=None):
+    """Return every valid (song, artist, rating, play count) row of a track list CSV."""
+    rows = []
+    for batch, _ in iter_track_row_batches(csv_file, skipped=skipped):
+        rows.extend(batch)
+    return rows
+
+
+def iter_write_track_rows(csv_file, tracks, keep=None, batch_size=EXPORT_BATCH):
+    """Write tracks (anything with info()) for which keep(track) is true, yielding (looked at, written) per step.
+
+    Rows go to a temporary file as they are filtered, which replaces csv_file
+    once every track was written. Closing the generator early cancels the
+    export and leaves csv_file untouched.
+    """
+    directory = os.path.dirname(os.path.abspath(csv_file))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tracks-", suffix=".csv", dir=directory)
+    try:
+        with os.fdopen(fd, mode="w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(COLUMNS)
+            seen = written = 0
+            for track in tracks:
+                seen += 1
+                if keep is None or keep(track):
+                    writer.writerow(track.info())
+                    written += 1
+                if seen % batch_size == 0:
+                    yield seen, written
+        os.replace(tmp_path, csv_file)
+        yield seen, written
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_track_rows(csv_file, tracks, keep=None):
+    """Write tracks (anything with info()) as a track list CSV; returns the number written."""
+    written = 0
+    for _, written in iter_write_track_rows(csv_file, tracks, keep):
+        pass
+    return written
@@ -0,0 +1,152 @@
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+_TOKEN = re.compile(r"\w+")
+_MAX_CHAR = chr(0x10FFFF)
+
+
+def tokenize(text):
+    """Split text into lower-case tokens with accents removed."""
+    if text.isascii():
+        return _TOKEN.findall(text.lower())  # Fast path: nothing to normalize
+    text = unicodedata.normalize("NFKD", text).casefold()
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _TOKEN.findall(text)
+
+
+class _Vocabulary:
+    """Numbers distinct tokens and answers prefix lookups through a sorted token list."""
+
+    def __init__(self):
+        self.ids = {}  # token -> token id
+        self._sorted = None  # (tokens, ids) sorted by token, rebuilt after new tokens arrive
+
+    def id_for(self, token):
+        """Return the id of a token, numbering it if it is new."""
+        token_id = self.ids.get(token)
+        if token_id is None:
+            token_id = self.ids[token] = len(self.ids)
+            self._sorted = None
+        return token_id
+
+    def expand(self, prefix):
+        """Return the ids of all tokens starting with prefix."""
+        if self._sorted is None:
+            pairs = sorted(self.ids.items())
+            self._sorted = ([token for token, _ in pairs], [token_id for _, token_id in pairs])
+        tokens, ids = self._sorted
+        lo = bisect_left(tokens, prefix)
+        hi = bisect_left(tokens, prefix + _MAX_CHAR, lo)
+        return ids[lo:hi]
+
+
+class TrackIndex:
+    """Inverted index of title and singer tokens over the rows of a TrackStore.
+
+    Query words must all match: every word but the last as a whole token, and
+    the last one as a prefix, since it may still be being typed. Rating and
+    play count are not indexed, so updating them leaves the index valid.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._title_vocab = _Vocabulary()
+        self._title_rows = []  # title token id -> array of rows
+        self._row_tokens = array("I")  # title token ids of every row, back to back
+        self._row_offsets = array("I", [0])  # row -> start of its ids in _row_tokens
+        self._singer_vocab = _Vocabulary()
+        self._singer_codes = []  # singer token id -> set of singer codes
+        self._singer_rows = []  # singer code -> array of rows
+        self.indexed = 0  # Rows of the store indexed so far
+
+    def catch_up(self, max_rows=None):
+        """Index rows added to the store since the last call; returns True once the index is complete."""
+        stop = len(self.store)
+        if max_rows is not None:
+            stop = min(stop, self.indexed + max_rows)
+        for row in range(self.indexed, stop):
+            self.add(row)
+        return self.indexed == len(self.store)
+
+    def add(self, row):
+        """Index the next row of the store."""
+        if row != self.indexed:
+            raise ValueError(f"Rows must be indexed in order; expected row {self.indexed}.")
+        for token in dict.fromkeys(tokenize(self.store.title_at(row))):
+            token_id = self._title_vocab.id_for(token)
+            if token_id == len(self._title_rows):
+                self._title_rows.append(array("I"))
+            self._title_rows[token_id].append(row)
+            self._row_tokens.append(token_id)
+        self._row_offsets.append(len(self._row_tokens))
+
+        code = self.store.singer_code_at(row)
+        if code == len(self._singer_rows):  # First track by this singer
+            self._singer_rows.append(array("I"))
+            for token in tokenize(self.store.singer_name(code)):
+                token_id = self._singer_vocab.id_for(token)
+                if token_id == len(self._singer_codes):
+                    self._singer_codes.append(set())
+                self._singer_codes[token_id].add(code)
+        self._singer_rows[code].append(row)
+        self.indexed += 1
+
+    def search_titles(self, query, limit=None):
+        """Return rows whose title matches query, in catalog order."""
+        self.catch_up()
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        *words, prefix = tokens
+        prefix_ids = self._title_vocab.expand(prefix)
+        if not words:
+            rows = set()
+            for token_id in prefix_ids:
+                rows.update(self._title_rows[token_id])
+            return self._ordered(rows, limit)
+
+        # Intersect the whole-word postings, smallest first, then check the prefix per row
+        word_ids = [self._title_vocab.ids.get(word) for word in words]
+        if None in word_ids:
+            return []
+        postings = sorted((self._title_rows[token_id] for token_id in word_ids), key=len)
+        rows = set(postings[0])
+        for other in postings[1:]:
+            rows.intersection_update(other)
+        prefix_ids = set(prefix_ids)
+        row_tokens, offsets = self._row_tokens, self._row_offsets
+        matched = [
+            row for row in rows
+            if not prefix_ids.isdisjoint(row_tokens[offsets[row]:offsets[row + 1]])
+        ]
+        return self._ordered(matched, limit)
+
+    def search_singers(self, query, limit=None):
+        """Return rows whose singer matches query, in catalog order."""
+        codes = self.singer_codes(query)
+        rows = [row for code in codes for row in self._singer_rows[code]]
+        return self._ordered(rows, limit)
+
+    def singer_codes(self, query):
+        """Return the codes of singers whose name matches query."""
+        self.catch_up()
+        tokens = tokenize(query)
+        if not tokens:
+            return set()
+        *words, prefix = tokens
+        codes = set()
+        for token_id in self._singer_vocab.expand(prefix):
+            codes |= self._singer_codes[token_id]
+        for word in words:
+            token_id = self._singer_vocab.ids.get(word)
+            if token_id is None:
+                return set()
+            codes &= self._singer_codes[token_id]
+        return codes
+
+    @staticmethod
+    def _ordered(rows, limit):
+        rows = sorted(rows)
+        return rows if limit is None else rows[:limit]
@@ -3,12 +3,15 @@ from tkinter import ttk
 import tkinter.scrolledtext as tkst
 import font_manager as fonts  # Custom font manager
 import tracks_library as lib  # Custom library for managing tracks
-from view_tracks import Viewtracks  # Class to check tracks
-from update_tracks import UpdateTracksWindow
 from tkinter import messagebox, filedialog
-from create_track_list import TrackListApp
-import csv
-import json
+from catalog_loader import pump
+from virtual_list import VirtualTreeview, ConcatRows
+from track_csv import iter_track_row_batches, iter_write_track_rows
+from stats_panel import StatsPanel
+from library_events import LibraryChanges
+import instrumentation
+import catalog
+import os
 
 # Initialize a shared dictionary for play counts
 shared_play_counts = {}
@@ -19,6 +22,7 @@ def play_track(track_key):
         shared_play_counts[track_key] += 1  # Increment play count
     else:
         shared_play_counts[track_key] = 1  # Initialize if not already present
+    lib.history.record(track_key, lib.get_singer(track_key))  # Counts towards this hour's and today's plays
     print(f"Track {track_key} has been played. New count: {shared_play_counts[track_key]}")
 
 class LibraryItem:
@@ -37,23 +41,23 @@ class LibraryItem:
     def read_library(file_path):
         """Read songs from a JSON file and return a list of LibraryItem instances."""
         items = []
-        with open(file_path, 'r') as jsonfile:
-            tracks_data = json.load(jsonfile)
-            for track in tracks_data:
-                if 'song' in track and 'singer' in track and 'rating' in track and 'play_count' in track:
-                    items.append(LibraryItem(track['song'], track['singer'], track['rating'], track['play_count']))
+        tracks_data = catalog.load(file_path)  # Shared cache, parsed only if the file changed
+        for track in tracks_data:
+            if 'song' in track and 'singer' in track and 'rating' in track and 'play_count' in track:
+                items.append(LibraryItem(track['song'], track['singer'], track['rating'], track['play_count']))
         return items
 
 class TrackPlayer:
     def __init__(self, root):
         """Initialize the ViewTracks GUI component."""
         self.root = root  # Main application window
-        self.library_items = []  # List to hold LibraryItem instances
+        self.imported_rows = []  # Rows imported from CSV files, shown after the library
         self.create_widgets()  # Create the GUI components
+        self.changes = LibraryChanges(root, self.library_changed)  # Changes from every window, once per idle cycle
 
     def create_widgets(self):
         """Create and layout GUI components for viewing tracks."""
-        self.tree = ttk.Treeview(self.root, columns=("Song", "Artist", "Rating", "Play Count"), show='headings', height=15)
+        self.tree = VirtualTreeview(self.root, columns=("Song", "Artist", "Rating", "Play Count"), height=15)
         self.tree.heading("Song", text="Song")
         self.tree.heading("Artist", text="Artist")
         self.tree.heading("Rating", text="Rating")
@@ -65,101 +69,244 @@ class TrackPlayer:
         self.tree.grid(row=4, column=0, columnspan=4, pady=10)
     def create_track_list(self):
         """Create a new TrackListApp instance."""
+        from create_track_list import TrackListApp  # Window modules load when first opened
         TrackListApp(tk.Toplevel(self.root), shared_play_counts)
 
     def update_tracks(self):
         """Open the UpdateTracksWindow."""
+        from update_tracks import UpdateTracksWindow
         UpdateTracksWindow(self.root)
     def view_tracks(self):
         """Open the Viewtracks application."""
+        from view_tracks import Viewtracks
         Viewtracks(tk.Toplevel(self.root), shared_play_counts)
+    def top_tracks(self):
+        """Open the TopTracksWindow."""
+        from top_tracks import TopTracksWindow
+        TopTracksWindow(tk.Toplevel(self.root))
+    def statistics(self):
+        """Open the StatsWindow if NumPy is installed."""
+        try:
+            from view_stats import StatsWindow
+        except ImportError as e:
+            messagebox.showerror("Statistics", f"Statistics need NumPy: {e}")
+            return
+        StatsWindow(tk.Toplevel(self.root))
     def load_library(self):
-        """Load tracks from the library JSON file."""
-        file_path = "song.json"  # Define the path to the JSON file
-        self.library_items = LibraryItem.read_library(file_path)  # Read items from the file
-        self.update_library()  # Update the GUI to reflect loaded items
+        """Stream tracks from the library file into the Treeview batch by batch."""
+        file_path = lib.LIBRARY_FILE  # song.json unless JUKEBOX_LIBRARY names another file
+        if lib.is_library_current(file_path):
+            catalog.note_hit()  # Another window already loaded this version of the file
+            self.update_library()
+            return
+        batches = instrumentation.timed_iter("player.load_batch", lib.iter_load_library(file_path))
+        pump(self.root, batches, lambda keys: None)  # Each batch is drawn by library_changed
+
+    def library_changed(self, changes):
+        """Show tracks added or reloaded, and redraw only the visible rows whose rating or play count changed."""
+        if lib.LIBRARY_RELOADED in changes or lib.TRACKS_ADDED in changes:
+            self.update_library()
+            return
+        store = lib.library
+        keys = set().union(*changes.values())
+        redrawn = self.tree.redraw_rows(lambda row: isinstance(row, int) and store.key_at(row) in keys)
+        instrumentation.count("player.rows_redrawn", redrawn)
 
+    def add_imported(self, rows):
+        """Append rows imported from a CSV file to the Treeview."""
+        self.imported_rows.extend(rows)
+        self.update_library()
+
+    @instrumentation.timed("player.update_library")
     def update_library(self):
-        """Update the Treeview to show current library items."""
-        for item in self.tree.get_children():
-            self.tree.delete(item)  # Clear the Treeview
-        for item in self.library_items:
-            self.tree.insert("", tk.END, values=item.info())  # Insert each item's info into the Treeview
-
-def import_track_list(tree, status_lbl):
-    """Import a track list from a CSV file and update the Treeview."""
+        """Update the Treeview to show the library store followed by imported rows."""
+        rows = ConcatRows(range(len(lib.library)), self.imported_rows)  # No rows are copied
+        self.tree.set_rows(rows, self.row_values, keep_position=True)
+
+    @staticmethod
+    def row_values(row):
+        """Return the Treeview values for a library store row or an imported row."""
+        return lib.library.view_at(row).info() if isinstance(row, int) else row
+
+_cancel_transfer = None  # Stops the CSV import or export in progress
+
+def start_transfer(cancel):
+    """Remember how to cancel a new CSV transfer, cancelling any previous one."""
+    global _cancel_transfer
+    if _cancel_transfer:
+        _cancel_transfer()
+    _cancel_transfer = cancel
+
+def finish_transfer():
+    global _cancel_transfer
+    _cancel_transfer = None
+
+def cancel_transfer(status_lbl):
+    """Cancel the CSV import or export in progress."""
+    if _cancel_transfer is None:
+        status_lbl.configure(text="No import or export is running.")
+        return
+    _cancel_transfer()
+    finish_transfer()
+    status_lbl.configure(text="Transfer cancelled.")
+
+def import_track_list(player, status_lbl):
+    """Import a track list from a CSV file into the TrackPlayer's Treeview, a batch of rows per idle step."""
     status_lbl.configure(text="Import Track List button was clicked!")
     file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
-    if file_path:
-        try:
-            with open(file_path, mode="r", newline="", encoding="utf-8") as csv_file:
-                reader = csv.DictReader(csv_file)  # Sử dụng DictReader để xử lý cột dễ dàng
-                for row in reader:
-                    # Đảm bảo dữ liệu có đủ cột và nhập đúng định dạng
-                    if "Song" in row and "Artist" in row and "Rating" in row and "Play Count" in row:
-                        tree.insert("", tk.END, values=(row["Song"], row["Artist"], row["Rating"], row["Play Count"]))
-            status_lbl.configure(text="Track list imported successfully.")
-        except Exception as e:
-            status_lbl.configure(text=f"Import failed: {str(e)}")
-    else:
+    if not file_path:
         status_lbl.configure(text="Import cancelled.")
+        return
+    try:
+        total = os.path.getsize(file_path) or 1
+    except OSError as e:
+        status_lbl.configure(text=f"Import failed: {str(e)}")
+        return
+    skipped = []  # (line, reason) of rows that failed validation
+    imported = 0
+
+    def add_rows(batch):
+        nonlocal imported
+        rows, bytes_read = batch
+        player.add_imported(rows)
+        imported += len(rows)
+        status_lbl.configure(text=f"Importing... {imported} rows ({bytes_read / total:.0%})")
+
+    def done():
+        finish_transfer()
+        text = f"Track list imported successfully: {imported} rows."
+        if skipped:
+            text += f" {len(skipped)} invalid rows skipped."
+        status_lbl.configure(text=text)
+
+    def failed(e):
+        finish_transfer()
+        status_lbl.configure(text=f"Import failed: {str(e)}")
+
+    batches = iter_track_row_batches(file_path, skipped=skipped)
+    start_transfer(pump(status_lbl, batches, add_rows, done, failed))
+
+def ingest_catalogs(player, status_lbl):
+    """Add CSV and JSON catalog files to the library, merging duplicates; parsing and the write run off the Tk thread."""
+    import catalog_ingest  # Only ingestion needs the process pool and hashing
+    from cover_art import deliver
+    paths = filedialog.askopenfilenames(filetypes=[("Catalog files", "*.csv *.json")])
+    if not paths:
+        status_lbl.configure(text="Ingest cancelled.")
+        return
+    status_lbl.configure(text=f"Ingesting {len(paths)} files...")
+
+    def ingested(report, error):
+        if error is not None:
+            status_lbl.configure(text=f"Ingest failed: {str(error)}")
+            return
+        text = (f"Ingested {report['read']} tracks: {report['added']} added, {report['updated']} play counts "
+                f"updated, {report['exact'] + report['near']} duplicates merged.")
+        if report["skipped"]:
+            text += f" {len(report['skipped'])} invalid records skipped."
+        status_lbl.configure(text=text)
+        player.load_library()  # The file now holds the new tracks
+
+    deliver(status_lbl, catalog_ingest.ingest_in_background(paths, lib.LIBRARY_FILE), ingested)
 
 def export_track_list(tree, status_lbl):
-    """Export tracks with play_count > 0 from song.json to a CSV file."""
+    """Export tracks with play_count > 0 from the library to a CSV file, taking them from the play chart."""
     status_lbl.configure(text="Export Track List button was clicked!")
     file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
-    if file_path:
-        try:
-            # Đọc dữ liệu từ JSON
-            with open("song.json", "r") as json_file:
-                tracks = json.load(json_file)
-            filtered_tracks = [track for track in tracks if track.get("play_count", 0) > 0]
-            
-            with open(file_path, mode="w", newline="", encoding="utf-8") as csv_file:
-                writer = csv.writer(csv_file)
-                writer.writerow(["Song", "Artist", "Rating", "Play Count"])  # Ghi tiêu đề cột
-                for track in filtered_tracks:
-                    writer.writerow([track["title"], track["singer"], track["rating"], track["play_count"]])
-            
-            status_lbl.configure(text="Track list exported successfully.")
-        except Exception as e:
-            status_lbl.configure(text=f"Export failed: {str(e)}")
-    else:
+    if not file_path:
         status_lbl.configure(text="Export cancelled.")
+        return
+    try:
+        lib.ensure_library(lib.LIBRARY_FILE)
+    except Exception as e:
+        status_lbl.configure(text=f"Export failed: {str(e)}")
+        return
+    from charts import get_charts
+    store = lib.library
+    rows = get_charts().played_rows()  # Only played tracks are visited, not the whole library
+    total = len(rows) or 1
+    written = 0
+
+    def progress(step):
+        nonlocal written
+        seen, written = step
+        status_lbl.configure(text=f"Exporting... {written} tracks written ({seen / total:.0%})")
+
+    def done():
+        finish_transfer()
+        status_lbl.configure(text=f"Track list exported successfully: {written} tracks.")
+
+    def failed(e):
+        finish_transfer()
+        status_lbl.configure(text=f"Export failed: {str(e)}")
+
+    tracks = (store.view_at(row) for row in rows)
+    steps = iter_write_track_rows(file_path, tracks)
+    start_transfer(pump(status_lbl, steps, progress, done, failed))
+
+
+def build_window():
+    """Create the main window; the library starts loading once the first frame is shown."""
+    window = tk.Tk()  # Create the main application window
+    window.geometry("800x820")  # Set the size of the window larger for better readability
+    window.title("JukeBox")  # Set the title of the window
+
+    fonts.configure()  # Configure fonts using a custom font manager
+
+    # Create a header label
+    header_lbl = tk.Label(window, text="Select an option by clicking one of the buttons below", font=("Helvetica", 14))
+    header_lbl.grid(row=0, column=0, columnspan=4, padx=10, pady=10)
+
+    track_player = TrackPlayer(window)  # Create an instance of TrackPlayer for managing track views
+    window.after_idle(track_player.load_library)  # Fill the track table in the background after the window is drawn
+
+    # Create buttons for various functionalities
+    check_view_btn = tk.Button(window, text="View Tracks", command=track_player.view_tracks, font=("Helvetica", 12))
+    check_view_btn.grid(row=1, column=0, padx=10, pady=10)
 
+    create_track_list_btn = tk.Button(window, text="Create Track List", 
+                                        command=track_player.create_track_list, 
+                                        font=("Helvetica", 12))
+    create_track_list_btn.grid(row=1, column=1, padx=10, pady=10)
 
-# Main Window setup
-window = tk.Tk()  # Create the main application window
-window.geometry("800x600")  # Set the size of the window larger for better readability
-window.title("JukeBox")  # Set the title of the window
+    update_tracks_btn = tk.Button(window, text="Update Tracks", command=track_player.update_tracks, font=("Helvetica", 12))
+    update_tracks_btn.grid(row=1, column=2, padx=10, pady=10)
 
-fonts.configure()  # Configure fonts using a custom font manager
+    btn_import_track_list = tk.Button(window, text="Import Track List", command=lambda: import_track_list(track_player, status_lbl), font=("Helvetica", 12))
+    btn_import_track_list.grid(row=2, column=0, padx=10, pady=10)
 
-# Create a header label
-header_lbl = tk.Label(window, text="Select an option by clicking one of the buttons below", font=("Helvetica", 14))
-header_lbl.grid(row=0, column=0, columnspan=4, padx=10, pady=10)
+    btn_export_track_list = tk.Button(window, text="Export Track List", command=lambda: export_track_list(track_player.tree, status_lbl), font=("Helvetica", 12))
+    btn_export_track_list.grid(row=2, column=1, padx=10, pady=10)
 
-track_player = TrackPlayer(window)  # Create an instance of TrackPlayer for managing track views
+    btn_cancel_transfer = tk.Button(window, text="Cancel Import/Export", command=lambda: cancel_transfer(status_lbl), font=("Helvetica", 12))
+    btn_cancel_transfer.grid(row=2, column=2, padx=10, pady=10)
 
-# Create buttons for various functionalities
-check_view_btn = tk.Button(window, text="View Tracks", command=lambda: Viewtracks(tk.Toplevel(window), shared_play_counts), font=("Helvetica", 12))
-check_view_btn.grid(row=1, column=0, padx=10, pady=10)
+    top_tracks_btn = tk.Button(window, text="Top Tracks", command=track_player.top_tracks, font=("Helvetica", 12))
+    top_tracks_btn.grid(row=1, column=3, padx=10, pady=10)
 
-create_track_list_btn = tk.Button(window, text="Create Track List", 
-                                    command=lambda: TrackListApp(tk.Toplevel(window), shared_play_counts), 
-                                    font=("Helvetica", 12))
-create_track_list_btn.grid(row=1, column=1, padx=10, pady=10)
+    statistics_btn = tk.Button(window, text="Statistics", command=track_player.statistics, font=("Helvetica", 12))
+    statistics_btn.grid(row=2, column=3, padx=10, pady=10)
 
-update_tracks_btn = tk.Button(window, text="Update Tracks", command=track_player.update_tracks, font=("Helvetica", 12))
-update_tracks_btn.grid(row=1, column=2, padx=10, pady=10)
+    status_lbl = tk.Label(window, text="", font=("Helvetica", 12))  # Label for status messages
+    status_lbl.grid(row=3, column=1, columnspan=3, padx=10, pady=10)
 
-btn_import_track_list = tk.Button(window, text="Import Track List", command=lambda: import_track_list(track_player.tree, status_lbl), font=("Helvetica", 12))
-btn_import_track_list.grid(row=2, column=0, padx=10, pady=10)
+    btn_ingest_catalogs = tk.Button(window, text="Ingest Catalogs", command=lambda: ingest_catalogs(track_player, status_lbl), font=("Helvetica", 12))
+    btn_ingest_catalogs.grid(row=3, column=0, padx=10, pady=10)
 
-btn_export_track_list = tk.Button(window, text="Export Track List", command=lambda: export_track_list(track_player.tree, status_lbl), font=("Helvetica", 12))
-btn_export_track_list.grid(row=2, column=1, padx=10, pady=10)
+    stats_panel = StatsPanel(window)  # Live timers; JUKEBOX_STATS=1 starts with collection on
+    stats_panel.grid(row=5, column=0, columnspan=4, padx=10, pady=5)
+    return window
 
-status_lbl = tk.Label(window, text="", font=("Helvetica", 12))  # Label for status messages
-status_lbl.grid(row=3, column=0, columnspan=4, padx=10, pady=10)
+def main():
+    stop_dumping = None
+    if instrumentation.STATS_FILE:  # Periodic JSON dump of the timers for later comparison
+        instrumentation.enable()
+        stop_dumping = instrumentation.start_dumping(instrumentation.STATS_FILE)
+    try:
+        build_window().mainloop()  # Start the main event loop
+    finally:
+        if stop_dumping:
+            stop_dumping()
 
-window.mainloop()  # Start the main event loop
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+from array import array
+from collections.abc import Mapping
+
+
+def check_rating(rating):
+    """Raise ValueError unless rating is an integer between 0 and 5."""
+    if not isinstance(rating, int) or not (0 <= rating <= 5):
+        raise ValueError("Rating must be an integer between 0 and 5.")
+
+
+def check_play_count(play_count):
+    """Raise ValueError unless play_count is a non-negative integer."""
+    if not isinstance(play_count, int) or play_count < 0:
+        raise ValueError("Play count must be a non-negative integer.")
+
+
+class TrackView:
+    """Lightweight stand-in for a LibraryItem that reads and writes one row of a store.
+
+    Works with any store offering the row accessors of TrackStore (key_at,
+    title_at, singer_at, rating_at, set_rating_at, ...).
+    """
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    @property
+    def key(self):
+        return self._store.key_at(self._row)
+
+    @property
+    def title(self):
+        return self._store.title_at(self._row)
+
+    @property
+    def singer(self):
+        return self._store.singer_at(self._row)
+
+    @property
+    def rating(self):
+        return self._store.rating_at(self._row)
+
+    @rating.setter
+    def rating(self, value):
+        check_rating(value)
+        self._store.set_rating_at(self._row, value)
+
+    @property
+    def play_count(self):
+        return self._store.play_count_at(self._row)
+
+    @play_count.setter
+    def play_count(self, value):
+        check_play_count(value)
+        self._store.set_play_count_at(self._row, value)
+
+    @property
+    def link(self):
+        return self._store.link_at(self._row)
+
+    @property
+    def image_path(self):
+        return self._store.image_path_at(self._row)
+
+    def info(self):
+        """Return a tuple with track information."""
+        return (self.title, self.singer, self.rating, self.play_count)
+
+    def __repr__(self):
+        return f"TrackView({self.title!r}, {self.singer!r}, rating={self.rating}, play_count={self.play_count})"
+
+
+class TrackStore(Mapping):
+    """Column-oriented track storage keyed by track key.
+
+    Ratings and play counts live in typed arrays, singer names are stored once
+    and referenced by code, and lookups hand out TrackView objects on demand.
+    """
+
+    def __init__(self):
+        self._index = {}  # track key -> row number
+        self._keys = []
+        self._titles = []
+        self._links = []
+        self._image_paths = []
+        self._singers = []  # interned singer names, indexed by code
+        self._singer_lookup = {}  # singer name -> code
+        self._singer_codes = array("I")
+        self._ratings = array("B")
+        self._play_counts = array("Q")
+
+    def add(self, key, title, singer, rating, link, image_path=None, play_count=0):
+        """Append a track and return its row number."""
+        check_rating(rating)
+        check_play_count(play_count)
+        if key in self._index:
+            raise KeyError(f"Track {key} already exists.")
+
+        code = self._singer_lookup.get(singer)
+        if code is None:
+            code = len(self._singers)
+            self._singers.append(singer)
+            self._singer_lookup[singer] = code
+
+        row = len(self._keys)
+        self._index[key] = row
+        self._keys.append(key)
+        self._titles.append(title)
+        self._links.append(link)
+        self._image_paths.append(image_path)
+        self._singer_codes.append(code)
+        self._ratings.append(rating)
+        self._play_counts.append(play_count)
+        return row
+
+    def row_of(self, key):
+        """Return the row number for a key, or None if it is not stored."""
+        return self._index.get(key)
+
+    def key_at(self, row):
+        """Return the track key stored at a row."""
+        return self._keys[row]
+
+    def view_at(self, row):
+        """Return a TrackView for a row."""
+        return TrackView(self, row)
+
+    def title_at(self, row):
+        """Return the title stored at a row."""
+        return self._titles[row]
+
+    def singer_code_at(self, row):
+        """Return the interned singer code stored at a row."""
+        return self._singer_codes[row]
+
+    def singer_at(self, row):
+        """Return the singer name stored at a row."""
+        return self._singers[self._singer_codes[row]]
+
+    def rating_at(self, row):
+        return self._ratings[row]
+
+    def set_rating_at(self, row, rating):
+        self._ratings[row] = rating
+
+    def play_count_at(self, row):
+        return self._play_counts[row]
+
+    def set_play_count_at(self, row, play_count):
+        self._play_counts[row] = play_count
+
+    def link_at(self, row):
+        return self._links[row]
+
+    def image_path_at(self, row):
+        return self._image_paths[row]
+
+    def singer_name(self, code):
+        """Return the singer name for an interned singer code."""
+        return self._singers[code]
+
+    def singers(self):
+        """Return the distinct singer names in first-seen order."""
+        return list(self._singers)
+
+    def numeric_columns(self):
+        """Return copies of the singer code, rating and play count columns as arrays, one item per row."""
+        return array("I", self._singer_codes), array("B", self._ratings), array("Q", self._play_counts)
+
+    def __getitem__(self, key):
+        return TrackView(self, self._index[key])
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return f"TrackStore({len(self)} tracks, {len(self._singers)} singers)"
@@ -1,12 +1,20 @@
 import json
+import os
+import threading
+from track_store import TrackStore, check_rating, check_play_count
+from catalog_loader import BATCH_SIZE, validate_record
+from track_index import TrackIndex
+import catalog
+import catalog_snapshot
+import storage
+from play_history import PlayHistory
+from instrumentation import timed
 
 class LibraryItem:
     def __init__(self, title, singer, rating, link, image_path=None, play_count=0):
-        if not isinstance(rating, int) or not (0 <= rating <= 5):
-            raise ValueError("Rating must be an integer between 0 and 5.")
-        if not isinstance(play_count, int) or play_count < 0:
-            raise ValueError("Play count must be a non-negative integer.")
-        
+        check_rating(rating)
+        check_play_count(play_count)
+
         self.title = title
         self.singer = singer
         self.rating = rating
@@ -18,26 +26,147 @@ class LibraryItem:
         """Return a tuple with track information."""
         return (self.title, self.singer, self.rating, self.play_count)
 
-# Initialize the library dictionary
-library = {}
+# Initialize the library store (a mapping of track key -> TrackView)
+library = TrackStore()
+index = TrackIndex(library)  # Title and singer search index over the library
+history = PlayHistory()  # Plays per minute, hour and day; kept across reloads, since track keys are stable
+library_file = None  # Path of the JSON file or SQLite database the library was loaded from
+library_signature = None  # Storage signature of that file when the library matched it
+LIBRARY_FILE = os.environ.get("JUKEBOX_LIBRARY", "song.json")  # Library the windows open; .db for SQLite
+_storages = {}  # Library file path -> JsonStorage or SqliteStorage
+_storages_lock = threading.Lock()  # Storages are opened from the Tk thread and from catalog ingestion
+DAEMON_SOCKET = os.environ.get("JUKEBOX_DAEMON")  # play_daemon socket; when set, windows run in client mode
+_daemon_client = None
+_listeners = []  # Called as listener(kind, keys) for every change made through this module
 
-def load_library_from_json(json_file):
-    """Load library data from a JSON file."""
-    global library
-    library = {}  # Clear existing library
+# Kinds of change event, each published with the keys of the tracks concerned
+TRACKS_ADDED = "added"  # Tracks loaded into the library; a streamed load publishes one event per batch
+RATING_CHANGED = "rating"
+COUNT_CHANGED = "play_count"
+LIBRARY_RELOADED = "reloaded"  # The library was replaced, so every row may have changed; no keys
+
+def add_listener(listener):
+    """Call listener(kind, keys) on the changing thread whenever the library changes through this module."""
+    _listeners.append(listener)
+
+def remove_listener(listener):
+    _listeners.remove(listener)
+
+def _publish(kind, keys):
+    for listener in list(_listeners):
+        listener(kind, keys)
+
+def make_key(track_id):
+    """Return the track key for a track id (catalog_loader.track_id: the record's "id", else its position)."""
+    return str(track_id).zfill(2)  # Create a zero-padded key
+
+def parse_key(key):
+    """Return the track id a track key stands for, or None if it is not a track key."""
     try:
-        with open(json_file, 'r', encoding='utf-8') as file:
-            songs = json.load(file)
-            for index, song in enumerate(songs, start=1):
-                key = str(index).zfill(2)  # Create a zero-padded key
-                library[key] = LibraryItem(
-                    title=song["title"],
-                    singer=song["singer"],
-                    rating=song["rating"],
-                    link=song["link"],
-                    image_path=song.get("image_url"),
-                    play_count=song.get("play_count")  # Load play count directly from JSON
-                )
+        track_id = int(key)
+    except (TypeError, ValueError):
+        return None
+    return track_id if track_id > 0 and make_key(track_id) == key else None
+
+def get_storage(path):
+    """Return the storage backend for a library file, opening it on first use."""
+    path = os.path.abspath(path)
+    with _storages_lock:
+        if path not in _storages:
+            _storages[path] = storage.open_storage(path, make_key, parse_key, on_rewritten=file_rewritten)
+        return _storages[path]
+
+def close_storage(path):
+    """Close a library file's storage, folding journaled plays into song.json; it reopens on next use."""
+    with _storages_lock:  # Closed before another thread can open a second journal for the file
+        backend = _storages.pop(os.path.abspath(path), None)
+        if backend is not None:
+            backend.close()
+
+def get_daemon_client():
+    """Return the play_daemon client in client mode, or None when this process writes the library itself."""
+    global _daemon_client
+    if _daemon_client is None and DAEMON_SOCKET:
+        from play_daemon import PlayClient  # Only client mode needs sockets
+        _daemon_client = PlayClient(DAEMON_SOCKET)
+    return _daemon_client
+
+def use_daemon(socket_path):
+    """Switch this process to client mode (socket_path) or back to writing the library itself (None)."""
+    global DAEMON_SOCKET, _daemon_client
+    if _daemon_client is not None:
+        _daemon_client.close()
+    DAEMON_SOCKET, _daemon_client = socket_path, None
+
+def get_journal(json_file):
+    """Return the play-count journal for a JSON file, starting it on first use."""
+    return get_storage(json_file).journal
+
+def iter_load_library(json_file, batch_size=BATCH_SIZE, skipped=None, use_snapshot=True):
+    """Reset the library and stream it from a JSON file or SQLite database, yielding the keys added per batch.
+
+    Invalid records are skipped and reported in the skipped list as (position, reason).
+    If the file's binary snapshot is up to date it is mapped instead of parsing
+    the JSON: every key arrives in the first batch and the search index is then
+    built in the following steps. Otherwise the snapshot is rebuilt while parsing.
+    """
+    global library, index, library_file, library_signature
+    library = TrackStore()  # Clear existing library
+    index = TrackIndex(library)
+    library_file = json_file
+    library_signature = None
+    store, store_index = library, index
+    _publish(LIBRARY_RELOADED, ())
+    try:
+        if not os.path.exists(json_file):
+            raise FileNotFoundError(json_file)
+        backend = get_storage(json_file)
+        loaded_signature = backend.signature()  # Taken first, so a write during the load forces a reload
+        pending = backend.pending()  # Counts played but not yet compacted
+        use_snapshot = use_snapshot and backend.snapshots
+        snap_file = catalog_snapshot.snapshot_path(json_file)
+        snapshot = None
+        if use_snapshot:
+            snapshot = catalog_snapshot.open_snapshot(snap_file, loaded_signature, make_key, parse_key)
+        if snapshot is not None:
+            catalog.note_hit()
+            library = store = snapshot
+            index = store_index = TrackIndex(snapshot)
+            for key, count in pending.items():
+                row = snapshot.row_of(key)
+                if row is not None:
+                    snapshot.set_play_count_at(row, count)
+            if skipped is not None:
+                skipped.extend(snapshot.skipped_records())
+            library_signature = loaded_signature
+            _publish(LIBRARY_RELOADED, ())
+            _publish(TRACKS_ADDED, snapshot.keys())
+            yield snapshot.keys()
+            while not store_index.catch_up(batch_size):
+                yield ()
+            return
+
+        catalog.note_parse()
+        builder = catalog_snapshot.SnapshotBuilder() if use_snapshot else None
+        on_record = builder.add if builder is not None else None
+        for batch in backend.iter_batches(batch_size, skipped, on_record):
+            keys = []
+            for track_id, fields in batch:
+                key = make_key(track_id)
+                if key in pending:
+                    fields["play_count"] = pending[key]  # Replay the journal over the file
+                store_index.add(store.add(key, **fields))
+                keys.append(key)
+            if store is library:
+                _publish(TRACKS_ADDED, keys)
+            yield keys
+        if builder is not None:
+            try:
+                builder.write(snap_file, loaded_signature)
+            except OSError as e:
+                print(f"Could not write snapshot {snap_file}: {e}")
+        if store is library:
+            library_signature = loaded_signature
     except FileNotFoundError:
         print(f"Error: The file {json_file} was not found.")
     except json.JSONDecodeError as e:
@@ -45,24 +174,144 @@ def load_library_from_json(json_file):
     except Exception as e:
         print(f"Unexpected error: {e}")
 
-def list_all():
-    """Returns a formatted string of all tracks in the library."""
-    return "\n".join(f"{key}: {item.title}" for key, item in library.items())
+@timed("library.load")
+def load_library_from_json(json_file):
+    """Load library data from a JSON file and return the skipped records."""
+    skipped = []
+    for _ in iter_load_library(json_file, skipped=skipped):
+        pass
+    for position, reason in skipped:
+        print(f"Skipped record {position}: {reason}")
+    return skipped
+
+def is_library_current(json_file):
+    """Return True if the library was fully loaded from json_file and the file has not changed since."""
+    if library_file is None or library_signature is None:
+        return False
+    if os.path.abspath(library_file) != os.path.abspath(json_file):
+        return False
+    try:
+        return get_storage(json_file).signature() == library_signature
+    except OSError:
+        return False
+
+def ensure_library(json_file):
+    """Load the library from json_file unless it is already loaded and unchanged; returns True if it loaded."""
+    if is_library_current(json_file):
+        catalog.note_hit()
+        return False
+    load_library_from_json(json_file)
+    return True
+
+def file_rewritten(json_file, play_counts, ratings):
+    """Record that this process rewrote json_file, setting play counts and ratings (key -> value) the library holds."""
+    global library_signature
+    if library_signature is not None and os.path.abspath(library_file) == os.path.abspath(json_file):
+        library_signature = catalog.signature(json_file)
+        if isinstance(library, catalog_snapshot.SnapshotStore):
+            library.mark_source(library_signature, ratings, play_counts)  # Only what reached the file
+
+@timed("library.save_rating")
+def save_rating(key, new_rating):
+    """Set a track's rating and persist it to the library file, or send it to the play daemon in client mode."""
+    save_edits(ratings={key: new_rating})  # Checked and written before the library changes
+
+def persist_ratings(ratings):
+    """Write ratings (key -> rating) in one go, or send them to the play daemon; the library is not changed.
+
+    The JSON file is rewritten as a stream, so a large catalog is never held in memory to change a few records.
+    """
+    if library_file is None:
+        raise RuntimeError("No library file has been loaded.")
+    client = get_daemon_client()
+    if client is not None:
+        client.send(ratings=ratings)
+    else:
+        get_storage(library_file).apply({}, ratings)
+
+@timed("library.save_edits")
+def save_edits(ratings=None, play_counts=None):
+    """Set the ratings and play counts of many tracks (key -> value) and persist them in one atomic write.
+
+    Every edit is checked before anything changes, so one bad key or value
+    leaves the library and the file as they were. In client mode the ratings
+    go to the play daemon as one batch; play counts cannot be set there.
+    """
+    ratings, play_counts = ratings or {}, play_counts or {}
+    if library_file is None:
+        raise RuntimeError("No library file has been loaded.")
+    client = get_daemon_client()
+    if client is not None and play_counts:
+        raise RuntimeError("In client mode plays are sent as increments; use record_plays().")
+    for key in ratings.keys() | play_counts.keys():
+        if key not in library:
+            raise KeyError(f"Track {key} not found.")
+    for rating in ratings.values():
+        check_rating(rating)
+    for play_count in play_counts.values():
+        check_play_count(play_count)
+    if client is not None:
+        client.send(ratings=ratings)
+    elif ratings or play_counts:
+        get_storage(library_file).apply(play_counts, ratings)  # Persisted first: a failed write changes nothing
+    for key, rating in ratings.items():
+        library[key].rating = rating
+    for key, play_count in play_counts.items():
+        library[key].play_count = play_count
+    if ratings:
+        _publish(RATING_CHANGED, ratings.keys())
+    if play_counts:
+        _publish(COUNT_CHANGED, play_counts.keys())
+
+def add_tracks(records, play_counts=None, json_file=None, merge=None):
+    """Append new tracks (song.json records) and set play counts of existing ones (key -> count) in one atomic write.
+
+    With merge, each count becomes merge(current, count), current being the
+    track's count in the file or journal at the time of the write. Writes to
+    json_file, by default the loaded library's file, and returns the new
+    tracks' keys and the play counts that changed (key -> count). The library
+    in memory is left as it was; it no longer matches the file, so
+    ensure_library() or a reload picks up the change.
+    """
+    global library_signature
+    play_counts = play_counts or {}
+    json_file = json_file or library_file
+    if json_file is None:
+        raise RuntimeError("No library file has been loaded.")
+    if get_daemon_client() is not None:
+        raise RuntimeError("Tracks cannot be added in client mode.")
+    for record in records:
+        validate_record(record)
+    for play_count in play_counts.values():
+        check_play_count(play_count)
+    if library_file is not None and os.path.abspath(library_file) == os.path.abspath(json_file):
+        # Stale from here on, so a journal compaction during or after the write cannot mark it (or its snapshot) current
+        library_signature = None
+    return get_storage(json_file).add_tracks(records, play_counts, merge)
 
 def get_all_artists():
     """Returns a list of unique artist names from the library."""
-    return list(set(item.singer for item in library.values()))
+    return library.singers()  # Singer names are interned once at load
 
 def list_by_artist(artist):
     """Returns a formatted string of tracks by a specific artist."""
     track_list = [
-        f"{key}: {track.title} by {track.singer}"
-        for key, track in library.items() if artist in track.singer
+        f"{track.key}: {track.title} by {track.singer}"
+        for track in search_by_singer(artist)
     ]
     return "\n".join(track_list) if track_list else f"No songs found for {artist}."
 
+def search_by_song(query, limit=None):
+    """Returns the tracks whose title contains words starting with each word of the query."""
+    return [library.view_at(row) for row in index.search_titles(query, limit)]
+
+def search_by_singer(query, limit=None):
+    """Returns the tracks whose singer contains words starting with each word of the query."""
+    return [library.view_at(row) for row in index.search_singers(query, limit)]
+
 def reload_library():
-    load_library_from_json('/Users/mk183/Documents/GREENWICH/JukeBox/song.json')  # Adjust path as needed
+    """Load the library the windows use (LIBRARY_FILE) again."""
+    load_library_from_json(LIBRARY_FILE)
 
 def list_all():
     """Returns a formatted string of all tracks in the library."""
@@ -85,6 +334,7 @@ def set_rating(key, new_rating):
     """Updates the rating for the song based on the key."""
     if key in library:
         library[key].rating = new_rating
+        _publish(RATING_CHANGED, (key,))
     else:
         print(f"Track {key} not found.")
 
@@ -96,9 +346,80 @@ def update_play_count(key, new_play_count):
     """Updates the play count for the song based on the key."""
     if key in library:
         library[key].play_count = new_play_count
+        _publish(COUNT_CHANGED, (key,))
     else:
         print(f"Track {key} not found.")
 
+@timed("library.save_play_count")
+def save_play_count(key):
+    """Persist the current play count of a track; with JSON it is journaled and song.json updated in the background."""
+    if library_file is None:
+        raise RuntimeError("No library file has been loaded.")
+    if get_daemon_client() is not None:
+        raise RuntimeError("In client mode plays are sent as increments; use record_plays().")
+    get_storage(library_file).save_play_counts({key: library[key].play_count})
+
+@timed("library.record_plays")
+def record_plays(plays):
+    """Add plays for many tracks at once (key -> number of plays) and journal them in one write.
+
+    In client mode the plays go to the play daemon as one batch and the library
+    takes the totals it returns, which include other terminals' plays.
+    Returns the new play count of every track that was updated.
+    """
+    if library_file is None:
+        raise RuntimeError("No library file has been loaded.")
+    client = get_daemon_client()
+    if client is not None:
+        known = {key: count for key, count in plays.items() if key in library}
+        for key in plays.keys() - known.keys():
+            print(f"Track {key} not found.")
+        counts = client.send(plays=known)["counts"] if known else {}
+        for key, count in counts.items():
+            library[key].play_count = count
+        if counts:
+            _record_history(plays, counts)
+            _publish(COUNT_CHANGED, counts.keys())
+        return counts
+    counts = {}
+    for key, count in plays.items():
+        if key in library:
+            track = library[key]
+            track.play_count += count
+            counts[key] = track.play_count
+        else:
+            print(f"Track {key} not found.")
+    if counts:
+        _record_history(plays, counts)
+        _publish(COUNT_CHANGED, counts.keys())
+        get_storage(library_file).save_play_counts(counts)
+    return counts
+
+def _record_history(plays, counts):
+    """Add the plays of every track that was counted to the play history, all at the same moment."""
+    now = history.clock()
+    for key in counts:
+        history.record(key, library[key].singer, plays[key], now)
+
+def find_tracks(singer=None, min_rating=None, min_play_count=None, order_by=None, limit=None):
+    """Return the tracks matching every given condition, ordered by catalog order, "rating" or "play_count".
+
+    A SQLite library answers from its indexes; otherwise the library is scanned.
+    """
+    backend = get_storage(library_file) if library_file is not None else None
+    if isinstance(backend, storage.SqliteStorage):
+        return [library[key] for key in backend.find(singer, min_rating, min_play_count, order_by, limit)
+                if key in library]
+    tracks = [
+        track for track in map(library.view_at, range(len(library)))
+        if (singer is None or track.singer == singer)
+        and (min_rating is None or track.rating >= min_rating)
+        and (min_play_count is None or track.play_count >= min_play_count)
+    ]
+    if order_by is not None:
+        tracks.sort(key=lambda track: getattr(track, order_by), reverse=True)
+    return tracks[:limit] if limit is not None else tracks
+
 def display_track_details(key):
     """Displays the details of a track including the image path."""
     if key in library:
@@ -115,10 +436,9 @@ def display_track_details(key):
     else:
         print(f"Track {key} not found.")
 
-# Load data from song.json
-load_library_from_json(r'/Users/mk183/Documents/GREENWICH/JukeBox/song.json')
-print("Library loaded:", library)
-
-# Example usage:
-print(list_all())  # List all songs
-display_track_details("01")  # Display details of the first track
+if __name__ == "__main__":
+    # Example usage; importing the module never touches the disk
+    load_library_from_json(LIBRARY_FILE)
+    print("Library loaded:", library)
+    print(list_all())  # List all songs
+    display_track_details("01")  # Display details of the first track
@@ -1,42 +1,46 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import json
 import os
+import tracks_library as lib
+from virtual_list import VirtualListbox
+from library_events import LibraryChanges
+from instrumentation import timed
 
-SONG_FILE = 'song.json'
+SONG_FILE = lib.LIBRARY_FILE  # song.json, or a SQLite database named by JUKEBOX_LIBRARY
 
 class Updatetracks:
     @staticmethod
-    def load_list():
-        """Load the list of songs from the JSON file."""
-        if not os.path.exists(SONG_FILE):
-            return []
-        with open(SONG_FILE, 'r', encoding='utf-8') as file:
-            return json.load(file)
-
-    @staticmethod
-    def save_list(tracks):
-        """Save the list of songs to the JSON file."""
-        with open(SONG_FILE, 'w', encoding='utf-8') as file:
-            json.dump(tracks, file, indent=4)
-
-    @staticmethod
+    @timed("update.update_rating")
     def update_rating(track_number, new_rating):
         """Update the rating of a song."""
-        tracks = Updatetracks.load_list()
+        if os.path.exists(SONG_FILE):
+            lib.ensure_library(SONG_FILE)  # Parsed only if no window has loaded this version yet
         try:
             index = int(track_number) - 1  # Convert to zero-based index
-            if 0 <= index < len(tracks):
-                track = tracks[index]
-                old_rating = track.get("rating", "Not rated")
-                track["rating"] = new_rating
-                Updatetracks.save_list(tracks)
-                messagebox.showinfo("Success", f"Track: {track['title']}\nNew Rating: {new_rating}\nOld Rating: {old_rating}")
+            key = lib.make_key(index + 1) if index >= 0 else None
+            if key in lib.library:
+                track = lib.library[key]
+                old_rating = track.rating
+                lib.save_rating(key, new_rating)  # Written through the library's storage backend
+                messagebox.showinfo("Success", f"Track: {track.title}\nNew Rating: {new_rating}\nOld Rating: {old_rating}")
             else:
                 messagebox.showerror("Error", "Invalid track number.")
         except ValueError:
             messagebox.showerror("Error", "Please enter a valid number.")
 
+    @staticmethod
+    @timed("update.update_ratings")
+    def update_ratings(keys, new_rating):
+        """Give many songs the same rating with one write of the library file."""
+        if os.path.exists(SONG_FILE):
+            lib.ensure_library(SONG_FILE)  # Keys are track ids, so they name the same songs after a reload
+        try:
+            lib.save_edits(ratings={key: new_rating for key in keys})
+        except (KeyError, ValueError) as e:
+            messagebox.showerror("Error", e.args[0])
+            return
+        messagebox.showinfo("Success", f"{len(keys)} tracks now rated {new_rating}.")
+
 class UpdateTracksWindow:
     def __init__(self, root):
         """Initialize the UpdateTracks window."""
@@ -84,16 +88,77 @@ class UpdateTracksWindow:
             button.grid(row=1, column=i - 1, sticky=(tk.W, tk.E), padx=2)
             self.star_buttons.append(button)
 
+        # Multi-select mode: pick any number of listed tracks instead of typing one number
+        self.multi_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frame, text="Rate several tracks", variable=self.multi_var,
+                        command=self.toggle_multi).grid(row=2, column=0, columnspan=5, sticky=tk.W)
+
+        self.multi_frame = ttk.Frame(frame)
+        self.artist_var = tk.StringVar(value="All Artists")
+        ttk.OptionMenu(self.multi_frame, self.artist_var, "All Artists", "All Artists", *lib.get_all_artists(),
+                       command=lambda _: self.list_tracks()).grid(row=0, column=0, sticky=tk.W)
+        self.listbox = VirtualListbox(self.multi_frame, width=50, height=12, selectmode=tk.EXTENDED)
+        self.listbox.grid(row=1, column=0, pady=5)
+        self.listbox.bind("<<ListboxSelect>>", lambda _: self.show_selection())
+        self.selection_lbl = ttk.Label(self.multi_frame, text="Ctrl- or Shift-click to select several tracks.")
+        self.selection_lbl.grid(row=2, column=0, sticky=tk.W)
+        self.store = lib.library  # Store the listed rows belong to
+        self.changes = LibraryChanges(self.window, self.library_changed)
+
         # Create the update button
-        ttk.Button(frame, text="Update Rating", command=self.update_rating).grid(row=2, column=0, columnspan=5, pady=5)
+        ttk.Button(frame, text="Update Rating", command=self.update_rating).grid(row=4, column=0, columnspan=5, pady=5)
+
+    def toggle_multi(self):
+        """Show or hide the track list of multi-select mode."""
+        if self.multi_var.get():
+            self.multi_frame.grid(row=3, column=0, columnspan=5, sticky=(tk.W, tk.E))
+            self.track_number_entry.state(["disabled"])
+            self.list_tracks()
+        else:
+            self.multi_frame.grid_remove()
+            self.track_number_entry.state(["!disabled"])
+
+    def list_tracks(self, keep_position=False):
+        """List every track, or the chosen artist's, with its rating for selection."""
+        self.store = store = lib.library
+        artist = self.artist_var.get()
+        rows = range(len(store)) if artist == "All Artists" else lib.index.search_singers(artist)
+        self.listbox.set_rows(rows, lambda row: f"{store.key_at(row)}: {store.title_at(row)} by {store.singer_at(row)} "
+                                                f"({'★' * store.rating_at(row)})",
+                              empty_text="No tracks found!", keep_position=keep_position)
+        self.show_selection()
+
+    def library_changed(self, changes):
+        """Relist after a load, else redraw only the listed tracks whose rating changed."""
+        if not self.multi_var.get():
+            return
+        if lib.LIBRARY_RELOADED in changes:
+            self.list_tracks()  # Rows may stand for other tracks now, so the selection starts afresh
+        elif lib.TRACKS_ADDED in changes:
+            self.list_tracks(keep_position=True)
+        elif lib.RATING_CHANGED in changes:
+            store, keys = self.store, changes[lib.RATING_CHANGED]
+            self.listbox.redraw_rows(lambda row: store.key_at(row) in keys)
+
+    def show_selection(self):
+        count = len(self.listbox.selected_rows())
+        self.selection_lbl.configure(text=f"{count} tracks selected." if count
+                                     else "Ctrl- or Shift-click to select several tracks.")
 
     def update_rating(self):
         """Get the input and call the update_rating method from Updatetracks."""
-        track_number = self.track_number_entry.get().strip()
         new_rating = self.selected_rating.get()
-        
-        # Call the update function
-        Updatetracks.update_rating(track_number, new_rating)
+        if self.multi_var.get():
+            keys = [self.store.key_at(row) for row in self.listbox.selected_rows()]
+            if not keys:
+                messagebox.showerror("Error", "Select at least one track.")
+                return
+            Updatetracks.update_ratings(keys, new_rating)  # One write for the whole selection
+        else:
+            track_number = self.track_number_entry.get().strip()
+
+            # Call the update function
+            Updatetracks.update_rating(track_number, new_rating)
 
         # Close the update window after updating
         self.window.destroy()
@@ -102,6 +167,8 @@ def main():
     """Main function to run the update tracks window standalone."""
     root = tk.Tk()
     root.withdraw()  # Hide the root window
+    if os.path.exists(SONG_FILE):
+        lib.ensure_library(SONG_FILE)  # The artist menu is filled from the library when the window opens
     update_window = UpdateTracksWindow(root)  # Create an instance of UpdateTracksWindow
     root.mainloop()  # Start the Tkinter main loop
 
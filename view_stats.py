@@ -0,0 +1,33 @@
+import tkinter as tk
+import tkinter.scrolledtext as tkst
+import tracks_library as lib
+import analytics  # Needs NumPy
+
+class StatsWindow:
+    def __init__(self, window):
+        """Show catalog statistics computed over the whole library."""
+        self.window = window
+        window.title("Statistics")
+
+        refresh_btn = tk.Button(window, text="Refresh", command=self.refresh)
+        refresh_btn.grid(row=0, column=0, sticky="W", padx=10, pady=10)
+
+        self.status_lbl = tk.Label(window, text="", font=("Helvetica", 10))
+        self.status_lbl.grid(row=0, column=1, sticky="W", padx=10, pady=10)
+
+        self.report_txt = tkst.ScrolledText(window, width=80, height=24, wrap="none", font=("Courier", 10))
+        self.report_txt.grid(row=1, column=0, columnspan=2, padx=10, pady=10)
+
+        self.refresh()
+
+    def refresh(self):
+        """Export the library's columns again and redraw the report."""
+        try:
+            lib.ensure_library(lib.LIBRARY_FILE)  # Parsed only if no window has loaded this version yet
+            report = analytics.build_report(analytics.export_arrays())
+        except Exception as e:
+            self.status_lbl.configure(text=f"Failed to compute statistics: {e}")
+            return
+        self.report_txt.delete("1.0", tk.END)
+        self.report_txt.insert(tk.END, analytics.format_report(report))
+        self.status_lbl.configure(text=f"{report['tracks']} tracks")
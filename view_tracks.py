@@ -1,10 +1,10 @@
 import tkinter as tk  # Import the tkinter library for GUI creation
 import tracks_library as lib  # Import the library for track data management
 import font_manager as fonts  # Import custom font manager for consistent font styles
-from PIL import Image, ImageTk  # Import Pillow for image handling
-import requests  # Import requests for fetching images from URLs
-from io import BytesIO  # Import BytesIO for handling image data in memory
-import json  # Import json for working with JSON data
+import thumbnails  # Display-size covers, resized in a process pool
+from virtual_list import VirtualListbox  # Listbox that only renders the visible rows
+from library_events import LibraryChanges  # Library changes from any window, once per idle cycle
+from instrumentation import timed  # Timers shown in the main window's stats panel
 
 class Viewtracks:
     def __init__(self, window, shared_play_counts):
@@ -36,9 +36,12 @@ class Viewtracks:
         check_track_btn = tk.Button(window, text="View Track", command=self.check_track_clicked)
         check_track_btn.grid(row=0, column=4, padx=10, pady=10)  # Position the button in the grid
 
-        # Listbox for displaying the list of tracks
-        self.listbox = tk.Listbox(window, width=50, height=15)  # Create a listbox for tracks
+        # Listbox for displaying the list of tracks (rows are library store rows, rendered on demand)
+        self.listbox = VirtualListbox(window, width=50, height=15)  # Create a listbox for tracks
         self.listbox.grid(row=1, column=0, columnspan=4, padx=10, pady=10)  # Position the listbox
+        self.store = lib.library  # Store the listed rows belong to
+        self.listing = None  # "All Artists" or the artist whose tracks are listed, once something is listed
+        self.shown_key = None  # Key of the track whose details are shown
 
         # Text area for displaying individual track details
         self.tracks_txt = tk.Text(window, width=24, height=4, wrap="none")  # Create a text area for track details
@@ -47,6 +50,7 @@ class Viewtracks:
         # Image label for displaying the song cover
         self.image_label = tk.Label(window)  # Create a label for the image
         self.image_label.grid(row=1, column=5, sticky="NW", padx=10, pady=10)  # Position the image label
+        self.image_url = None  # URL of the cover currently requested
 
         # Status label for displaying messages
         self.status_lbl = tk.Label(window, text="", font=("Helvetica", 10))  # Create a status label
@@ -55,6 +59,9 @@ class Viewtracks:
         # Bind the Listbox selection event to a handler method
         self.listbox.bind("<<ListboxSelect>>", self.on_listbox_select)
 
+        # Follow changes made in other windows (ratings, plays, reloads)
+        self.changes = LibraryChanges(window, self.library_changed)
+
         # Resize the window to fit its content
         self.resize_window()
 
@@ -63,29 +70,31 @@ class Viewtracks:
         self.window.update_idletasks()  # Update the window to reflect changes
         self.window.geometry('')  # Reset geometry to fit the content
 
-    def filter_tracks(self, artist):
+    def filter_tracks(self, artist, keep_position=False):
         """Filters tracks based on the selected artist."""
-        self.listbox.delete(0, tk.END)  # Clear existing items in the listbox
         if artist == "All Artists":
-            self.list_tracks_clicked()  # Show all tracks if "All Artists" is selected
+            self.list_tracks_clicked(keep_position)  # Show all tracks if "All Artists" is selected
         else:
-            tracks_list = lib.list_by_artist(artist)  # Fetch tracks by the selected artist
-            if tracks_list.strip():  # Check if the list is not empty
-                for line in tracks_list.split("\n"):  # Split the list into lines
-                    self.listbox.insert(tk.END, line)  # Add each line to the listbox
-            else:
-                self.listbox.insert(tk.END, "No tracks found for this artist!")  # Inform the user if no tracks found
+            self.listing = artist
+            self.store = store = lib.library
+            rows = lib.index.search_singers(artist)  # Store rows of the tracks by the selected artist
+            self.listbox.set_rows(
+                rows,
+                lambda row: f"{store.key_at(row)}: {store.title_at(row)} by {store.singer_name(store.singer_code_at(row))}",
+                empty_text="No tracks found for this artist!",
+                keep_position=keep_position,
+            )
+            if not rows:
                 self.status_lbl.configure(text="No tracks available for the selected artist.")  # Update status
 
-    def list_tracks_clicked(self):
+    def list_tracks_clicked(self, keep_position=False):
         """Displays all tracks in the Listbox widget."""
-        self.listbox.delete(0, tk.END)  # Clear existing items in the listbox
-        tracks_list = lib.list_all()  # Fetch all tracks from the library
-        if tracks_list.strip():  # If the list is not empty
-            for line in tracks_list.split("\n"):  # Split the list into lines
-                self.listbox.insert(tk.END, line)  # Add each line to the listbox
-        else:
-            self.listbox.insert(tk.END, "No tracks found!")  # Inform the user if no tracks found
+        self.listing = "All Artists"
+        self.store = store = lib.library
+        rows = range(len(store))  # Every row of the library, without building a list
+        self.listbox.set_rows(rows, lambda row: f"{store.key_at(row)}: {store.title_at(row)}", empty_text="No tracks found!",
+                              keep_position=keep_position)
+        if not rows:
             self.status_lbl.configure(text="No tracks available to display.")  # Update status
 
     def check_track_clicked(self):
@@ -95,12 +104,22 @@ class Viewtracks:
 
     def on_listbox_select(self, event):
         """Handles the selection of a track from the Listbox."""
-        try:
-            selected_item = self.listbox.get(self.listbox.curselection())  # Get the selected item
-            key = selected_item.split(":")[0]  # Extract the track key from the selection
-            self.display_track_details(key)  # Display details for the selected track
-        except IndexError:
+        row = self.listbox.selected_row()  # Store row of the selected item
+        if row is None:
             self.status_lbl.configure(text="No track selected!")  # Inform the user if no track is selected
+            return
+        self.display_track_details(self.store.key_at(row))  # Display details for the selected track
+        store = self.store
+        neighbours = self.listbox.rows_around(thumbnails.PREFETCH)  # Covers of the rows the user moves to next
+        thumbnails.get_thumbnails().prefetch(self.window, [store.image_path_at(row) for row in neighbours])
+
+    def library_changed(self, changes):
+        """Patch the window after library changes: relist on a reload, else refresh the shown details."""
+        if lib.LIBRARY_RELOADED in changes or lib.TRACKS_ADDED in changes:
+            if self.listing is not None:
+                self.filter_tracks(self.listing, keep_position=True)  # Only the visible lines are drawn
+        if self.shown_key in lib.library and any(self.shown_key in keys for keys in changes.values()):
+            self.show_details(lib.library[self.shown_key])  # Without counting another play
 
     def display_track_details(self, key):
         """Displays details of the selected track and updates the play count."""
@@ -109,68 +128,71 @@ class Viewtracks:
 
             # Increase play count and update JSON
             self.update_play_count(track)  # Increment play count for the track
-
-            # Prepare track details to display
-            track_details = (
-                f"Song: {track.title}\n"  # Display the song title
-                f"Singer: {track.singer}\n"  # Display the singer's name
-                f"Rating: {track.rating}\n"  # Display the track's rating
-                f"Plays: {track.play_count}\n"  # Display the play count
-                f"Link: {track.link}"  # Display the link to the track
-            )
-            self.tracks_txt.delete("1.0", tk.END)  # Clear previous details in the text area
-            self.tracks_txt.insert("1.0", track_details)  # Insert the new track details
+            self.show_details(track)  # Display the track's details
 
             # Check for image path and display if available
             if track.image_path:
                 self.display_image(track.image_path)  # Display track cover image
             else:
+                self.image_url = None  # Ignore any cover still downloading
                 self.image_label.config(image='')  # Clear image if no URL provided
         else:
+            self.shown_key = None  # No track's details are shown
             self.tracks_txt.delete("1.0", tk.END)  # Clear text area if track not found
             self.tracks_txt.insert("1.0", "Track not found!")  # Inform user track not found
+            self.image_url = None  # Ignore any cover still downloading
             self.image_label.config(image='')  # Clear image if track not found
             self.status_lbl.configure(text="")  # Clear any previous error message
 
+    def show_details(self, track):
+        """Displays a track's details in the text area."""
+        self.shown_key = track.key  # Redrawn when another window rates or plays it
+        track_details = (
+            f"Song: {track.title}\n"  # Display the song title
+            f"Singer: {track.singer}\n"  # Display the singer's name
+            f"Rating: {track.rating}\n"  # Display the track's rating
+            f"Plays: {track.play_count}\n"  # Display the play count
+            f"Link: {track.link}"  # Display the link to the track
+        )
+        self.tracks_txt.delete("1.0", tk.END)  # Clear previous details in the text area
+        self.tracks_txt.insert("1.0", track_details)  # Insert the new track details
+
     def update_play_count(self, track):
-        """Increases the play count and updates the JSON file."""
-        track.play_count += 1  # Increment the play count for the track
-        self.save_play_count_to_json(track)  # Save the updated play count to the JSON file
+        """Increases the play count and saves it."""
+        self.save_play_count_to_json(track)  # Count the play and save it to the library file
 
+    @timed("view.save_play_count")
     def save_play_count_to_json(self, track):
-        """Saves the updated play count back to the JSON file."""
+        """Records one play through the library (journal for JSON, SQLite update, or the play daemon)."""
         try:
-            with open('/Users/mk183/Documents/GREENWICH/JukeBox/song.json', 'r+', encoding='utf-8') as file:
-                songs = json.load(file)  # Load existing songs from JSON file
-                # Update the play count in the list
-                for song in songs:
-                    if song["title"] == track.title and song["singer"] == track.singer:
-                        song["play_count"] = track.play_count  # Update the play count for the matching song
-                        break
-                # Move to the beginning of the file and overwrite it
-                file.seek(0)  
-                json.dump(songs, file, indent=4)  # Write the updated songs list back to the file
-                file.truncate()  # Remove any leftover data in the file
+            lib.record_plays({track.key: 1})  # Sent as an increment, so other terminals' plays are not lost
             self.status_lbl.configure(text="Play count updated successfully.")  # Inform user of success
         except Exception as e:
             print(f"Error saving play count: {e}")  # Print error message
             self.status_lbl.configure(text="Error updating play count.")  # Inform user of the error
 
+    @timed("view.display_image")
     def display_image(self, image_url):
-        """Fetch and display an image from a URL."""
+        """Show the cover's thumbnail: at once if it is ready, else when it has been fetched and resized."""
+        self.image_url = image_url  # Remember the latest request so slower, older covers are dropped
+        thumbnails.get_thumbnails().show(self.window, image_url, lambda photo, error: self.show_image(image_url, photo, error))
+
+    @timed("view.show_image")
+    def show_image(self, image_url, photo, error):
+        """Display a cover thumbnail, unless another track has been selected since."""
+        if image_url != self.image_url:
+            return
         try:
-            response = requests.get(image_url)  # Fetch the image from the URL
-            response.raise_for_status()  # Raise an exception for bad responses
-            image_data = Image.open(BytesIO(response.content))  # Open the image from the fetched data
-            photo = ImageTk.PhotoImage(image_data)  # Convert the image for Tkinter
+            if error is not None:
+                raise error
 
             # Update the image label with the new image
             self.image_label.config(image=photo)
             self.image_label.image = photo  # Keep a reference to prevent garbage collection
-            
+
             # Clear any previous error message
             self.status_lbl.configure(text="")
-        except requests.exceptions.RequestException as e:
+        except Exception as e:
             print(f"Error fetching image: {e}")  # Print error message
             self.status_lbl.configure(text="Error fetching image.")  # Inform user of the error
             self.image_label.config(image='')  # Clear image on error
@@ -179,5 +201,6 @@ if __name__ == "__main__":
     shared_play_counts = {}  # Shared dictionary for play counts (if needed)
     window = tk.Tk()  # Create the main window
     fonts.configure()  # Configure fonts using the custom font manager
+    lib.ensure_library(lib.LIBRARY_FILE)  # Run on its own, so no other window has loaded the library
     app = Viewtracks(window, shared_play_counts)  # Instantiate the Viewtracks class
     window.mainloop()  # Start the Tkinter event loop
\ No newline at end of file
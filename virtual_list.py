@@ -0,0 +1,322 @@
+import tkinter as tk
+from tkinter import ttk
+from instrumentation import timed
+
+OVERSCAN = 5  # Rows rendered above and below the visible window
+WHEEL_ROWS = 3  # Rows scrolled per mouse-wheel notch
+
+
+def render_window(first, height, overscan, total):
+    """Return the (start, stop) range of rows to render so rows first..first+height are visible."""
+    start = max(0, first - overscan)
+    stop = min(total, first + height + overscan)
+    return start, stop
+
+
+def clamp_first(first, height, total):
+    """Keep the first visible row inside the list."""
+    return max(0, min(first, total - height))
+
+
+class ConcatRows:
+    """Read-only sequence presenting several sequences back to back without copying them."""
+
+    def __init__(self, *parts):
+        self.parts = parts
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        for part in self.parts:
+            if index < len(part):
+                return part[index]
+            index -= len(part)
+        raise IndexError("row index out of range")
+
+
+class _VirtualView:
+    """Scrolling logic shared by the virtual Listbox and Treeview.
+
+    Only the visible rows plus a small overscan margin exist in the widget.
+    Rows come from any sequence supporting len() and indexing (a range over
+    the library store works), and format_row turns a row into what the widget
+    displays, so refreshing or scrolling costs the same at any catalog size.
+    """
+
+    def __init__(self, frame, widget, height, overscan):
+        self.frame = frame
+        self.widget = widget
+        self.height = height
+        self.overscan = overscan
+        self.rows = ()
+        self.format_row = str
+        self.empty_text = None
+        self.first = 0  # Row shown at the top of the widget
+        self.start = 0  # Row held by the widget's first line
+        self.stop = 0
+        self.selected = None  # Position in rows of the selected row
+        self.marked = None  # Positions in rows of every selected row, in lists that allow several
+        self._rendering = False
+
+        self.scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.yview)
+        widget.configure(yscrollcommand=self._on_widget_scroll)
+        widget.grid(row=0, column=0, sticky="NSEW")
+        self.scrollbar.grid(row=0, column=1, sticky="NS")
+        frame.rowconfigure(0, weight=1)
+        frame.columnconfigure(0, weight=1)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            widget.bind(sequence, self._on_wheel)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def bind(self, sequence, func):
+        self.widget.bind(sequence, func)
+
+    def set_rows(self, rows, format_row=str, empty_text=None, keep_position=False):
+        """Show a new sequence of rows, scrolled to the top unless keep_position is set."""
+        if keep_position:
+            self._remember_selection()
+        else:
+            self.first = 0
+            self.selected = None
+            if self.marked is not None:
+                self.marked = set()
+        self.rows = rows
+        self.format_row = format_row
+        self.empty_text = empty_text
+        self.first = clamp_first(self.first, self.height, len(rows))
+        self.render()
+
+    def refresh(self):
+        """Redraw the visible rows, e.g. after the sequence grew or a row changed."""
+        self._remember_selection()
+        self.first = clamp_first(self.first, self.height, len(self.rows))
+        self.render()
+
+    def redraw_rows(self, changed):
+        """Redraw the rendered rows for which changed(row) is true; returns how many were redrawn.
+
+        Costs one check per rendered row however many tracks changed; rows
+        outside the window are formatted afresh when scrolled to anyway.
+        """
+        redrawn = 0
+        self._rendering = True  # Lines are replaced in place; the window does not move
+        try:
+            for position in range(self.start, self.stop):
+                row = self.rows[position]
+                if changed(row):
+                    self._set_line(position - self.start, self.format_row(row))
+                    redrawn += 1
+        finally:
+            self._rendering = False
+        return redrawn
+
+    def selected_row(self):
+        """Return the selected row, or None."""
+        index = self._widget_selection()
+        if index is None or not self.rows:
+            return None
+        self.selected = self.start + index
+        return self.rows[self.selected]
+
+    def selected_rows(self):
+        """Return every selected row in list order, including rows scrolled out of the widget."""
+        if self.marked is None:
+            row = self.selected_row()
+            return [] if row is None else [row]
+        self._remember_selection()
+        return [self.rows[position] for position in sorted(self.marked)]
+
+    def rows_around(self, distance):
+        """Return the rows within distance of the selected one, nearest first."""
+        if self.selected is None:
+            return []
+        around = []
+        for step in range(1, distance + 1):
+            around += [self.rows[position] for position in (self.selected + step, self.selected - step)
+                       if 0 <= position < len(self.rows)]
+        return around
+
+    def yview(self, *args):
+        """Scrollbar callback: 'moveto fraction' or 'scroll n units|pages'."""
+        total = len(self.rows)
+        if args[0] == "moveto":
+            first = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = self.height if args[2] == "pages" else 1
+            first = self.first + int(args[1]) * step
+        else:
+            return
+        self.scroll_to(first)
+
+    def scroll_to(self, first):
+        first = clamp_first(first, self.height, len(self.rows))
+        if first != self.first:
+            self._remember_selection()
+            self.first = first
+            self.render()
+
+    def _remember_selection(self):
+        # The widget is about to be refilled; note the selection in catalog terms first
+        index = self._widget_selection()
+        if index is not None:
+            self.selected = self.start + index
+        if self.marked is not None:
+            self.marked.difference_update(range(self.start, self.stop))
+            self.marked.update(self.start + index for index in self._widget_selections())
+
+    def see(self, position):
+        """Scroll so the row at position is visible."""
+        if position < self.first:
+            self.scroll_to(position)
+        elif position >= self.first + self.height:
+            self.scroll_to(position - self.height + 1)
+
+    def _on_wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to(self.first - WHEEL_ROWS)
+        else:
+            self.scroll_to(self.first + WHEEL_ROWS)
+        return "break"  # The widget only holds the window, so native scrolling must not run
+
+    def _on_widget_scroll(self, lo, hi):
+        # Keyboard navigation scrolls the widget itself inside the overscan margin;
+        # follow it by moving the window, then keep the scrollbar in catalog terms
+        if not self._rendering and self.stop > self.start:
+            top = self.start + round(float(lo) * (self.stop - self.start))
+            if top != self.first:
+                self._remember_selection()
+                self.first = clamp_first(top, self.height, len(self.rows))
+                self.render()
+                return
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self.rows)
+        if total <= self.height:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + self.height) / total))
+
+    @timed("virtual_list.render")
+    def render(self):
+        total = len(self.rows)
+        self._rendering = True
+        try:
+            if total == 0:
+                self.start = self.stop = 0
+                self._fill([self.empty_text] if self.empty_text else [])
+            else:
+                self.start, self.stop = render_window(self.first, self.height, self.overscan, total)
+                self._fill([self.format_row(self.rows[row]) for row in range(self.start, self.stop)])
+                self._scroll_widget(self.first - self.start)
+                if self.marked is not None:
+                    self._select_many([position - self.start for position in self.marked
+                                       if self.start <= position < self.stop])
+                elif self.selected is not None and self.start <= self.selected < self.stop:
+                    self._select(self.selected - self.start)
+                else:
+                    self._select(None)
+        finally:
+            self._rendering = False
+        self._update_scrollbar()
+
+
+class VirtualListbox(_VirtualView):
+    """A Listbox that renders only the visible part of a long sequence of rows.
+
+    With selectmode=tk.EXTENDED several rows can be selected; the selection
+    outlives scrolling and is read with selected_rows().
+    """
+
+    def __init__(self, parent, width=50, height=15, overscan=OVERSCAN, selectmode=tk.BROWSE):
+        frame = tk.Frame(parent)
+        listbox = tk.Listbox(frame, width=width, height=height, exportselection=False, selectmode=selectmode)
+        super().__init__(frame, listbox, height, overscan)
+        if selectmode in (tk.EXTENDED, tk.MULTIPLE):
+            self.marked = set()
+            if selectmode == tk.EXTENDED:
+                listbox.bind("<ButtonPress-1>", self._on_click, add="+")
+
+    def _on_click(self, event):
+        if not event.state & 0x0005:  # Neither Shift nor Control: a plain click starts a new selection
+            self.marked.clear()
+
+    def _fill(self, lines):
+        self.widget.delete(0, tk.END)
+        if lines:
+            self.widget.insert(0, *lines)
+
+    def _set_line(self, index, line):
+        selected = self.widget.selection_includes(index)
+        self.widget.delete(index)
+        self.widget.insert(index, line)
+        if selected:
+            self.widget.selection_set(index)
+
+    def _scroll_widget(self, index):
+        self.widget.yview(index)
+
+    def _select(self, index):
+        self.widget.selection_clear(0, tk.END)
+        if index is None:
+            return
+        self.widget.selection_set(index)
+        self.widget.activate(index)  # Keep keyboard navigation going from the selected row
+
+    def _select_many(self, indexes):
+        self.widget.selection_clear(0, tk.END)
+        for index in indexes:
+            self.widget.selection_set(index)
+
+    def _widget_selection(self):
+        selection = self.widget.curselection()
+        return selection[0] if selection else None
+
+    def _widget_selections(self):
+        return self.widget.curselection()
+
+
+class VirtualTreeview(_VirtualView):
+    """A Treeview that recycles a fixed set of items to show a long sequence of rows."""
+
+    def __init__(self, parent, columns, height=15, overscan=OVERSCAN):
+        frame = tk.Frame(parent)
+        tree = ttk.Treeview(frame, columns=columns, show='headings', height=height)
+        super().__init__(frame, tree, height, overscan)
+        self.tree = tree
+        self.items = []  # Item ids reused for every window
+
+    def heading(self, column, **kwargs):
+        self.tree.heading(column, **kwargs)
+
+    def column(self, column, **kwargs):
+        self.tree.column(column, **kwargs)
+
+    def _fill(self, values):
+        while len(self.items) < len(values):
+            self.items.append(self.tree.insert("", tk.END))
+        while len(self.items) > len(values):
+            self.tree.delete(self.items.pop())
+        for item, row_values in zip(self.items, values):
+            self.tree.item(item, values=row_values)
+
+    def _set_line(self, index, values):
+        self.tree.item(self.items[index], values=values)
+
+    def _scroll_widget(self, index):
+        self.tree.yview_moveto(index / max(1, len(self.items)))
+
+    def _select(self, index):
+        if index is None:
+            self.tree.selection_set(())  # Recycled items must not carry the old selection
+        else:
+            self.tree.selection_set(self.items[index])
+
+    def _widget_selection(self):
+        selection = self.tree.selection()
+        return self.items.index(selection[0]) if selection else None